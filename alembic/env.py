@@ -17,7 +17,11 @@ from app.core.config import settings  # noqa
 from app.db.models.user import User  # noqa
 from app.db.models.category import Category  # noqa
 from app.db.models.product import Product  # noqa
-from app.db.models.order import Order, OrderItem  # noqa
+from app.db.models.order import Order, OrderItem, OrderEvent  # noqa
+from app.db.models.analytics import SalesDaily  # noqa
+from app.db.models.job import Job  # noqa
+from app.db.models.slow_query import SlowQuery  # noqa
+from app.db.models.catalog_tombstone import CatalogTombstone  # noqa
 
 target_metadata = Base.metadata
 
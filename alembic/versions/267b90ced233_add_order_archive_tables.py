@@ -0,0 +1,49 @@
+"""add_order_archive_tables
+
+Revision ID: 267b90ced233
+Revises: 4a6f41c8c39f
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '267b90ced233'
+down_revision = '4a6f41c8c39f'
+branch_labels = None
+depends_on = None
+
+ORDER_COLUMNS = "id, user_id, status, shipping_address, phone_number, comment, cancel_reason, created_at, updated_at"
+ITEM_COLUMNS = "id, order_id, order_created_at, product_id, product_snapshot, quantity, subtotal"
+
+
+def upgrade():
+    # LIKE keeps the column types (incl. the order status enum) in step with the hot tables
+    op.execute("""
+        CREATE TABLE orders_archive (
+            LIKE orders,
+            archived_at timestamp without time zone NOT NULL DEFAULT now(),
+            PRIMARY KEY (id),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    """)
+    op.execute("""
+        CREATE TABLE order_items_archive (
+            LIKE order_items,
+            PRIMARY KEY (id),
+            FOREIGN KEY (order_id) REFERENCES orders_archive (id) ON DELETE CASCADE
+        )
+    """)
+    op.create_index(op.f('ix_orders_archive_user_id'), 'orders_archive', ['user_id'])
+    op.create_index(op.f('ix_orders_archive_created_at'), 'orders_archive', ['created_at'])
+    op.create_index(op.f('ix_order_items_archive_order_id'), 'order_items_archive', ['order_id'])
+    op.create_index(op.f('ix_order_items_archive_product_id'), 'order_items_archive', ['product_id'])
+
+
+def downgrade():
+    # Put archived orders back into the hot tables (their monthly partitions are never dropped)
+    op.execute(f"INSERT INTO orders ({ORDER_COLUMNS}) SELECT {ORDER_COLUMNS} FROM orders_archive")
+    op.execute(f"INSERT INTO order_items ({ITEM_COLUMNS}) SELECT {ITEM_COLUMNS} FROM order_items_archive")
+    op.drop_table('order_items_archive')
+    op.drop_table('orders_archive')
@@ -0,0 +1,125 @@
+"""partition_orders_by_month
+
+Revision ID: 4a6f41c8c39f
+Revises: cab5795089b4
+Create Date: 2026-10-19 11:00:00.000000
+
+Rebuilds orders and order_items as tables range-partitioned by month of the
+order's created_at. Rows are copied under an exclusive lock, so run it in a
+maintenance window. Ids and their sequences are kept.
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a6f41c8c39f'
+down_revision = 'cab5795089b4'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+ORDER_COLUMNS = "id, user_id, status, shipping_address, phone_number, comment, cancel_reason, created_at, updated_at"
+ITEM_COLUMNS = "id, order_id, product_id, product_snapshot, quantity, subtotal"
+
+
+def _add_months(d: date, months: int) -> date:
+    m = d.month - 1 + months
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def _rename_old(bind, suffix):
+    op.execute("LOCK TABLE orders, order_items IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP INDEX IF EXISTS ix_order_items_product_id")
+    op.execute("DROP INDEX IF EXISTS ix_order_items_order_id")
+    op.execute("DROP INDEX IF EXISTS ix_orders_created_at")
+    op.execute("DROP INDEX IF EXISTS ix_orders_user_id")
+    op.execute(f"ALTER TABLE orders RENAME TO orders_{suffix}")
+    op.execute(f"ALTER TABLE order_items RENAME TO order_items_{suffix}")
+    op.execute(f"ALTER TABLE orders_{suffix} RENAME CONSTRAINT orders_pkey TO orders_{suffix}_pkey")
+    op.execute(f"ALTER TABLE order_items_{suffix} RENAME CONSTRAINT order_items_pkey TO order_items_{suffix}_pkey")
+    return (
+        bind.execute(sa.text(f"SELECT pg_get_serial_sequence('orders_{suffix}', 'id')")).scalar(),
+        bind.execute(sa.text(f"SELECT pg_get_serial_sequence('order_items_{suffix}', 'id')")).scalar(),
+    )
+
+
+def _finish(orders_seq, items_seq, suffix):
+    op.execute(f"ALTER SEQUENCE {orders_seq} OWNED BY orders.id")
+    op.execute(f"ALTER SEQUENCE {items_seq} OWNED BY order_items.id")
+    op.execute(f"DROP TABLE order_items_{suffix}")
+    op.execute(f"DROP TABLE orders_{suffix}")
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+    op.create_index('ix_order_items_product_id', 'order_items', ['product_id'])
+
+
+def upgrade():
+    bind = op.get_bind()
+    orders_seq, items_seq = _rename_old(bind, "old")
+
+    op.execute("""
+        CREATE TABLE orders (
+            LIKE orders_old INCLUDING DEFAULTS,
+            PRIMARY KEY (id, created_at),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("""
+        CREATE TABLE order_items (
+            LIKE order_items_old INCLUDING DEFAULTS,
+            order_created_at timestamp without time zone NOT NULL,
+            PRIMARY KEY (id, order_created_at),
+            FOREIGN KEY (order_id, order_created_at) REFERENCES orders (id, created_at) ON DELETE CASCADE
+        ) PARTITION BY RANGE (order_created_at)
+    """)
+
+    # One partition per month from the oldest order up to MONTHS_AHEAD months from now
+    first, current = bind.execute(sa.text(
+        "SELECT date_trunc('month', min(created_at))::date, date_trunc('month', localtimestamp)::date FROM orders_old"
+    )).one()
+    month = first or current
+    last = _add_months(current, MONTHS_AHEAD)
+    while month <= last:
+        nxt = _add_months(month, 1)
+        for table in ("orders", "order_items"):
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')"
+            )
+        month = nxt
+
+    op.execute(f"INSERT INTO orders ({ORDER_COLUMNS}) SELECT {ORDER_COLUMNS} FROM orders_old")
+    op.execute(f"""
+        INSERT INTO order_items ({ITEM_COLUMNS}, order_created_at)
+        SELECT {', '.join('i.' + c.strip() for c in ITEM_COLUMNS.split(','))}, o.created_at
+        FROM order_items_old i JOIN orders_old o ON o.id = i.order_id
+    """)
+    _finish(orders_seq, items_seq, "old")
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'])
+    op.create_index('ix_orders_user_id', 'orders', ['user_id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    orders_seq, items_seq = _rename_old(bind, "part")
+
+    op.execute("""
+        CREATE TABLE orders (
+            LIKE orders_part INCLUDING DEFAULTS,
+            PRIMARY KEY (id),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    """)
+    op.execute("""
+        CREATE TABLE order_items (
+            LIKE order_items_part INCLUDING DEFAULTS,
+            PRIMARY KEY (id),
+            FOREIGN KEY (order_id) REFERENCES orders (id) ON DELETE CASCADE
+        )
+    """)
+    op.execute("ALTER TABLE order_items DROP COLUMN order_created_at")
+    op.execute(f"INSERT INTO orders ({ORDER_COLUMNS}) SELECT {ORDER_COLUMNS} FROM orders_part")
+    op.execute(f"INSERT INTO order_items ({ITEM_COLUMNS}) SELECT {ITEM_COLUMNS} FROM order_items_part")
+    _finish(orders_seq, items_seq, "part")
@@ -0,0 +1,44 @@
+"""add_slow_queries
+
+Revision ID: 4b1e9d2c7a60
+Revises: 937b2bbb2281
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1e9d2c7a60'
+down_revision = '937b2bbb2281'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'slow_queries',
+        sa.Column('fingerprint', sa.String(length=32), nullable=False),
+        sa.Column('query', sa.Text(), nullable=False),
+        sa.Column('calls', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('total_ms', sa.Float(), server_default='0', nullable=False),
+        sa.Column('max_ms', sa.Float(), server_default='0', nullable=False),
+        sa.Column('first_seen', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_seen', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_statement', sa.Text(), nullable=False),
+        sa.Column('last_params', sa.Text(), nullable=True),
+        sa.Column('last_route', sa.String(length=200), nullable=True),
+        sa.Column('last_trace_id', sa.String(length=64), nullable=True),
+        sa.Column('plan', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('plan_ms', sa.Float(), nullable=True),
+        sa.Column('plan_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('fingerprint'),
+    )
+    op.create_index('ix_slow_queries_last_seen', 'slow_queries', ['last_seen'])
+
+
+def downgrade():
+    op.drop_index('ix_slow_queries_last_seen', table_name='slow_queries')
+    op.drop_table('slow_queries')
@@ -0,0 +1,29 @@
+"""add_user_search_indexes
+
+Revision ID: 7d3c5a1f9e42
+Revises: 4b1e9d2c7a60
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3c5a1f9e42'
+down_revision = '4b1e9d2c7a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_users_phone_number_prefix', 'users', ['phone_number'],
+        postgresql_ops={'phone_number': 'varchar_pattern_ops'},
+    )
+    op.create_index('ix_users_customer_name_prefix', 'users', [sa.text('lower(customer_name) text_pattern_ops')])
+
+
+def downgrade():
+    op.drop_index('ix_users_customer_name_prefix', table_name='users')
+    op.drop_index('ix_users_phone_number_prefix', table_name='users')
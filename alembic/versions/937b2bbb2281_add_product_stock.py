@@ -0,0 +1,31 @@
+"""add_product_stock
+
+Revision ID: 937b2bbb2281
+Revises: c03f7575311d
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '937b2bbb2281'
+down_revision = 'c03f7575311d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing products stay untracked (NULL) until someone sets their stock
+    op.add_column('products', sa.Column('stock', sa.Integer(), nullable=True))
+    op.create_check_constraint('ck_products_stock_non_negative', 'products', 'stock >= 0')
+    op.add_column('order_items', sa.Column('reserved_quantity', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('order_items_archive', sa.Column('reserved_quantity', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('order_items_archive', 'reserved_quantity')
+    op.drop_column('order_items', 'reserved_quantity')
+    op.drop_constraint('ck_products_stock_non_negative', 'products', type_='check')
+    op.drop_column('products', 'stock')
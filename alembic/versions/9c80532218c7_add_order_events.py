@@ -0,0 +1,36 @@
+"""add_order_events
+
+Revision ID: 9c80532218c7
+Revises: 267b90ced233
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c80532218c7'
+down_revision = '267b90ced233'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_events',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('type', sa.String(length=40), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('previous_status', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_order_events_created_at'), 'order_events', ['created_at'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_order_events_created_at'), table_name='order_events')
+    op.drop_table('order_events')
@@ -0,0 +1,81 @@
+"""backfill_product_search_keys
+
+Revision ID: a2c8e4f6b135
+Revises: f1d6b8a2c4e7
+Create Date: 2026-10-20 09:00:00.000000
+
+Fills in products.search_key for rows written before the column existed, so
+`?q=` finds them as soon as the release is up (new writes get theirs from the
+mapper). The normalization is a frozen copy of app.services.product_search as of
+this revision, so the migration neither imports the app nor changes with it.
+"""
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c8e4f6b135'
+down_revision = 'f1d6b8a2c4e7'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+KEY_FIELDS = ("name_uz", "name_ru", "name_en", "description_uz", "description_ru", "description_en")
+APOSTROPHES = "ʻʼ’‘'`´"
+SCRIPTS = str.maketrans({
+    **dict.fromkeys(APOSTROPHES, None),
+    "а": "a", "б": "b", "в": "v", "г": "g", "ғ": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "қ": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ў": "o", "ф": "f", "х": "h", "ҳ": "h",
+    "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+})
+LATIN = (("zh", "j"), ("kh", "h"), ("q", "k"), ("x", "h"), ("w", "v"))
+NON_WORD = re.compile(r"[^a-z0-9]+")
+
+products = sa.table(
+    'products',
+    sa.column('id', sa.Integer),
+    sa.column('search_key', sa.Text),
+    *(sa.column(f, sa.Text) for f in KEY_FIELDS),
+)
+
+
+def _normalize(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text.casefold()).translate(SCRIPTS)
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    for src, dst in LATIN:
+        text = text.replace(src, dst)
+    return " ".join(NON_WORD.split(text)).strip()
+
+
+def _search_key(*texts):
+    return " ".join(dict.fromkeys(w for t in texts for w in _normalize(t).split()))
+
+
+def upgrade():
+    bind = op.get_bind()
+    # updated_at is left alone: the key is not part of what delta sync sends
+    stmt = products.update().where(products.c.id == sa.bindparam('product_id')).values(search_key=sa.bindparam('key'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(products.c.id, *(products.c[f] for f in KEY_FIELDS))
+            .where(products.c.search_key.is_(None), products.c.id > last_id)
+            .order_by(products.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(stmt, [{'product_id': r.id, 'key': _search_key(*r[1:])} for r in rows])
+        last_id = rows[-1].id
+
+
+def downgrade():
+    # Keys of the old rows stay; they are harmless and the column goes with e3a7c5b9d214's downgrade
+    pass
@@ -0,0 +1,49 @@
+"""add_sales_daily_rollup
+
+Revision ID: a40598aa0490
+Revises: cd76d1c8dfac
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a40598aa0490'
+down_revision = 'cd76d1c8dfac'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sales_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('quantity', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('revenue', sa.Numeric(14, 2), server_default='0', nullable=False),
+        sa.Column('orders_count', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('day', 'product_id', 'category_id', 'status'),
+    )
+    op.create_index('ix_sales_daily_product_day', 'sales_daily', ['product_id', 'day'])
+
+    # Backfill from existing orders (same aggregation as `python -m app.cli backfill-sales`)
+    op.execute("""
+        INSERT INTO sales_daily (day, product_id, category_id, status, quantity, revenue, orders_count)
+        SELECT o.created_at::date,
+               (i.product_snapshot ->> 'id')::int,
+               (i.product_snapshot ->> 'category_id')::int,
+               o.status::text,
+               sum(i.quantity), sum(i.subtotal), count(DISTINCT i.order_id)
+        FROM order_items i
+        JOIN orders o ON o.id = i.order_id
+        GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_sales_daily_product_day', table_name='sales_daily')
+    op.drop_table('sales_daily')
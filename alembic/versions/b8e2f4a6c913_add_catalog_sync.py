@@ -0,0 +1,37 @@
+"""add_catalog_sync
+
+Revision ID: b8e2f4a6c913
+Revises: 7d3c5a1f9e42
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f4a6c913'
+down_revision = '7d3c5a1f9e42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_products_updated_at', 'products', ['updated_at', 'id'])
+    op.create_index('ix_categories_updated_at', 'categories', ['updated_at', 'id'])
+    op.create_table(
+        'catalog_tombstones',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('entity', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_catalog_tombstones_entity_deleted_at', 'catalog_tombstones', ['entity', 'deleted_at'])
+
+
+def downgrade():
+    op.drop_index('ix_catalog_tombstones_entity_deleted_at', table_name='catalog_tombstones')
+    op.drop_table('catalog_tombstones')
+    op.drop_index('ix_categories_updated_at', table_name='categories')
+    op.drop_index('ix_products_updated_at', table_name='products')
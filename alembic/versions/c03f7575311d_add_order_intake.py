@@ -0,0 +1,39 @@
+"""add_order_intake
+
+Revision ID: c03f7575311d
+Revises: 59584ea28555
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c03f7575311d'
+down_revision = '59584ea28555'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_intake',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('token', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(length=300), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token'),
+    )
+    op.create_index('ix_order_intake_pending', 'order_intake', ['id'], postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_table('order_intake')
@@ -0,0 +1,45 @@
+"""order_items_product_id
+
+Revision ID: cab5795089b4
+Revises: a40598aa0490
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cab5795089b4'
+down_revision = 'a40598aa0490'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def upgrade():
+    op.add_column('order_items', sa.Column('product_id', sa.Integer(), nullable=True))
+
+    # Backfill and index outside the migration transaction so order writes are never blocked for long
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            res = bind.execute(sa.text("""
+                UPDATE order_items SET product_id = (product_snapshot ->> 'id')::int
+                WHERE id IN (
+                    SELECT id FROM order_items
+                    WHERE product_id IS NULL AND product_snapshot ->> 'id' IS NOT NULL
+                    LIMIT :batch
+                )
+            """), {"batch": BATCH_SIZE})
+            if res.rowcount == 0:
+                break
+        op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], postgresql_concurrently=True)
+        op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_column('order_items', 'product_id')
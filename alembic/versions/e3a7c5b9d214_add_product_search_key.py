@@ -0,0 +1,30 @@
+"""add_product_search_key
+
+Revision ID: e3a7c5b9d214
+Revises: b8e2f4a6c913
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c5b9d214'
+down_revision = 'b8e2f4a6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows are filled in by a2c8e4f6b135; new writes get their key from the mapper
+    op.add_column('products', sa.Column('search_key', sa.Text(), nullable=True))
+    op.create_index(
+        'ix_products_search_key', 'products', [sa.text("to_tsvector('simple'::regconfig, search_key)")],
+        postgresql_using='gin',
+    )
+
+
+def downgrade():
+    op.drop_index('ix_products_search_key', table_name='products')
+    op.drop_column('products', 'search_key')
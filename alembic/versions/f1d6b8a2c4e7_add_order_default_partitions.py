@@ -0,0 +1,28 @@
+"""add_order_default_partitions
+
+Revision ID: f1d6b8a2c4e7
+Revises: e3a7c5b9d214
+Create Date: 2026-10-19 23:00:00.000000
+
+DEFAULT partitions for orders / order_items, so inserts for a month without a
+partition land there instead of failing. They are expected to stay empty; the
+worker reports rows in them (order_partition_default_rows).
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d6b8a2c4e7'
+down_revision = 'e3a7c5b9d214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT")
+    op.execute("CREATE TABLE IF NOT EXISTS order_items_default PARTITION OF order_items DEFAULT")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS order_items_default")
+    op.execute("DROP TABLE IF EXISTS orders_default")
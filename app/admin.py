@@ -4,7 +4,7 @@ from starlette.requests import Request
 from app.db.models.user import User, RoleEnum
 from app.db.models.category import Category
 from app.db.models.product import Product
-from app.db.models.order import Order
+from app.db.models.order import Order, OrderArchive
 from app.core.config import settings
 from sqlalchemy import select
 from app.db.session import SessionLocal
@@ -60,6 +60,8 @@ class CategoryAdmin(ModelView, model=Category):
 class ProductAdmin(ModelView, model=Product):
     column_list = [Product.id, Product.name_uz, Product.price, Product.category]
     column_searchable_list = [Product.name_uz, Product.name_ru, Product.name_en]
+    # Derived from the names/descriptions on save (app.services.product_search)
+    form_excluded_columns = [Product.search_key]
     icon = "fa-solid fa-box"
 
 class OrderAdmin(ModelView, model=Order):
@@ -68,6 +70,16 @@ class OrderAdmin(ModelView, model=Order):
     column_default_sort = ("created_at", True)
     icon = "fa-solid fa-cart-shopping"
 
+class OrderArchiveAdmin(ModelView, model=OrderArchive):
+    name = "Archived order"
+    name_plural = "Archived orders"
+    column_list = [OrderArchive.id, OrderArchive.user, OrderArchive.status, OrderArchive.created_at, OrderArchive.archived_at]
+    column_sortable_list = [OrderArchive.created_at, OrderArchive.id]
+    column_default_sort = ("created_at", True)
+    can_create = False
+    can_edit = False
+    icon = "fa-solid fa-box-archive"
+
 def setup_admin(app, engine):
     authentication_backend = AdminAuth(secret_key=settings.SECRET_KEY)
     admin = Admin(
@@ -81,3 +93,4 @@ def setup_admin(app, engine):
     admin.add_view(CategoryAdmin)
     admin.add_view(ProductAdmin)
     admin.add_view(OrderAdmin)
+    admin.add_view(OrderArchiveAdmin)
@@ -0,0 +1,124 @@
+"""
+Maintenance commands, run from the project root:
+
+    python -m app.cli backfill-sales [--date-from 2025-01-01] [--date-to 2025-01-31]
+    python -m app.cli create-partitions [--months-ahead 3]
+    python -m app.cli archive-orders [--older-than-days 120] [--batch-size 500]
+    python -m app.cli prune-order-events [--older-than-days 7]
+    python -m app.cli prune-jobs [--older-than-days 7]
+    python -m app.cli expire-reservations [--older-than-minutes 120]
+    python -m app.cli prune-tombstones [--older-than-days 30]
+    python -m app.cli backfill-search-keys [--batch-size 500]
+"""
+import argparse
+from datetime import date
+from app.db.session import SessionLocal, engine
+from app.core.config import settings
+# Register every mapper up front; the CLI does not go through app.main
+from app.db.models import user, category, product, order, analytics, job, catalog_tombstone  # noqa
+
+
+def backfill_sales(args):
+    from app.services.analytics_service import rebuild_sales_rollup
+    with SessionLocal() as db:
+        rows = rebuild_sales_rollup(db, args.date_from, args.date_to)
+    print(f"sales_daily rebuilt: {rows} rows")
+
+
+def create_partitions(args):
+    from app.db.partitions import ensure_order_partitions, default_rows
+    with engine.begin() as conn:
+        created = ensure_order_partitions(conn, args.months_ahead)
+        stray = default_rows(conn)
+    print(f"partitions created: {', '.join(created) or 'none'}")
+    if stray:
+        print(f"WARNING: rows in the default partitions: {stray}")
+
+
+def archive_orders(args):
+    from app.services.archive_service import archive_orders as run
+    with SessionLocal() as db:
+        moved = run(db, args.older_than_days, args.batch_size, args.pause)
+    print(f"orders archived: {moved}")
+
+
+def prune_order_events(args):
+    from app.services.order_events import prune_events
+    with SessionLocal() as db:
+        deleted = prune_events(db, args.older_than_days)
+    print(f"order events pruned: {deleted}")
+
+
+def prune_jobs(args):
+    from app.services.job_queue import prune_jobs as run
+    with SessionLocal() as db:
+        deleted = run(db, args.older_than_days)
+    print(f"jobs pruned: {deleted}")
+
+
+def expire_reservations(args):
+    from app.services.order_service import expire_reservations as run
+    with SessionLocal() as db:
+        cancelled = run(db, args.older_than_minutes)
+    print(f"orders cancelled: {cancelled}")
+
+
+def prune_tombstones(args):
+    from app.services.catalog_sync import prune_tombstones as run
+    with SessionLocal() as db:
+        deleted = run(db, args.older_than_days)
+    print(f"catalog tombstones pruned: {deleted}")
+
+
+def backfill_search_keys(args):
+    from app.services.product_search import backfill
+    with SessionLocal() as db:
+        updated = backfill(db, args.batch_size)
+    print(f"product search keys filled in: {updated}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("backfill-sales", help="Rebuild the sales_daily rollup from order_items")
+    p.add_argument("--date-from", type=date.fromisoformat, default=None)
+    p.add_argument("--date-to", type=date.fromisoformat, default=None)
+    p.set_defaults(func=backfill_sales)
+
+    p = sub.add_parser("create-partitions", help="Create upcoming monthly orders/order_items partitions")
+    p.add_argument("--months-ahead", type=int, default=settings.ORDER_PARTITIONS_AHEAD)
+    p.set_defaults(func=create_partitions)
+
+    p = sub.add_parser("archive-orders", help="Move old done/cancelled orders into the archive tables")
+    p.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    p.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    p.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches")
+    p.set_defaults(func=archive_orders)
+
+    p = sub.add_parser("prune-order-events", help="Delete order events past the replay window")
+    p.add_argument("--older-than-days", type=int, default=settings.ORDER_EVENTS_RETENTION_DAYS)
+    p.set_defaults(func=prune_order_events)
+
+    p = sub.add_parser("prune-jobs", help="Delete finished background jobs")
+    p.add_argument("--older-than-days", type=int, default=settings.JOB_RETENTION_DAYS)
+    p.set_defaults(func=prune_jobs)
+
+    p = sub.add_parser("expire-reservations", help="Cancel checking orders whose stock reservation timed out")
+    p.add_argument("--older-than-minutes", type=int, default=settings.STOCK_RESERVATION_MINUTES)
+    p.set_defaults(func=expire_reservations)
+
+    p = sub.add_parser("prune-tombstones", help="Delete catalog tombstones past the delta-sync window")
+    p.add_argument("--older-than-days", type=int, default=settings.CATALOG_TOMBSTONE_RETENTION_DAYS)
+    p.set_defaults(func=prune_tombstones)
+
+    p = sub.add_parser("backfill-search-keys", help="Compute missing product search keys")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.set_defaults(func=backfill_search_keys)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Admission control. Every request is sorted into a route class with its own concurrency budget
+(ADMISSION_LIMITS); when a class is full, requests wait up to ADMISSION_QUEUE_TIMEOUT for a slot
+and are then refused with `503` + `Retry-After` instead of piling up in the threadpool and the
+DB pool. Non-checkout classes are also refused while the DB pool is down to its last
+ADMISSION_CHECKOUT_RESERVED_CONNECTIONS connections, so placing orders keeps working when the
+catalog or admin pages overload the database. Health checks, metrics scrapes, order event streams
+and intake long polls are never held.
+"""
+import asyncio
+import re
+import time
+from collections import deque
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from app.core import metrics
+from app.core.config import settings
+from app.core.i18n import get_lang
+from app.core.response import BaseHTTPException, ErrorCodes
+from app.db.session import engine
+
+READ = {"GET", "HEAD"}
+
+# First match wins; class None means the request is not admission-controlled
+ROUTE_CLASSES: list[tuple[set[str] | None, re.Pattern, str | None]] = [
+    (None, re.compile(r"/api/v1/system/(health|metrics)$"), None),
+    # Long-lived SSE streams and intake long polls hold no DB connection while they wait on the
+    # event hub; a slot would be held for the whole wait (up to 30 s) for nothing
+    (READ, re.compile(r"/api/v1/orders/(events|intake/[^/]+)$"), None),
+    (READ, re.compile(r"/api/v1/orders/\d+/receipt$"), "receipts"),
+    ({"POST"}, re.compile(r"/api/v1/orders$"), "checkout"),
+    (None, re.compile(r"/api/v1/auth/(register|login|set-telegram-id|get-me)$"), "checkout"),
+    (READ, re.compile(r"/api/v1/(products|categories)(/|$)"), "catalog"),
+    (READ, re.compile(r"/api/v1/bootstrap$"), "catalog"),
+    # A read, even though long id lists come as a POST
+    ({"POST"}, re.compile(r"/api/v1/products/batch$"), "catalog"),
+    (READ, re.compile(r"/static/"), "catalog"),
+    (None, re.compile(r"/api/v1/(products|categories|files|analytics|system|admin)(/|$)"), "admin"),
+    (None, re.compile(r"/api/v1/auth/"), "admin"),
+    (READ, re.compile(r"/api/v1/orders$"), "admin"),
+    (None, re.compile(r"/api/v1/orders/(bulk/|\d+/(verify|complete)$)"), "admin"),
+]
+DEFAULT_CLASS = "default"
+
+
+def classify(method: str, path: str) -> str | None:
+    for methods, pattern, route_class in ROUTE_CLASSES:
+        if (methods is None or method in methods) and pattern.match(path):
+            return route_class
+    return DEFAULT_CLASS
+
+
+class Budget:
+    """
+    Concurrency limit with a bounded FIFO of waiters. Lives on the server's event loop, so
+    there is no locking; a freed slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            return True
+        if timeout <= 0 or len(self.waiters) >= self.limit * settings.ADMISSION_QUEUE_FACTOR:
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return fut.done() and not fut.cancelled()
+        except asyncio.CancelledError:
+            # The client went away while queued; a slot handed over meanwhile goes to the next waiter
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            try:
+                self.waiters.remove(fut)
+            except ValueError:
+                pass
+
+    def release(self):
+        while self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.in_flight -= 1
+
+
+budgets: dict[str, Budget] = {name: Budget(name, limit) for name, limit in settings.ADMISSION_LIMITS.items()}
+budgets.setdefault(DEFAULT_CLASS, Budget(DEFAULT_CLASS, 16))
+
+REJECTED = metrics.counter("admission_rejected_total", "Requests refused with 503 by admission control.", ("route_class", "reason"))
+WAIT = metrics.histogram(
+    "admission_wait_seconds", "Time admitted requests waited for a slot.", ("route_class",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+metrics.gauge(
+    "admission_in_flight", "Requests holding an admission slot.", ("route_class",),
+    fn=lambda: {(name,): b.in_flight for name, b in budgets.items()},
+)
+
+
+def db_pool_busy() -> bool:
+    """True when only the connections reserved for checkout are left in the pool."""
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return engine.pool.checkedout() >= capacity - settings.ADMISSION_CHECKOUT_RESERVED_CONNECTIONS
+
+
+def overloaded_response(scope, route_class: str) -> JSONResponse:
+    exc = BaseHTTPException(503, ErrorCodes.SERVICE_UNAVAILABLE, "Server is busy, please retry shortly.", {"route_class": route_class})
+    return JSONResponse(
+        status_code=503,
+        content=exc.to_response(lang=get_lang(Request(scope)), trace_id=scope.get("state", {}).get("trace_id")),
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+    )
+
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            return await self.app(scope, receive, send)
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            return await self.app(scope, receive, send)
+
+        budget = budgets.get(route_class) or budgets[DEFAULT_CLASS]
+        if route_class != "checkout" and db_pool_busy():
+            REJECTED.inc(route_class=route_class, reason="db_pool")
+            return await overloaded_response(scope, route_class)(scope, receive, send)
+        started = time.perf_counter()
+        if not await budget.acquire(settings.ADMISSION_QUEUE_TIMEOUT):
+            REJECTED.inc(route_class=route_class, reason="budget")
+            return await overloaded_response(scope, route_class)(scope, receive, send)
+        WAIT.observe(time.perf_counter() - started, route_class=route_class)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
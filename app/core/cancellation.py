@@ -0,0 +1,126 @@
+"""
+Stop work for clients that have gone away. DisconnectMiddleware watches the connection while the
+endpoint runs; on `http.disconnect` it cancels the request's in-flight SQL (the sessions from
+`get_db` register their connections here) and flags the request so long-running Python work
+(receipt PDFs, image fetches) can bail out at its next `check()`:
+
+    for item in items:
+        cancellation.check()      # raises ClientDisconnected
+        ...
+"""
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar
+from app.core import metrics
+
+log = logging.getLogger(__name__)
+
+CANCELLED = metrics.counter(
+    "db_statements_cancelled_total", "SQL statements cancelled, by reason (timeout/disconnect).", ("reason",),
+)
+ABANDONED = metrics.counter(
+    "requests_abandoned_total", "Requests whose work was stopped because the client disconnected, by stage.", ("stage",),
+)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class RequestCancellation:
+    def __init__(self):
+        self.disconnected = False
+        self._connections: set = set()
+        self._lock = threading.Lock()
+
+    def register(self, dbapi_connection):
+        with self._lock:
+            self._connections.add(dbapi_connection)
+
+    def unregister(self, dbapi_connection):
+        with self._lock:
+            self._connections.discard(dbapi_connection)
+
+    def cancel_queries(self) -> int:
+        """Ask Postgres to cancel whatever the request's connections are running (blocking; call off the loop)."""
+        with self._lock:
+            connections = list(self._connections)
+            for conn in connections:
+                try:
+                    conn.cancel()
+                except Exception:
+                    log.debug("could not cancel a query", exc_info=True)
+        return len(connections)
+
+
+_current: ContextVar[RequestCancellation | None] = ContextVar("request_cancellation", default=None)
+
+
+def current() -> RequestCancellation | None:
+    return _current.get()
+
+
+def check(stage: str = "app"):
+    """Raise ClientDisconnected if the current request's client is gone."""
+    ctx = _current.get()
+    if ctx is not None and ctx.disconnected:
+        ABANDONED.inc(stage=stage)
+        raise ClientDisconnected()
+
+
+def _has_body(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    return b"transfer-encoding" in headers or headers.get(b"content-length", b"0") not in (b"", b"0")
+
+
+class DisconnectMiddleware:
+    """
+    Watch for the client disconnecting once the request body has been read. Reading the body
+    stays with the app; afterwards only the watcher calls the server's `receive`, and the app's
+    later `receive` calls (streaming responses listening for disconnects) are answered from it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        ctx = RequestCancellation()
+        token = _current.set(ctx)
+        # Messages the watcher read on the app's behalf
+        relayed: asyncio.Queue[dict] = asyncio.Queue()
+        watcher: asyncio.Task | None = None
+
+        async def watch():
+            while True:
+                message = await receive()
+                relayed.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    ctx.disconnected = True
+                    if await asyncio.get_running_loop().run_in_executor(None, ctx.cancel_queries):
+                        ABANDONED.inc(stage="db")
+                    return
+
+        async def app_receive():
+            nonlocal watcher
+            if watcher is not None:
+                if ctx.disconnected and relayed.empty():
+                    return {"type": "http.disconnect"}
+                return await relayed.get()
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.create_task(watch())
+            elif message["type"] == "http.disconnect":
+                ctx.disconnected = True
+            return message
+
+        if not _has_body(scope):
+            watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, app_receive, send)
+        finally:
+            if watcher is not None and not watcher.done():
+                watcher.cancel()
+            _current.reset(token)
@@ -16,6 +16,109 @@ class Settings(BaseSettings):
 
     SECRET_KEY: str = "change_this_secret_key_in_production"
 
+    # Monthly orders/order_items partitions to keep created ahead of the current month; the worker
+    # re-checks every ORDER_PARTITIONS_CHECK_INTERVAL seconds
+    ORDER_PARTITIONS_AHEAD: int = 3
+    ORDER_PARTITIONS_CHECK_INTERVAL: int = 6 * 3600
+
+    # Done/cancelled orders older than this move to the archive tables
+    ARCHIVE_AFTER_DAYS: int = 120
+    ARCHIVE_BATCH_SIZE: int = 500
+
+    # How long order events stay replayable for SSE clients resuming with Last-Event-ID
+    ORDER_EVENTS_RETENTION_DAYS: int = 7
+
+    # Background jobs (python -m app.worker): max jobs running at once per queue, across all workers
+    JOB_QUEUES: dict[str, int] = {"default": 1, "receipts": 2, "images": 2, "intake": 1}
+    JOB_POLL_INTERVAL: float = 2.0
+    JOB_LEASE_SECONDS: int = 300
+    JOB_BACKOFF_BASE: float = 5.0
+    JOB_BACKOFF_MAX: float = 600.0
+    JOB_RETENTION_DAYS: int = 7
+
+    # Async order intake: POST /orders answers 202 and a writer creates the orders in batches.
+    # Off by default; clients can also opt in per request with `Prefer: respond-async`.
+    ORDER_INTAKE_ASYNC: bool = False
+    ORDER_INTAKE_BATCH_SIZE: int = 200
+    # Seconds a worker serves prices/names from its in-process product map
+    PRODUCT_CACHE_TTL: float = 30.0
+    # Seconds a worker serves the category list (bootstrap) from memory
+    CATEGORY_CACHE_TTL: float = 60.0
+    # Most ids one GET/POST /products/batch may ask for
+    PRODUCT_BATCH_MAX_IDS: int = 200
+    # GET /products?facets=price buckets (so'm): [0, 50k), [50k, 100k), ... and one open bucket past the last
+    PRICE_FACET_BOUNDS: list[float] = [0, 50_000, 100_000, 200_000, 500_000, 1_000_000]
+    # Facet results a worker keeps per filter combination, and for how many seconds
+    FACET_CACHE_SIZE: int = 256
+    FACET_CACHE_TTL: float = 60.0
+    # GET /products/suggest: default/maximum suggestions, ranked by units sold over the last
+    # SUGGEST_POPULARITY_DAYS; prefixes are indexed up to SUGGEST_MAX_PREFIX characters and every
+    # worker reloads its index every SUGGEST_REBUILD_INTERVAL seconds
+    SUGGEST_LIMIT: int = 8
+    SUGGEST_MAX_LIMIT: int = 20
+    SUGGEST_MAX_PREFIX: int = 16
+    SUGGEST_POPULARITY_DAYS: int = 30
+    SUGGEST_REBUILD_INTERVAL: float = 300.0
+    # Delta sync re-sends this many seconds of changes, covering writes that committed late
+    CATALOG_SYNC_OVERLAP_SECONDS: int = 60
+    # Deleted product/category ids are kept this long; older sync tokens must reload everything
+    CATALOG_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # Stock held by unverified (`checking`) orders is released by cancelling them after this long;
+    # the worker checks every STOCK_EXPIRY_INTERVAL seconds
+    STOCK_RESERVATION_MINUTES: int = 120
+    STOCK_EXPIRY_INTERVAL: int = 60
+
+    # Pre-rendered order receipts (written by the worker, served by GET /orders/{id}/receipt)
+    RECEIPTS_DIR: str = "app/media/receipts"
+    # Uploaded images larger than this (px, longest side) are scaled down in the background
+    IMAGE_MAX_SIDE: int = 1600
+
+    # Per-request SQL accounting: an `X-DB-Stats` response header and a log line ("app.db" logger,
+    # warning above QUERY_COUNT_WARN statements). Strict mode turns implicit lazy loads into errors.
+    QUERY_STATS_HEADER: bool = True
+    QUERY_COUNT_WARN: int = 30
+    DB_RAISE_ON_LAZY_LOAD: bool = False
+
+    # `Server-Timing` response header (auth, db, serialize, pdf, img, total) and a JSON timing log
+    # line ("app.timing") for this fraction of requests; slower or 5xx requests are always logged
+    SERVER_TIMING_HEADER: bool = True
+    TIMING_LOG_SAMPLE_RATE: float = 0.01
+    TIMING_LOG_SLOW_MS: float = 1000.0
+
+    # Statements slower than this are logged ("app.db.slow") and aggregated per fingerprint in
+    # `slow_queries` (GET /system/slow-queries); 0 disables. A sample of slow SELECTs is re-run
+    # under EXPLAIN (ANALYZE, BUFFERS), at most once per fingerprint per interval (seconds).
+    SLOW_QUERY_MS: float = 500.0
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.2
+    SLOW_QUERY_EXPLAIN_INTERVAL: float = 600.0
+
+    # Admission control: concurrent requests per route class (see app/core/admission.py). A full
+    # class queues up to ADMISSION_QUEUE_FACTOR x limit requests for ADMISSION_QUEUE_TIMEOUT seconds,
+    # then answers 503 with Retry-After. The last ADMISSION_CHECKOUT_RESERVED_CONNECTIONS pool
+    # connections are kept for checkout. Keep the sum of the limits under the threadpool size (40).
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: dict[str, int] = {"catalog": 12, "checkout": 12, "admin": 4, "receipts": 2, "default": 8}
+    ADMISSION_QUEUE_TIMEOUT: float = 1.0
+    ADMISSION_QUEUE_FACTOR: int = 4
+    ADMISSION_RETRY_AFTER: int = 2
+    ADMISSION_CHECKOUT_RESERVED_CONNECTIONS: int = 3
+
+    # statement_timeout (ms) per admission route class for sessions from get_db; 0 = server default
+    STATEMENT_TIMEOUTS_MS: dict[str, int] = {"catalog": 3000, "checkout": 10000, "admin": 30000, "receipts": 10000, "default": 5000}
+
+    # SQLAlchemy connection pool. Waiting longer than DB_POOL_TIMEOUT for a connection answers 503.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0
+
+    # Prometheus metrics (GET /api/v1/system/metrics). Each process snapshots its metrics into
+    # METRICS_DIR so one scrape covers every API/worker process on the host; empty = this process only.
+    # With METRICS_TOKEN set, scrapes must send `Authorization: Bearer <token>`.
+    METRICS_DIR: str | None = "app/media/metrics"
+    METRICS_FLUSH_INTERVAL: float = 5.0
+    METRICS_TOKEN: str | None = None
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,22 +1,66 @@
 from __future__ import annotations
-from typing import Generator
-from fastapi import Depends, Header
+from contextlib import contextmanager
+from typing import Generator, Iterator
+from fastapi import Depends, Header, Request
+from sqlalchemy import event
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal, engine
 from app.db.models.user import User, RoleEnum
 from app.core.response import BaseHTTPException, ErrorCodes
 from app.core.config import settings
+from app.core import timing, cancellation
+from app.core.admission import classify
 
 
-def get_db() -> Generator[Session, None, None]:
+def statement_timeout_ms(request: Request | None) -> int:
+    if request is None:
+        return 0
+    route_class = classify(request.method, request.url.path)
+    return settings.STATEMENT_TIMEOUTS_MS.get(route_class or "", 0)
+
+
+@contextmanager
+def request_session(request: Request | None) -> Iterator[Session]:
+    """
+    Session serving `request`. Every transaction it opens gets the route class's statement_timeout
+    and is registered for cancellation if the client disconnects. Endpoints that query from
+    several threads at once open one per thread.
+    """
     db = SessionLocal()
+    timeout = statement_timeout_ms(request)
+    ctx = cancellation.current()
+    in_use = {}
+
+    @event.listens_for(db, "after_begin")
+    def on_begin(session, transaction, connection):
+        # Savepoints run inside the outer transaction, which already has both
+        if transaction.nested:
+            return
+        if ctx is not None:
+            cancellation.check("db")
+            in_use[transaction] = connection.connection.dbapi_connection
+            ctx.register(in_use[transaction])
+        if timeout:
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+    @event.listens_for(db, "after_transaction_end")
+    def on_end(session, transaction):
+        if transaction in in_use:
+            ctx.unregister(in_use.pop(transaction))
+
     try:
         yield db
     finally:
         db.close()
 
 
+def get_db(request: Request = None) -> Generator[Session, None, None]:
+    with request_session(request) as db:
+        yield db
+
+
 def get_current_user(
     telegram_id: int | None = Header(None, alias="X-Telegram-Id"),
     db: Session = Depends(get_db)
@@ -24,7 +68,8 @@ def get_current_user(
     if not telegram_id:
         raise BaseHTTPException(401, ErrorCodes.AUTH_FAILED, "Authentication required (X-Telegram-Id missing)")
 
-    user = db.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
+    with timing.span("auth"):
+        user = db.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
 
     if not user:
         raise BaseHTTPException(401, ErrorCodes.AUTH_FAILED, "User not found or Telegram ID not set.")
@@ -40,20 +85,39 @@ def admin_required(user: User = Depends(get_current_user)) -> User:
 
 async def create_db_and_init_admin():
     from app.db.base import Base
+    from app.db.partitions import ensure_order_partitions
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        ensure_order_partitions(conn, settings.ORDER_PARTITIONS_AHEAD)
+
+    with SessionLocal() as db:
+        seed_admin(db)
 
+    # Worker jobs; the dedupe keys keep restarts of several API workers from piling them up
+    from app.services import job_queue
     with SessionLocal() as db:
-        # Check if any admin exists
-        exists = db.execute(
-            select(User).where(User.role == RoleEnum.admin)
-        ).first()
-
-        if not exists and settings.INIT_ADMIN_PHONE:
-            new_admin = User(
-                customer_name=settings.INIT_ADMIN_NAME,
-                phone_number=settings.INIT_ADMIN_PHONE,
-                telegram_id=settings.INIT_ADMIN_TELEGRAM_ID,
-                role=RoleEnum.admin
-            )
-            db.add(new_admin)
-            db.commit()
\ No newline at end of file
+        # Self-rescheduling from here on
+        job_queue.enqueue(db, "orders.expire_reservations", dedupe_key="orders.expire_reservations")
+        job_queue.enqueue(db, "orders.ensure_partitions", dedupe_key="orders.ensure_partitions")
+        db.commit()
+
+
+def seed_admin(db: Session):
+    """Create the INIT_ADMIN_* user unless an admin already exists (cheap and idempotent, runs on every startup)."""
+    exists = db.execute(
+        select(User).where(User.role == RoleEnum.admin)
+    ).first()
+
+    if not exists and settings.INIT_ADMIN_PHONE:
+        new_admin = User(
+            customer_name=settings.INIT_ADMIN_NAME,
+            phone_number=settings.INIT_ADMIN_PHONE,
+            telegram_id=settings.INIT_ADMIN_TELEGRAM_ID,
+            role=RoleEnum.admin
+        )
+        db.add(new_admin)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another API worker seeded it at the same moment
+            db.rollback()
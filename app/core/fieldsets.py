@@ -0,0 +1,89 @@
+"""
+Sparse fieldsets for the catalog read endpoints.
+
+    GET /products?fields=id,name,price      only these keys
+    GET /products?compact=true              every field, names/descriptions in the request language only
+    GET /products?format=columnar           {"id": [...], "name": [...], ...}: one array per field
+
+The selection is pushed into the SQL: only the requested columns are selected (localized fields
+already resolved to the request language, prices already cast to float) and the rows go out as
+plain dicts (or columns), without ORM instances or response-model validation. Without any of
+these parameters the endpoints keep returning the full representation.
+"""
+from fastapi import Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import Float, Numeric, cast
+from app.core.response import BaseHTTPException, ErrorCodes, base_success
+
+# Served from the `<field>_<lang>` column of the request language
+LOCALIZED = {"name", "description"}
+
+PRODUCT_FIELDS = (
+    "id", "name", "name_uz", "name_ru", "name_en",
+    "description", "description_uz", "description_ru", "description_en",
+    "price", "image_url", "category_id", "stock",
+)
+PRODUCT_COMPACT = ("id", "name", "description", "price", "image_url", "category_id", "stock")
+
+CATEGORY_FIELDS = ("id", "name", "name_uz", "name_ru", "name_en")
+CATEGORY_COMPACT = ("id", "name")
+
+
+def fieldset_params(
+    fields: str | None = Query(None, description="Comma separated fields to return, e.g. id,name,price"),
+    compact: bool = Query(False, description="Only the request language's name/description"),
+) -> tuple[str | None, bool]:
+    return fields, compact
+
+
+def format_param(
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="columnar: one array per field instead of one object per item"),
+) -> str:
+    return format
+
+
+def resolve(params: tuple[str | None, bool], allowed: tuple[str, ...], compact_fields: tuple[str, ...], format: str = "rows") -> list[str] | None:
+    """Field names to return, or None for the full representation."""
+    fields, compact = params
+    if fields:
+        names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [n for n in names if n not in allowed]
+        if unknown or not names:
+            raise BaseHTTPException(
+                422, ErrorCodes.VALIDATION_ERROR, "Unknown fields requested.",
+                {"fields": {n: f"Not one of: {', '.join(allowed)}" for n in unknown or ["fields"]}},
+            )
+        return names
+    if compact:
+        return list(compact_fields)
+    if format == "columnar":
+        return list(allowed)
+    return None
+
+
+def columns(model, names: list[str], lang: str) -> list:
+    cols = []
+    for name in names:
+        col = getattr(model, f"{name}_{lang}" if name in LOCALIZED else name)
+        if isinstance(col.type, Numeric):
+            col = cast(col, Float)
+        cols.append(col.label(name))
+    return cols
+
+
+def rows_to_dicts(rows, names: list[str]) -> list[dict]:
+    return [dict(zip(names, row)) for row in rows]
+
+
+def rows_to_columns(rows, names: list[str]) -> dict[str, list]:
+    columns = list(zip(*rows)) or [()] * len(names)
+    return {name: list(values) for name, values in zip(names, columns)}
+
+
+def encode(rows, names: list[str], format: str = "rows"):
+    return rows_to_columns(rows, names) if format == "columnar" else rows_to_dicts(rows, names)
+
+
+def sparse_response(data, lang: str, pagination: dict | None = None, facets: dict | None = None) -> JSONResponse:
+    # Already plain JSON types; skip response-model validation
+    return JSONResponse(base_success(data, lang=lang, pagination=pagination, facets=facets))
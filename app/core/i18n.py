@@ -2,6 +2,6 @@ from fastapi import Request
 
 def get_lang(request: Request) -> str:
     lang = request.query_params.get("lang", "").lower()
-    if lang not in {"uz", "ru"}:
+    if lang not in {"uz", "ru", "en"}:
         lang = "uz"
     return lang
@@ -0,0 +1,262 @@
+"""
+Dependency-free metrics registry exported in the Prometheus text format.
+
+    requests = metrics.counter("http_requests_total", "HTTP requests.", ("route", "status"))
+    requests.inc(route="/products", status="200")
+
+Every process (API workers and `python -m app.worker`) writes a snapshot to METRICS_DIR every
+METRICS_FLUSH_INTERVAL seconds; `GET /api/v1/system/metrics` merges the snapshots, summing
+counters and histograms and labelling gauges with the process id. Without METRICS_DIR only the
+serving process is reported.
+"""
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Snapshots of exited processes are dropped after this long (counters then reset, which rate() handles)
+STALE_SNAPSHOT_SECONDS = 3600
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = [[list(k), v if not isinstance(v, list) else list(v)] for k, v in self._values.items()]
+        return {"type": self.type, "help": self.help, "labels": list(self.labelnames), "samples": samples}
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, value: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(Metric):
+    """Set directly, or computed at snapshot time from `fn` returning {label values: value}."""
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn: Callable[[], dict[tuple, float]] | None = None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def snapshot(self) -> dict:
+        if self.fn is not None:
+            values = self.fn()
+            with self._lock:
+                self._values = {tuple(str(v) for v in k): float(v) for k, v in values.items()}
+        return super().snapshot()
+
+
+class Histogram(Metric):
+    """Stored per label set as [bucket counts..., +Inf count, sum] (bucket counts are not cumulative)."""
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = next((n for n, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def snapshot(self) -> dict:
+        snap = super().snapshot()
+        snap["buckets"] = list(self.buckets)
+        return snap
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, *args, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = (), fn=None) -> Gauge:
+        return self._register(Gauge, name, help, labelnames, fn=fn)
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def snapshot(self) -> dict:
+        return {"pid": os.getpid(), "at": time.time(), "metrics": {n: m.snapshot() for n, m in list(self.metrics.items())}}
+
+    # --- multi-process -------------------------------------------------------
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR (atomically)."""
+        if not settings.METRICS_DIR:
+            return
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)
+
+    def start_flusher(self):
+        """Flush every METRICS_FLUSH_INTERVAL seconds from a daemon thread (idempotent per process)."""
+        if not settings.METRICS_DIR or (self._flusher is not None and self._flusher.is_alive()):
+            return
+
+        def loop():
+            while True:
+                time.sleep(settings.METRICS_FLUSH_INTERVAL)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    def collect(self) -> list[dict]:
+        """This process's live snapshot plus the latest snapshot of every other process."""
+        own = self.snapshot()
+        if not settings.METRICS_DIR:
+            return [own]
+        self.flush()
+        snapshots = [own]
+        for path in Path(settings.METRICS_DIR).glob("*.json"):
+            try:
+                snap = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if snap["pid"] == own["pid"]:
+                continue
+            alive = _pid_alive(snap["pid"])
+            if not alive and time.time() - snap["at"] > STALE_SNAPSHOT_SECONDS:
+                path.unlink(missing_ok=True)
+                continue
+            snap["alive"] = alive
+            snapshots.append(snap)
+        return snapshots
+
+    def render(self) -> str:
+        return render(self.collect())
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: dict | None = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def render(snapshots: list[dict]) -> str:
+    """Merge per-process snapshots into one Prometheus text exposition."""
+    merged: dict[str, dict] = {}
+    for snap in snapshots:
+        for name, m in snap["metrics"].items():
+            out = merged.setdefault(name, {**m, "samples": {}})
+            for labelvalues, value in m["samples"]:
+                if m["type"] == "gauge":
+                    # Gauges describe one process; exited processes no longer have a current value
+                    if snap.get("alive") is False:
+                        continue
+                    out["samples"][(*labelvalues, str(snap["pid"]))] = value
+                elif m["type"] == "histogram":
+                    cur = out["samples"].get(tuple(labelvalues))
+                    out["samples"][tuple(labelvalues)] = value if cur is None else [a + b for a, b in zip(cur, value)]
+                else:
+                    key = tuple(labelvalues)
+                    out["samples"][key] = out["samples"].get(key, 0.0) + value
+
+    lines = []
+    for name in sorted(merged):
+        m = merged[name]
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['type']}")
+        for key, value in sorted(m["samples"].items()):
+            if m["type"] == "gauge":
+                lines.append(f"{name}{_labels(m['labels'] + ['pid'], key)} {_num(value)}")
+            elif m["type"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(m["buckets"] + [math.inf], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(m['labels'], key, {'le': _num(bound)})} {cumulative}")
+                lines.append(f"{name}_sum{_labels(m['labels'], key)} {_num(value[-1])}")
+                lines.append(f"{name}_count{_labels(m['labels'], key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(m['labels'], key)} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+# --- metrics shared across modules ---------------------------------------------
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+HTTP_DURATION = histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+HTTP_DB_STATEMENTS = counter("http_request_db_statements_total", "SQL statements run while serving requests.", ("route",))
+HTTP_DB_SECONDS = counter("http_request_db_seconds_total", "Time spent in SQL while serving requests.", ("route",))
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+RECEIPT_RENDER = histogram(
+    "receipt_render_seconds", "Receipt PDF render time by where it ran (inline/worker).", ("source",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+ORDER_PARTITIONS_AHEAD = gauge("order_partitions_months_ahead", "Months after the current one with order partitions in place (worker check).")
+ORDER_PARTITION_DEFAULT_ROWS = gauge(
+    "order_partition_default_rows", "Rows in the DEFAULT orders/order_items partitions; should be 0 (worker check).", ("table",),
+)
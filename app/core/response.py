@@ -8,10 +8,15 @@ class ErrorCodes:
     FORBIDDEN = "FORBIDDEN"
     NOT_FOUND = "NOT_FOUND"
     INVALID_ORDER = "INVALID_ORDER"
+    PRICE_CHANGED = "PRICE_CHANGED"
+    OUT_OF_STOCK = "OUT_OF_STOCK"
     VALIDATION_ERROR = "VALIDATION_ERROR"
     DUPLICATE = "DUPLICATE"
     RATE_LIMITED = "RATE_LIMITED"
     INTERNAL_ERROR = "INTERNAL_ERROR"
+    SERVICE_UNAVAILABLE = "SERVICE_UNAVAILABLE"
+    TIMEOUT = "TIMEOUT"
+    SYNC_TOKEN_EXPIRED = "SYNC_TOKEN_EXPIRED"
 
 class BaseHTTPException(Exception):
     def __init__(self, status_code: int, code: str, message: str, details: Optional[Dict[str, Any]] = None):
@@ -31,10 +36,12 @@ class BaseHTTPException(Exception):
             "meta": meta,
         }
 
-def base_success(data: Any = None, lang: str = "uz", pagination: dict | None = None, trace_id: str | None = None):
+def base_success(data: Any = None, lang: str = "uz", pagination: dict | None = None, trace_id: str | None = None, facets: dict | None = None):
     meta: dict = {"lang": lang}
     if pagination:
         meta["pagination"] = pagination
+    if facets:
+        meta["facets"] = facets
     if trace_id:
         meta["trace_id"] = trace_id
     return {"success": True, "data": data, "error": None, "meta": meta}
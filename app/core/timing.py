@@ -0,0 +1,164 @@
+"""
+Per-request timing breakdown. The trace-id middleware opens a RequestTiming per request; code
+on the request path adds named spans:
+
+    with timing.span("pdf"):
+        pdf = generate_order_pdf(data)
+
+The result goes out as a `Server-Timing` header (auth, db, serialize, pdf, img, total) and, for
+a TIMING_LOG_SAMPLE_RATE sample of requests plus every slow or failed one, as a JSON log line
+on the "app.timing" logger. Outside a request (the worker) spans cost one ContextVar lookup.
+"""
+import asyncio
+import functools
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from fastapi.routing import APIRoute
+from app.core.config import settings
+from app.db import query_stats
+
+log = logging.getLogger("app.timing")
+if not log.handlers:
+    # One JSON object per line, without the usual level/name prefix
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+@dataclass
+class RequestTiming:
+    trace_id: str | None = None
+    started: float = field(default_factory=time.perf_counter)
+    spans: dict[str, float] = field(default_factory=dict)
+    endpoint_done: float | None = None
+
+    def add(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def current() -> RequestTiming | None:
+    return _current.get()
+
+
+@contextmanager
+def track(trace_id: str | None = None):
+    t = RequestTiming(trace_id=trace_id)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(name, time.perf_counter() - started)
+
+
+def _mark_endpoint_done(call):
+    def mark():
+        t = _current.get()
+        if t is not None:
+            t.endpoint_done = time.perf_counter()
+
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                mark()
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            try:
+                return call(*args, **kwargs)
+            finally:
+                mark()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that records the time between the endpoint returning and the response being
+    ready (response-model validation, encoding, rendering) as the `serialize` span.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The request handler reads dependant.call on every request
+        self.dependant.call = _mark_endpoint_done(self.dependant.call)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            stats = query_stats.current()
+            if stats is not None:
+                stats.route = self.path
+            response = await handler(request)
+            t = _current.get()
+            if t is not None and t.endpoint_done is not None:
+                t.add("serialize", time.perf_counter() - t.endpoint_done)
+            return response
+
+        return timed_handler
+
+
+def breakdown(t: RequestTiming, db_seconds: float, db_count: int) -> dict[str, float]:
+    """Milliseconds per span, with `db` from the query stats and `total` since the request started."""
+    out = {name: round(sec * 1000, 2) for name, sec in t.spans.items()}
+    if db_count:
+        out["db"] = round(db_seconds * 1000, 2)
+    out["total"] = round((time.perf_counter() - t.started) * 1000, 2)
+    return out
+
+
+def server_timing_header(ms: dict[str, float], db_count: int) -> str:
+    parts = []
+    for name, dur in ms.items():
+        part = f"{name};dur={dur}"
+        if name == "db":
+            part += f';desc="{db_count} queries"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+def should_log(status_code: int, total_ms: float) -> bool:
+    if status_code >= 500 or total_ms >= settings.TIMING_LOG_SLOW_MS:
+        return True
+    rate = settings.TIMING_LOG_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def log_request(t: RequestTiming, ms: dict[str, float], method: str, route: str, path: str, status_code: int, db_count: int):
+    if not should_log(status_code, ms["total"]):
+        return
+    log.info(json.dumps({
+        "ts": round(time.time(), 3),
+        "trace_id": t.trace_id,
+        "method": method,
+        "route": route,
+        "path": path,
+        "status": status_code,
+        "db_queries": db_count,
+        "ms": ms,
+    }, separators=(",", ":")))
@@ -0,0 +1,23 @@
+from __future__ import annotations
+from datetime import date
+from sqlalchemy import String, Integer, Date, Numeric, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class SalesDaily(Base):
+    """Daily sales rollup: one row per day x product x category x order status.
+
+    Maintained incrementally by the order service and rebuilt with `python -m app.cli backfill-sales`.
+    """
+    __tablename__ = "sales_daily"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    category_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    revenue: Mapped[float] = mapped_column(Numeric(14,2), default=0, server_default="0")
+    orders_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_sales_daily_product_day", "product_id", "day"),
+    )
@@ -0,0 +1,16 @@
+from __future__ import annotations
+from sqlalchemy import String, Integer, BigInteger, DateTime, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class CatalogTombstone(Base):
+    """Deleted products/categories, so delta-sync clients can drop them (see app/services/catalog_sync.py)."""
+    __tablename__ = "catalog_tombstones"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(20))
+    entity_id: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_catalog_tombstones_entity_deleted_at", "entity", "deleted_at"),
+    )
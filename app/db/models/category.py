@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import String, DateTime, func
+from sqlalchemy import String, DateTime, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
@@ -12,4 +12,10 @@ class Category(Base):
     created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[str] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
-    products = relationship("Product", back_populates="category")
+    # Deleting a category with products is refused by the FK; no need to load them first
+    products = relationship("Product", back_populates="category", passive_deletes=True)
+
+    __table_args__ = (
+        # Delta sync pages through (updated_at, id)
+        Index("ix_categories_updated_at", "updated_at", "id"),
+    )
@@ -0,0 +1,41 @@
+from __future__ import annotations
+from datetime import datetime
+import enum
+from sqlalchemy import String, Integer, BigInteger, DateTime, Text, Index, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class Job(Base):
+    """Durable background job, claimed by `python -m app.worker` processes (see app/services/job_queue.py)."""
+    __tablename__ = "jobs"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    queue: Mapped[str] = mapped_column(String(50))
+    task: Mapped[str] = mapped_column(String(100))
+    payload: Mapped[dict] = mapped_column(JSONB, default=dict, server_default=text("'{}'::jsonb"))
+    status: Mapped[str] = mapped_column(String(20), default=JobStatus.queued.value, server_default=JobStatus.queued.value)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer, default=5, server_default="5")
+    # Enqueueing again while a job with the same key is still waiting to run is a no-op
+    dedupe_key: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    locked_by: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    # A running job whose lease expired belongs to a dead worker and is picked up again
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    run_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_claim", "queue", "run_at", postgresql_where=text("status = 'queued'")),
+        Index("ix_jobs_running", "queue", "locked_until", postgresql_where=text("status = 'running'")),
+        Index("ix_jobs_dedupe_key", "dedupe_key", unique=True, postgresql_where=text("status = 'queued'")),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
@@ -1,10 +1,15 @@
 from __future__ import annotations
-from sqlalchemy import String, Enum, Integer, ForeignKey, DateTime, func, Numeric
+from datetime import datetime
+from typing import TYPE_CHECKING
+from sqlalchemy import String, Enum, Integer, BigInteger, ForeignKey, ForeignKeyConstraint, Index, DateTime, func, text, Numeric
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 from app.db.base import Base
 
+if TYPE_CHECKING:
+    from app.db.models.user import User
+
 class OrderStatus(str, enum.Enum):
     checking = "checking"
     verified = "verified"
@@ -13,21 +18,98 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
-    id: Mapped[int] = mapped_column(primary_key=True)
+    # Monthly range partitions on created_at (see app/db/partitions.py). The partition key has to be
+    # part of the table's primary key, but ids stay unique through the sequence, so the ORM keys on id alone.
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     user: Mapped["User"] = relationship("User", backref="orders")
-    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus), default=OrderStatus.checking, server_default="checking")
+    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus, name="order_status_enum"), default=OrderStatus.checking, server_default="checking")
     shipping_address: Mapped[str] = mapped_column(String(255))
     phone_number: Mapped[str] = mapped_column(String(20))
     comment: Mapped[str | None] = mapped_column(String(500))
     cancel_reason: Mapped[str | None] = mapped_column(String(300))
-    created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
+    created_at: Mapped[str] = mapped_column(DateTime, primary_key=True, server_default=func.now())
     updated_at: Mapped[str] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_user_id", "user_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id], "eager_defaults": True}
+
 class OrderItem(Base):
     __tablename__ = "order_items"
-    id: Mapped[int] = mapped_column(primary_key=True)
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id", ondelete="CASCADE"))
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    order_id: Mapped[int] = mapped_column(Integer, index=True)
+    # Copy of orders.created_at: the partition key, and half of the FK to the partitioned orders table
+    order_created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    # Copied out of product_snapshot["id"] so "orders containing product X" is an index lookup
+    product_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True)
     product_snapshot: Mapped[dict] = mapped_column(JSONB)
     quantity: Mapped[int] = mapped_column(Integer)
     subtotal: Mapped[float] = mapped_column(Numeric(12,2))
+    # Units taken from products.stock for this line; given back (and zeroed) when the order is cancelled
+    reserved_quantity: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+    __table_args__ = (
+        ForeignKeyConstraint(["order_id", "order_created_at"], ["orders.id", "orders.created_at"], ondelete="CASCADE"),
+        {"postgresql_partition_by": "RANGE (order_created_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+class OrderArchive(Base):
+    """Done/cancelled orders moved out of the hot partitions by `python -m app.cli archive-orders`."""
+    __tablename__ = "orders_archive"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    user: Mapped["User"] = relationship("User")
+    status: Mapped[OrderStatus] = mapped_column(Enum(OrderStatus, name="order_status_enum"))
+    shipping_address: Mapped[str] = mapped_column(String(255))
+    phone_number: Mapped[str] = mapped_column(String(20))
+    comment: Mapped[str | None] = mapped_column(String(500))
+    cancel_reason: Mapped[str | None] = mapped_column(String(300))
+    created_at: Mapped[str] = mapped_column(DateTime, index=True)
+    updated_at: Mapped[str] = mapped_column(DateTime)
+    archived_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
+
+class OrderItemArchive(Base):
+    __tablename__ = "order_items_archive"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders_archive.id", ondelete="CASCADE"), index=True)
+    order_created_at: Mapped[datetime] = mapped_column(DateTime)
+    product_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True)
+    product_snapshot: Mapped[dict] = mapped_column(JSONB)
+    quantity: Mapped[int] = mapped_column(Integer)
+    subtotal: Mapped[float] = mapped_column(Numeric(12,2))
+    reserved_quantity: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+class OrderEvent(Base):
+    """Append-only log behind the order event stream; ids double as SSE event ids for resuming."""
+    __tablename__ = "order_events"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    type: Mapped[str] = mapped_column(String(40))
+    order_id: Mapped[int] = mapped_column(Integer)
+    user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    status: Mapped[str] = mapped_column(String(20))
+    previous_status: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now(), index=True)
+
+class OrderIntake(Base):
+    """Orders accepted in async intake mode, waiting for the writer to turn them into `orders` rows."""
+    __tablename__ = "order_intake"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    token: Mapped[str] = mapped_column(String(32), unique=True)
+    user_id: Mapped[int] = mapped_column(Integer)
+    # pending -> created | failed
+    status: Mapped[str] = mapped_column(String(20), default="pending", server_default="pending")
+    # Order fields plus fully priced items ({product_id, quantity, product_snapshot, subtotal})
+    payload: Mapped[dict] = mapped_column(JSONB)
+    order_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    error: Mapped[str | None] = mapped_column(String(300), nullable=True)
+    created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
+    processed_at: Mapped[str | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_order_intake_pending", "id", postgresql_where=text("status = 'pending'")),
+    )
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import String, Text, Numeric, Integer, ForeignKey, DateTime, func
+from sqlalchemy import String, Text, Numeric, Integer, ForeignKey, DateTime, CheckConstraint, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
@@ -15,7 +15,19 @@ class Product(Base):
     price: Mapped[float] = mapped_column(Numeric(12,2))
     image_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
     category_id: Mapped[int] = mapped_column(Integer, ForeignKey("categories.id"))
+    # Units available to order; NULL means stock is not tracked for this product
+    stock: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Names and descriptions normalized across scripts, set by a mapper hook in app.services.product_search
+    search_key: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[str] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
     category = relationship("Category", back_populates="products")
+
+    __table_args__ = (
+        CheckConstraint("stock >= 0", name="ck_products_stock_non_negative"),
+        # Delta sync pages through (updated_at, id)
+        Index("ix_products_updated_at", "updated_at", "id"),
+        # GET /products?q= prefix-matches words of the search key
+        Index("ix_products_search_key", text("to_tsvector('simple'::regconfig, search_key)"), postgresql_using="gin"),
+    )
@@ -0,0 +1,27 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import String, Integer, Float, DateTime, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class SlowQuery(Base):
+    """Statements slower than SLOW_QUERY_MS, aggregated per fingerprint (see app/services/slow_queries.py)."""
+    __tablename__ = "slow_queries"
+    # md5 of the normalized statement (literals and bind parameters replaced by `?`)
+    fingerprint: Mapped[str] = mapped_column(String(32), primary_key=True)
+    query: Mapped[str] = mapped_column(Text)
+    calls: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    total_ms: Mapped[float] = mapped_column(Float, default=0, server_default="0")
+    max_ms: Mapped[float] = mapped_column(Float, default=0, server_default="0")
+    first_seen: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    last_seen: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), index=True)
+    # Latest occurrence: the statement as sent, its parameters, and where it came from
+    last_statement: Mapped[str] = mapped_column(Text)
+    last_params: Mapped[str | None] = mapped_column(Text, nullable=True)
+    last_route: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    last_trace_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) of a sampled occurrence
+    plan: Mapped[list | None] = mapped_column(JSONB(none_as_null=True), nullable=True)
+    plan_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    plan_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
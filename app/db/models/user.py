@@ -1,5 +1,5 @@
 from __future__ import annotations
-from sqlalchemy import String, Enum, DateTime, func, BigInteger
+from sqlalchemy import String, Enum, DateTime, func, BigInteger, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 import enum
 from app.db.base import Base
@@ -14,6 +14,12 @@ class User(Base):
     customer_name: Mapped[str] = mapped_column(String(100))
     phone_number: Mapped[str] = mapped_column(String(20), unique=True, index=True)
     telegram_id: Mapped[int | None] = mapped_column(BigInteger, unique=True, nullable=True, index=True)
-    role: Mapped[RoleEnum] = mapped_column(Enum(RoleEnum), default=RoleEnum.user, server_default="user")
+    role: Mapped[RoleEnum] = mapped_column(Enum(RoleEnum, name="role_enum"), default=RoleEnum.user, server_default="user")
     created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[str] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Prefix search (LIKE 'x%') in the admin user list; pattern ops work under any collation
+        Index("ix_users_phone_number_prefix", "phone_number", postgresql_ops={"phone_number": "varchar_pattern_ops"}),
+        Index("ix_users_customer_name_prefix", text("lower(customer_name) text_pattern_ops")),
+    )
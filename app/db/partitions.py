@@ -0,0 +1,100 @@
+"""
+Monthly range partitions for orders / order_items.
+
+Both tables are partitioned by the order's creation time (orders.created_at,
+order_items.order_created_at), so date-filtered order queries only touch the
+months they ask for. Partitions are created ahead of time by
+`ensure_order_partitions`, which runs on startup, every
+ORDER_PARTITIONS_CHECK_INTERVAL from the worker (`orders.ensure_partitions`) and
+from `python -m app.cli create-partitions`.
+
+A DEFAULT partition per table catches rows for months nobody created, so an
+insert never fails for lack of a partition. It should stay empty: a month whose
+rows already sit in it cannot get its own partition (Postgres refuses to create
+one that overlaps rows in the default), so that month is skipped and reported
+until the rows are moved by hand.
+"""
+import logging
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+log = logging.getLogger(__name__)
+
+# partitioned table -> partition key column
+PARTITIONED_TABLES = {
+    "orders": "created_at",
+    "order_items": "order_created_at",
+}
+
+
+def add_months(d: date, months: int) -> date:
+    m = d.month - 1 + months
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def _current_month(conn: Connection) -> date:
+    return conn.execute(text("SELECT date_trunc('month', localtimestamp)::date")).scalar()
+
+
+def _exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+
+def ensure_order_partitions(conn: Connection, months_ahead: int = 3, start: date | None = None) -> list[str]:
+    """Create any missing monthly partitions from `start` (default: current month) to `months_ahead` months later."""
+    if start is None:
+        start = _current_month(conn)
+    start = start.replace(day=1)
+    created = []
+    for table in PARTITIONED_TABLES:
+        name = default_partition_name(table)
+        if not _exists(conn, name):
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} DEFAULT"))
+            created.append(name)
+    for i in range(months_ahead + 1):
+        lo, hi = add_months(start, i), add_months(start, i + 1)
+        # CREATE ... PARTITION OF would fail on rows of this month already in the default
+        if default_rows(conn, lo, hi):
+            log.error("rows for %s are in the default partitions; partition %s not created", f"{lo:%Y-%m}",
+                      partition_name("orders", lo))
+            continue
+        for table in PARTITIONED_TABLES:
+            name = partition_name(table, lo)
+            if _exists(conn, name):
+                continue
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+            ))
+            created.append(name)
+    return created
+
+
+def default_rows(conn: Connection, lo: date | None = None, hi: date | None = None) -> dict[str, int]:
+    """Rows per table in the DEFAULT partitions (only those with keys in [lo, hi) when given); empty tables are left out."""
+    counts = {}
+    for table, column in PARTITIONED_TABLES.items():
+        name = default_partition_name(table)
+        if not _exists(conn, name):
+            continue
+        where = f" WHERE {column} >= :lo AND {column} < :hi" if lo is not None else ""
+        n = conn.execute(text(f"SELECT count(*) FROM {name}{where}"), {"lo": lo, "hi": hi}).scalar()
+        if n:
+            counts[table] = n
+    return counts
+
+
+def months_covered(conn: Connection) -> int:
+    """Consecutive months after the current one with partitions for every table (-1: not even the current month)."""
+    month, n = _current_month(conn), -1
+    while all(_exists(conn, partition_name(table, add_months(month, n + 1))) for table in PARTITIONED_TABLES):
+        n += 1
+    return n
@@ -0,0 +1,128 @@
+"""
+Per-request SQL accounting. Every statement run while a `track()` block is active is counted
+and timed against it; the HTTP middleware opens one per request, tagged with the trace id:
+
+    with query_stats.track(trace_id) as stats:
+        ...
+    stats.count, stats.seconds
+
+With DB_RAISE_ON_LAZY_LOAD (on in the test suite) an implicit relationship lazy load raises
+LazyLoadError instead of quietly issuing one more query per row.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, ORMExecuteState
+from app.core.config import settings
+
+log = logging.getLogger("app.db")
+
+
+class LazyLoadError(RuntimeError):
+    pass
+
+
+@dataclass
+class QueryStats:
+    trace_id: str | None = None
+    # Route template once routing has happened (request path before that)
+    route: str | None = None
+    count: int = 0
+    seconds: float = 0.0
+    statements: list[str] | None = None
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    @property
+    def millis(self) -> float:
+        return self.seconds * 1000
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Process-wide captures (pytest budgets) see statements from every thread
+_captures: list[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+def current() -> QueryStats | None:
+    return _current.get()
+
+
+@contextmanager
+def track(trace_id: str | None = None, route: str | None = None):
+    """Count the statements run in this context (and the threads/tasks it spawns)."""
+    stats = QueryStats(trace_id=trace_id, route=route)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture():
+    """Count every statement on any connection until the block exits, keeping the SQL text."""
+    stats = QueryStats(statements=[])
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+    if _captures:
+        with _captures_lock:
+            for c in _captures:
+                c.add(statement, elapsed)
+    if (settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS
+            and conn.get_execution_options().get("slow_query_log", True)):
+        from app.services import slow_queries
+        slow_queries.record(
+            statement, parameters, executemany, elapsed,
+            stats.route if stats else None, stats.trace_id if stats else None,
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _guard_lazy_load(state: ORMExecuteState):
+    if settings.DB_RAISE_ON_LAZY_LOAD and state.is_select and state.lazy_loaded_from is not None:
+        raise LazyLoadError(
+            f"Lazy load of {state.loader_strategy_path} on {state.lazy_loaded_from.class_.__name__}; "
+            "load it up front with selectinload()/joinedload() or a batched query."
+        )
+
+
+def report(stats: QueryStats, method: str, path: str, status_code: int):
+    level = logging.WARNING if stats.count > settings.QUERY_COUNT_WARN else logging.DEBUG
+    if log.isEnabledFor(level):
+        log.log(level, "%s %s %s: %d queries, %.1f ms db, trace_id=%s",
+                method, path, status_code, stats.count, stats.millis, stats.trace_id)
@@ -1,5 +1,7 @@
+import re
+import uuid
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -7,7 +9,11 @@ from fastapi.staticfiles import StaticFiles
 from app.core.response import BaseHTTPException, ErrorCodes
 from app.core.i18n import get_lang
 from app.core.deps import create_db_and_init_admin
-from app.routers import auth, categories, products, orders, system, files
+from app.core.admission import AdmissionMiddleware
+from app.core.cancellation import DisconnectMiddleware, ClientDisconnected, CANCELLED, current as current_cancellation
+from app.db import query_stats
+from app.core import metrics, timing
+from app.routers import auth, categories, products, orders, system, files, analytics, bootstrap
 from fastapi.middleware.cors import CORSMiddleware
 
 limiter = Limiter(key_func=get_remote_address)
@@ -21,17 +27,59 @@ origins = [
 ]
 
 
+TRACE_ID_RE = re.compile(r"[A-Za-z0-9._-]{8,64}")
+
+
+def route_template(request: Request) -> str:
+    # Static files, the admin UI and 404s have no API route; keep them out of the per-route series
+    return getattr(request.scope.get("route"), "path", None) or "<other>"
+
+
+def record_request_metrics(request: Request, status_code: int, elapsed: float, stats: query_stats.QueryStats):
+    template = route_template(request)
+    labels = {"method": request.method, "route": template, "status": status_code}
+    metrics.HTTP_REQUESTS.inc(**labels)
+    metrics.HTTP_DURATION.observe(elapsed, **labels)
+    metrics.HTTP_DB_STATEMENTS.inc(stats.count, route=template)
+    metrics.HTTP_DB_SECONDS.inc(stats.seconds, route=template)
+
+
+def finish_request(request: Request, t: timing.RequestTiming, stats: query_stats.QueryStats, status_code: int) -> dict[str, str]:
+    """Record metrics, the slow-query report and the timing log line; returns the response headers."""
+    ms = timing.breakdown(t, stats.seconds, stats.count)
+    record_request_metrics(request, status_code, ms["total"] / 1000, stats)
+    headers = {"X-Trace-Id": t.trace_id}
+    if settings.SERVER_TIMING_HEADER:
+        headers["Server-Timing"] = timing.server_timing_header(ms, stats.count)
+    if settings.QUERY_STATS_HEADER:
+        headers["X-DB-Stats"] = f"queries={stats.count}; time_ms={stats.millis:.1f}"
+    query_stats.report(stats, request.method, request.url.path, status_code)
+    timing.log_request(t, ms, request.method, route_template(request), request.url.path, status_code, stats.count)
+    return headers
+
+
 def create_app():
     app = FastAPI(title="Toys Catalog API", version="v1", docs_url="/api/v1/docs", openapi_url="/api/v1/openapi.json")
     app.state.limiter = limiter
+    # Both inside the trace-id middleware, so refused/abandoned requests still get a trace id and metrics
+    app.add_middleware(DisconnectMiddleware)
+    app.add_middleware(AdmissionMiddleware)
 
     @app.middleware("http")
     async def add_trace_id(request: Request, call_next):
-        import uuid
-        trace_id = str(uuid.uuid4())
+        # Keep the caller's trace id (nginx, the bot) when it sends a sane one
+        incoming = request.headers.get("X-Trace-Id", "")
+        trace_id = incoming if TRACE_ID_RE.fullmatch(incoming) else str(uuid.uuid4())
         request.state.trace_id = trace_id
-        response = await call_next(request)
-        # response.headers["X-Trace-Id"] = trace_id # Optional
+        with query_stats.track(trace_id, request.url.path) as stats, timing.track(trace_id) as t:
+            try:
+                response = await call_next(request)
+            except Exception:
+                # The 500 itself is sent by general_exception_handler (outside this middleware);
+                # it picks these headers up from request.state
+                request.state.error_headers = finish_request(request, t, stats, 500)
+                raise
+        response.headers.update(finish_request(request, t, stats, response.status_code))
         return response
 
     @app.exception_handler(RateLimitExceeded)
@@ -66,6 +114,42 @@ def create_app():
             }
         )
 
+    @app.exception_handler(ClientDisconnected)
+    async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+        # Nobody is listening; 499 (nginx's "client closed request") keeps these apart in logs and metrics
+        return Response(status_code=499)
+
+    from sqlalchemy.exc import OperationalError
+    from psycopg.errors import QueryCanceled
+    @app.exception_handler(OperationalError)
+    async def operational_error_handler(request: Request, exc: OperationalError):
+        if not isinstance(exc.orig, QueryCanceled):
+            return await general_exception_handler(request, exc)
+        ctx = current_cancellation()
+        if ctx is not None and ctx.disconnected:
+            CANCELLED.inc(reason="disconnect")
+            return Response(status_code=499)
+        CANCELLED.inc(reason="timeout")
+        trace_id = getattr(request.state, "trace_id", None)
+        err = BaseHTTPException(503, ErrorCodes.TIMEOUT, "The request took too long, please retry shortly.")
+        return JSONResponse(
+            status_code=503,
+            content=err.to_response(lang=get_lang(request), trace_id=trace_id),
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+        )
+
+    from sqlalchemy.exc import TimeoutError as PoolTimeout
+    @app.exception_handler(PoolTimeout)
+    async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+        # No DB connection freed up within DB_POOL_TIMEOUT: shed the request instead of a 500
+        trace_id = getattr(request.state, "trace_id", None)
+        err = BaseHTTPException(503, ErrorCodes.SERVICE_UNAVAILABLE, "Server is busy, please retry shortly.")
+        return JSONResponse(
+            status_code=503,
+            content=err.to_response(lang=get_lang(request), trace_id=trace_id),
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+        )
+
     @app.exception_handler(Exception)
     async def general_exception_handler(request: Request, exc: Exception):
         trace_id = getattr(request.state, "trace_id", None)
@@ -79,7 +163,8 @@ def create_app():
                 "data": None,
                 "error": {"code": ErrorCodes.INTERNAL_ERROR, "message": "Internal server error.", "details": {"error": str(exc)}},
                 "meta": {"lang": get_lang(request), "trace_id": trace_id},
-            }
+            },
+            headers=getattr(request.state, "error_headers", None) or ({"X-Trace-Id": trace_id} if trace_id else None),
         )
 
     app.include_router(system.router, prefix="/api/v1/system", tags=["System"])
@@ -88,11 +173,21 @@ def create_app():
     app.include_router(categories.router, prefix="/api/v1/categories", tags=["Categories"])
     app.include_router(products.router, prefix="/api/v1/products", tags=["Products"])
     app.include_router(orders.router, prefix="/api/v1/orders", tags=["Orders"])
+    app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
+    app.include_router(bootstrap.router, prefix="/api/v1/bootstrap", tags=["Bootstrap"])
 
     @app.on_event("startup")
     async def on_startup():
         # create tables & init admin if not exists
         await create_db_and_init_admin()
+        metrics.registry.start_flusher()
+        from app.services.product_suggest import suggest_index
+        suggest_index.start()
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        from app.services.order_events import hub
+        await hub.stop()
 
     from app.db.session import engine
     from app.admin import setup_admin
@@ -0,0 +1,119 @@
+from datetime import date
+from fastapi import APIRouter, Depends, Request, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, desc
+from app.schemas.analytics import SalesRow, TopProductOut
+from app.schemas.base import BaseResponse
+from app.core.deps import get_db, admin_required
+from app.core.response import base_success, BaseHTTPException, ErrorCodes
+from app.core.i18n import get_lang
+from app.core.timing import TimedRoute
+from app.db.models.analytics import SalesDaily
+from app.db.models.order import OrderStatus
+from app.db.models.product import Product
+
+router = APIRouter(route_class=TimedRoute)
+
+GROUP_COLUMNS = {
+    "day": SalesDaily.day,
+    "product": SalesDaily.product_id,
+    "category": SalesDaily.category_id,
+    "status": SalesDaily.status,
+}
+
+
+def rollup_filters(date_from: date | None, date_to: date | None, status: str | None, product_id: int | None = None, category_id: int | None = None):
+    conds = []
+    if status:
+        try:
+            statuses = [OrderStatus(s.strip()).value for s in status.split(",") if s.strip()]
+        except ValueError:
+            raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, "Unknown order status.")
+        conds.append(SalesDaily.status.in_(statuses))
+    else:
+        # "What sold" never includes cancelled orders unless asked for explicitly
+        conds.append(SalesDaily.status != OrderStatus.cancelled.value)
+    if date_from:
+        conds.append(SalesDaily.day >= date_from)
+    if date_to:
+        conds.append(SalesDaily.day <= date_to)
+    if product_id:
+        conds.append(SalesDaily.product_id == product_id)
+    if category_id:
+        conds.append(SalesDaily.category_id == category_id)
+    return conds
+
+
+@router.get("/sales", response_model=BaseResponse[list[SalesRow]])
+def sales(
+    db: Session = Depends(get_db),
+    admin=Depends(admin_required),
+    request: Request=None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    status: str | None = Query(None, description="Comma separated statuses, default: all except cancelled"),
+    product_id: int | None = None,
+    category_id: int | None = None,
+    group_by: str = Query("day", description="Comma separated keys: day,product,category,status"),
+):
+    keys = [k.strip() for k in group_by.split(",") if k.strip()]
+    if not keys or any(k not in GROUP_COLUMNS for k in keys):
+        raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, f"group_by must be a combination of {', '.join(GROUP_COLUMNS)}.")
+    cols = [GROUP_COLUMNS[k] for k in keys]
+    stmt = (
+        select(
+            *cols,
+            func.sum(SalesDaily.quantity).label("quantity"),
+            func.sum(SalesDaily.revenue).label("revenue"),
+            func.sum(SalesDaily.orders_count).label("orders_count"),
+        )
+        .where(*rollup_filters(date_from, date_to, status, product_id, category_id))
+        .group_by(*cols)
+        .order_by(*cols)
+    )
+    data = []
+    for r in db.execute(stmt).mappings():
+        row = dict(r, revenue=float(r["revenue"]))
+        if "day" in row:
+            row["day"] = row["day"].isoformat()
+        data.append(SalesRow(**row))
+    return base_success(data, lang=get_lang(request))
+
+
+@router.get("/top-products", response_model=BaseResponse[list[TopProductOut]])
+def top_products(
+    db: Session = Depends(get_db),
+    admin=Depends(admin_required),
+    request: Request=None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    status: str | None = Query(None, description="Comma separated statuses, default: all except cancelled"),
+    category_id: int | None = None,
+    by: str = Query("revenue", pattern="^(revenue|quantity)$"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    lang = get_lang(request)
+    quantity = func.sum(SalesDaily.quantity).label("quantity")
+    revenue = func.sum(SalesDaily.revenue).label("revenue")
+    top = (
+        select(SalesDaily.product_id, func.max(SalesDaily.category_id).label("category_id"), quantity, revenue)
+        .where(*rollup_filters(date_from, date_to, status, category_id=category_id))
+        .group_by(SalesDaily.product_id)
+        .order_by(desc(by), SalesDaily.product_id)
+        .limit(limit)
+        .subquery()
+    )
+    name = Product.name_en if lang == "en" else (Product.name_ru if lang == "ru" else Product.name_uz)
+    stmt = (
+        select(top, name.label("product_name"))
+        .outerjoin(Product, Product.id == top.c.product_id)
+        .order_by(desc(top.c[by]), top.c.product_id)
+    )
+    data = [TopProductOut(
+        product_id=r.product_id,
+        product_name=r.product_name,
+        category_id=r.category_id,
+        quantity=r.quantity,
+        revenue=float(r.revenue),
+    ) for r in db.execute(stmt)]
+    return base_success(data, lang=lang)
@@ -1,14 +1,17 @@
-from app.schemas.auth import RegisterRequest, LoginRequest, SetTelegramIdRequest, AuthResponse, UserResponse, UserListResponse
+from app.schemas.auth import RegisterRequest, LoginRequest, SetTelegramIdRequest, AuthResponse, UserResponse, UserListResponse, UserUpsertRequest, UserUpsertResponse
 from app.schemas.base import BaseResponse
 from app.core.deps import get_db, admin_required, get_current_user
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.db.models.user import User
 from app.core.response import base_success, BaseHTTPException, ErrorCodes
 from app.core.i18n import get_lang
+from app.core.timing import TimedRoute
+from app.services import auth_service
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.post("/register", response_model=BaseResponse[AuthResponse])
@@ -124,6 +127,25 @@ def register_admin(
     )
 
 
+@router.post("/upsert-users", response_model=BaseResponse[UserUpsertResponse])
+def upsert_users(
+    body: UserUpsertRequest,
+    db: Session = Depends(get_db),
+    _: User = Depends(admin_required),
+    request: Request = None,
+):
+    results = auth_service.upsert_users(db, [u.model_dump() for u in body.users])
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("created", "updated", "unchanged", "conflict")}
+    data = {
+        "results": results,
+        "created": counts["created"],
+        "updated": counts["updated"],
+        "unchanged": counts["unchanged"],
+        "conflicted": counts["conflict"],
+    }
+    return base_success(data, lang=get_lang(request))
+
+
 @router.get("/get-me", response_model=BaseResponse[UserResponse])
 def get_me(
     user: User = Depends(get_current_user),
@@ -146,8 +168,12 @@ def get_all_users(
     db: Session = Depends(get_db),
     _: User = Depends(admin_required),
     request: Request = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: int | None = Query(None, ge=1, description="next_cursor from the previous page"),
+    phone: str | None = Query(None, max_length=20, description="Phone number prefix"),
+    name: str | None = Query(None, max_length=100, description="Customer name prefix (case-insensitive)"),
 ):
-    users = db.execute(select(User)).scalars().all()
+    users, next_cursor = auth_service.list_users(db, limit, cursor, phone, name)
 
     data = [
         UserResponse(
@@ -162,6 +188,23 @@ def get_all_users(
     ]
 
     return base_success(
-        UserListResponse(users=data, count=len(data)),
+        UserListResponse(users=data, count=len(data), next_cursor=next_cursor),
         lang=get_lang(request)
     )
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+@router.get("/export-users")
+def export_users(
+    _: User = Depends(admin_required),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    phone: str | None = Query(None, max_length=20),
+    name: str | None = Query(None, max_length=100),
+):
+    return StreamingResponse(
+        auth_service.export_users(format, phone, name),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
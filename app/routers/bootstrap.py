@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import json
+from fastapi import APIRouter, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.schemas.auth import UserResponse
+from app.schemas.base import BaseResponse
+from app.schemas.bootstrap import BootstrapResponse
+from app.schemas.category import CategoryOut
+from app.core.deps import request_session
+from app.core.response import base_success, BaseHTTPException, ErrorCodes
+from app.core.i18n import get_lang
+from app.core import timing
+from app.core.timing import TimedRoute
+from app.db.models.user import User
+from app.db.models.product import Product
+from app.routers.products import product_out
+from app.services.category_cache import category_cache
+
+router = APIRouter(route_class=TimedRoute)
+
+SECTIONS = ("user", "categories", "products")
+
+
+def section_etag(section: str, payload) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f'W/"{section}-{hashlib.md5(body.encode()).hexdigest()[:16]}"'
+
+
+def known_etags(request: Request) -> set[str]:
+    header = request.headers.get("if-none-match", "")
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+# The user and product sections share one session (one pooled connection); categories load
+# concurrently on a session of their own, which only takes a connection on a cache miss.
+# Sessions are not thread-safe, so each threadpool thread has its own
+
+def load_user(db: Session, telegram_id: int | None) -> UserResponse | None:
+    if not telegram_id:
+        return None
+    with timing.span("auth"):
+        u = db.execute(select(User).where(User.telegram_id == telegram_id)).scalar_one_or_none()
+    if not u:
+        raise BaseHTTPException(401, ErrorCodes.AUTH_FAILED, "User not found or Telegram ID not set.")
+    return UserResponse(
+        id=u.id,
+        customer_name=u.customer_name,
+        phone_number=u.phone_number,
+        role=u.role.value,
+        telegram_id=u.telegram_id,
+        created_at=str(u.created_at)
+    )
+
+
+def load_products(db: Session, lang: str, limit: int) -> tuple[list, dict]:
+    """Same first page as GET /products?limit=..."""
+    total = db.execute(select(func.count()).select_from(Product)).scalar()
+    rows = db.execute(select(Product).limit(limit)).scalars().all()
+    data = [product_out(p, lang) for p in rows]
+    return data, {"limit": limit, "offset": 0, "count": len(data), "total": total}
+
+
+def load_user_and_products(request: Request, telegram_id: int | None, lang: str, limit: int):
+    with request_session(request) as db:
+        user = load_user(db, telegram_id)
+        return user, *load_products(db, lang, limit)
+
+
+def load_categories(request: Request, lang: str) -> list[CategoryOut]:
+    with request_session(request) as db:
+        cats = category_cache.get_all(db)
+    return [CategoryOut(id=c.id, name=getattr(c, f"name_{lang}"), name_uz=c.name_uz, name_ru=c.name_ru, name_en=c.name_en) for c in cats]
+
+
+@router.get("", response_model=BaseResponse[BootstrapResponse], responses={304: {"description": "Every section matches If-None-Match"}})
+async def bootstrap(
+    request: Request,
+    response: Response,
+    telegram_id: int | None = Header(None, alias="X-Telegram-Id"),
+    limit: int = Query(20, ge=1, le=100, description="Size of the first product page"),
+):
+    """
+    Everything the mini-app needs on open in one round trip: the current user (null without
+    X-Telegram-Id), all categories and the first product page. Categories load concurrently with
+    the rest; the whole request holds at most two pooled connections (usually one).
+
+    Every section has its own ETag in `data.etags`; send the ones you have in `If-None-Match`
+    and those sections come back null (listed in `not_modified`), or `304` if all of them match.
+    """
+    lang = get_lang(request)
+    (user, products, pagination), categories = await asyncio.gather(
+        run_in_threadpool(load_user_and_products, request, telegram_id, lang, limit),
+        run_in_threadpool(load_categories, request, lang),
+    )
+    sections = {"user": user, "categories": categories, "products": products}
+    etags = {name: section_etag(name, value) for name, value in sections.items()}
+    combined = section_etag("bootstrap", etags)
+    headers = {"ETag": combined, "Cache-Control": "private, no-cache"}
+
+    known = known_etags(request)
+    not_modified = [name for name in SECTIONS if etags[name].removeprefix("W/") in known]
+    if len(not_modified) == len(SECTIONS) or combined.removeprefix("W/") in known:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    data = {
+        **{name: (None if name in not_modified else value) for name, value in sections.items()},
+        "products_pagination": pagination,
+        "etags": etags,
+        "not_modified": not_modified,
+    }
+    return base_success(data, lang=lang)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryOut, CategoryListResponse
@@ -6,10 +6,16 @@ from app.schemas.base import BaseResponse
 from app.core.deps import get_db, admin_required
 from app.core.response import base_success, BaseHTTPException, ErrorCodes
 from app.core.pagination import page_params
+from app.core import fieldsets
+from app.core.fieldsets import fieldset_params
 from app.core.i18n import get_lang
+from app.core.timing import TimedRoute
 from app.db.models.category import Category
+from app.services.category_cache import category_cache
+from app.services import catalog_sync
+from app.schemas.sync import ChangesResponse
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("", response_model=BaseResponse[CategoryOut])
 def create_category(body: CategoryCreate, db: Session = Depends(get_db), admin=Depends(admin_required), request: Request=None):
@@ -22,6 +28,7 @@ def create_category(body: CategoryCreate, db: Session = Depends(get_db), admin=D
         raise BaseHTTPException(409, ErrorCodes.DUPLICATE, "Category name already exists.")
     c = Category(name_uz=body.name_uz, name_ru=body.name_ru, name_en=body.name_en)
     db.add(c); db.commit(); db.refresh(c)
+    category_cache.invalidate()
     lang = get_lang(request)
     name = c.name_en if lang == "en" else (c.name_ru if lang == "ru" else c.name_uz)
     return base_success(CategoryOut(id=c.id, name=name, name_uz=c.name_uz, name_ru=c.name_ru, name_en=c.name_en), lang=lang)
@@ -35,6 +42,7 @@ def update_category(id: int, body: CategoryUpdate, db: Session = Depends(get_db)
     if body.name_ru: c.name_ru = body.name_ru
     if body.name_en: c.name_en = body.name_en
     db.commit(); db.refresh(c)
+    category_cache.invalidate()
     lang = get_lang(request)
     name = c.name_en if lang == "en" else (c.name_ru if lang == "ru" else c.name_uz)
     return base_success(CategoryOut(id=c.id, name=name, name_uz=c.name_uz, name_ru=c.name_ru, name_en=c.name_en), lang=lang)
@@ -47,6 +55,7 @@ def delete_category(id: int, db: Session = Depends(get_db), admin=Depends(admin_
     try:
         db.delete(c)
         db.commit()
+        category_cache.invalidate()
     except Exception as e:
         from sqlalchemy.exc import IntegrityError
         if isinstance(e, IntegrityError):
@@ -55,6 +64,19 @@ def delete_category(id: int, db: Session = Depends(get_db), admin=Depends(admin_
         raise e
     return
 
+@router.get("/changes", response_model=BaseResponse[ChangesResponse[CategoryOut]])
+def category_changes(
+    db: Session = Depends(get_db),
+    request: Request = None,
+    since: str | None = Query(None, description="next_token from the previous call; omit for everything"),
+    limit: int = Query(500, ge=1, le=1000),
+):
+    """Categories created or updated since the token, plus deleted ids, for client-side caches."""
+    lang = get_lang(request)
+    res = catalog_sync.changes(db, "category", since, limit)
+    res["changed"] = [CategoryOut(id=c.id, name=c.name_en if lang == "en" else (c.name_ru if lang == "ru" else c.name_uz), name_uz=c.name_uz, name_ru=c.name_ru, name_en=c.name_en) for c in res["changed"]]
+    return base_success(res, lang=lang)
+
 @router.get("/{id}", response_model=BaseResponse[CategoryOut])
 def get_category(id: int, db: Session = Depends(get_db), request: Request=None):
     c = db.get(Category, id)
@@ -65,11 +87,16 @@ def get_category(id: int, db: Session = Depends(get_db), request: Request=None):
     return base_success(CategoryOut(id=c.id, name=name, name_uz=c.name_uz, name_ru=c.name_ru, name_en=c.name_en), lang=lang)
 
 @router.get("", response_model=BaseResponse[list[CategoryOut]])
-def list_categories(db: Session = Depends(get_db), request: Request=None, lp: tuple[int,int]=Depends(page_params)):
+def list_categories(db: Session = Depends(get_db), request: Request=None, lp: tuple[int,int]=Depends(page_params), fs: tuple[str | None, bool]=Depends(fieldset_params)):
     limit, offset = lp
+    lang = get_lang(request)
+    names = fieldsets.resolve(fs, fieldsets.CATEGORY_FIELDS, fieldsets.CATEGORY_COMPACT)
     total = db.execute(select(func.count()).select_from(Category)).scalar()
+    if names:
+        rows = db.execute(select(*fieldsets.columns(Category, names, lang)).offset(offset).limit(limit))
+        data = fieldsets.rows_to_dicts(rows, names)
+        return fieldsets.sparse_response(data, lang, {"limit":limit,"offset":offset,"count":len(data),"total":total})
     rows = db.execute(select(Category).offset(offset).limit(limit)).scalars().all()
-    lang = get_lang(request)
     
     def get_name(cat):
         if lang == "en": return cat.name_en
@@ -4,12 +4,15 @@ import uuid
 from fastapi import APIRouter, UploadFile, File, Request, Depends
 from app.core.response import base_success, BaseHTTPException, ErrorCodes
 from app.core.i18n import get_lang
-from app.core.deps import admin_required
+from app.core.deps import admin_required, get_db
+from app.core.timing import TimedRoute
+from sqlalchemy.orm import Session
+from app.services import job_queue
 from app.db.models.user import User
 from app.schemas.file import FileResponse
 from app.schemas.base import BaseResponse
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 UPLOAD_DIR = "app/static/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -18,6 +21,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 def upload_image(
     file: UploadFile = File(...),
     request: Request = None,
+    db: Session = Depends(get_db),
     _: User = Depends(admin_required),
 ):
     if not file.content_type.startswith("image/"):
@@ -30,6 +34,10 @@ def upload_image(
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
+    # Downscaling big photos happens in the worker; the URL below is valid right away
+    job_queue.enqueue(db, "images.optimize", {"path": file_path})
+    db.commit()
+
     # Construct URL
     # Assuming the app is served at root or we can get base_url from request
     base_url = str(request.base_url).rstrip("/")
@@ -1,29 +1,60 @@
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, func, literal, union_all, desc
 
-from app.db.models.category import Category
-from app.schemas.order import OrderCreate, OrderUpdate, CancelRequest, OrderCreateResponse, OrderUpdateResponse, OrderResponse, OrderListResponse
+from app.schemas.order import OrderCreate, OrderUpdate, CancelRequest, OrderCreateResponse, OrderUpdateResponse, OrderResponse, OrderListResponse, BulkOrderIds, BulkCancelRequest, BulkTransitionResponse, OrderIntakeResponse
 from app.schemas.base import BaseResponse
 from app.core.deps import get_db, get_current_user, admin_required
 from app.core.response import base_success, BaseHTTPException, ErrorCodes
 from app.core.i18n import get_lang
-from app.db.models.order import Order, OrderItem, OrderStatus
-from app.services.order_service import create_order, order_to_dict
-from app.utils.pdf import generate_order_pdf
-from decimal import Decimal
-from fastapi.responses import Response
-from zoneinfo import ZoneInfo
+from app.db.models.order import Order, OrderItem, OrderArchive, OrderItemArchive, OrderStatus
+from app.services.order_service import create_order, order_to_dict, transition_orders, get_order, get_items_by_order, release_stock
+from app.services import analytics_service, order_events, job_queue, receipt_service, order_intake
+from app.core.config import settings
+from app.core import metrics
+from app.core.timing import TimedRoute
+from datetime import datetime
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.post("", response_model=BaseResponse[OrderCreateResponse])
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_RETRY_MS = 3000
+
+def enqueue_receipt(db: Session, order_id: int, request: Request):
+    job_queue.enqueue(
+        db, "receipts.render", {"order_id": order_id, "base_url": str(request.base_url).rstrip('/')},
+        dedupe_key=f"receipts.render:{order_id}",
+    )
+
+def wants_async_intake(request: Request) -> bool:
+    prefer = request.headers.get("prefer", "")
+    return settings.ORDER_INTAKE_ASYNC or "respond-async" in prefer.lower()
+
+@router.post("", response_model=BaseResponse[OrderCreateResponse], responses={202: {"model": BaseResponse[OrderIntakeResponse]}})
 def create(body: OrderCreate, db: Session = Depends(get_db), user=Depends(get_current_user), request: Request=None):
     # RBAC: If user is not admin, they can only create order for themselves
     if user.role.value != "admin" and body.user_id != user.id:
         raise BaseHTTPException(403, ErrorCodes.FORBIDDEN, "Cannot create order for another user.")
-    
+
+    if wants_async_intake(request):
+        # Accepted now, created by the intake writer; poll GET /orders/intake/{token} for the order id
+        data = order_intake.submit(
+            db, body.user_id, body.shipping_address, body.phone_number, body.comment,
+            [i.model_dump() for i in body.items], get_lang(request), str(request.base_url).rstrip('/'),
+        )
+        return JSONResponse(
+            status_code=202,
+            content=base_success(data, lang=get_lang(request)),
+            headers={"Location": f"/api/v1/orders/intake/{data['token']}"},
+        )
+
     data = create_order(db, body.user_id, body.shipping_address, body.phone_number, body.comment, [i.model_dump() for i in body.items], get_lang(request))
+    enqueue_receipt(db, data["order_id"], request)
+    db.commit()
     return base_success(data, lang=get_lang(request))
 
 @router.put("/{id}", response_model=BaseResponse[OrderUpdateResponse])
@@ -33,26 +64,162 @@ def update(id: int, body: OrderUpdate, db: Session = Depends(get_db), admin=Depe
         raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order not found.")
     for k, v in body.model_dump(exclude_unset=True).items():
         setattr(o, k, v)
+    receipt_service.discard_receipt(o.id)
+    enqueue_receipt(db, o.id, request)
     db.commit(); db.refresh(o)
     return base_success({"order_id": o.id, "status": o.status.value}, lang=get_lang(request))
 
 @router.delete("/{id}", status_code=204)
 def delete(id: int, db: Session = Depends(get_db), admin=Depends(admin_required)):
-    o = db.get(Order, id)
+    o = db.get(Order, id, with_for_update=True)
     if not o:
         raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order not found.")
+    # Stock before the rollup: same lock order as create_order (see reserve_stock)
+    if o.status != OrderStatus.done:
+        release_stock(db, [o.id])
+    analytics_service.forget_orders(db, [o.id], o.status)
     db.delete(o); db.commit()
+    receipt_service.discard_receipt(id)
     return
 
+def sse_message(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def read_intake(db: Session, token: str):
+    intake = order_intake.get_intake(db, token)
+    # End the transaction so a long-polling request does not pin a pooled connection
+    db.rollback()
+    return intake
+
+async def wait_for_user_event(queue: asyncio.Queue | None, user_id: int, timeout: float):
+    """Return once an event about `user_id`'s orders arrives (or the hub drops us), else after `timeout`."""
+    if queue is None:
+        # Not subscribed (hub full): just wait out the interval
+        await asyncio.sleep(timeout)
+        return
+    try:
+        async with asyncio.timeout(timeout):
+            while True:
+                event = await queue.get()
+                if event is None or event["user_id"] == user_id:
+                    return
+    except TimeoutError:
+        pass
+
+@router.get("/intake/{token}", response_model=BaseResponse[OrderIntakeResponse])
+async def intake_status(
+    token: str,
+    wait: float = Query(0, ge=0, le=30, description="Long-poll: hold the request up to this many seconds while pending"),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    request: Request = None,
+):
+    is_admin, user_id = user.role.value == "admin", user.id
+    intake = await run_in_threadpool(read_intake, db, token)
+    if not intake:
+        raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order intake not found.")
+    if not is_admin and intake.user_id != user_id:
+        raise BaseHTTPException(403, ErrorCodes.FORBIDDEN, "Not your order.")
+
+    if intake.status == "pending" and wait:
+        # Re-check whenever one of this user's orders gets created, and at least once a second
+        try:
+            queue = await order_events.hub.subscribe()
+        except TimeoutError:
+            queue = None
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            while intake.status == "pending" and loop.time() < deadline:
+                await wait_for_user_event(queue, intake.user_id, min(1.0, deadline - loop.time()))
+                intake = await run_in_threadpool(read_intake, db, token)
+        finally:
+            if queue is not None:
+                order_events.hub.unsubscribe(queue)
+    return base_success(order_intake.intake_to_dict(intake), lang=get_lang(request))
+
+@router.get("/events")
+async def events(
+    last_event_id: int | None = Query(None, ge=0, description="Resume after this event id (the Last-Event-ID header wins)"),
+    status: OrderStatus | None = None,
+    admin=Depends(admin_required),
+    request: Request = None,
+):
+    """
+    Server-sent events for order creation and status changes, replacing dashboard polling.
+    Reconnecting clients send Last-Event-ID and get the missed events replayed from order_events first.
+    """
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    try:
+        queue = await order_events.hub.subscribe()
+    except TimeoutError:
+        raise BaseHTTPException(503, ErrorCodes.SERVICE_UNAVAILABLE, "Event stream is temporarily unavailable.")
+
+    def wanted(event: dict) -> bool:
+        return status is None or event["status"] == status.value
+
+    async def stream():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            sent = set()
+            if last_event_id is not None:
+                after = last_event_id
+                while True:
+                    missed = await run_in_threadpool(order_events.replay, after)
+                    for event in missed:
+                        sent.add(event["id"])
+                        if wanted(event):
+                            yield sse_message(event)
+                    if len(missed) < order_events.REPLAY_LIMIT:
+                        break
+                    after = missed[-1]["id"]
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    # Dropped by the hub (slow consumer or listener reconnect); the client resumes via Last-Event-ID
+                    return
+                if event["id"] in sent or not wanted(event):
+                    continue
+                yield sse_message(event)
+        finally:
+            order_events.hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{id}", response_model=BaseResponse[OrderResponse])
 def get_one(id: int, db: Session = Depends(get_db), user=Depends(get_current_user), request: Request=None):
-    o = db.get(Order, id)
+    o = get_order(db, id)
     if not o:
         raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order not found.")
     if user.role.value != "admin" and o.user_id != user.id:
         raise BaseHTTPException(403, ErrorCodes.FORBIDDEN, "Not your order.")
     return base_success(order_to_dict(db, o, get_lang(request)), lang=get_lang(request))
 
+def order_filters(model, item_model, status, user_id, product_id, date_from, date_to) -> list:
+    conds = []
+    if status:
+        conds.append(model.status == OrderStatus(status))
+    if user_id:
+        conds.append(model.user_id == user_id)
+    if product_id:
+        conds.append(model.id.in_(select(item_model.order_id).where(item_model.product_id == product_id)))
+    # Typed bounds on the partition key let Postgres prune months outside the range
+    if date_from:
+        conds.append(model.created_at >= date_from)
+    if date_to:
+        conds.append(model.created_at <= date_to)
+    return conds
+
 @router.get("", response_model=BaseResponse[list[OrderResponse]])
 def list_orders(
     db: Session = Depends(get_db),
@@ -60,130 +227,117 @@ def list_orders(
     request: Request=None,
     status: str | None = None,
     user_id: int | None = None,
-    date_from: str | None = None,
-    date_to: str | None = None,
+    product_id: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    include_archived: bool = False,
     limit: int = 20, offset: int = 0, sort: str | None = None,
 ):
-    from sqlalchemy import and_, desc
-    stmt = select(Order)
-    conds = []
-    if status:
-        conds.append(Order.status == OrderStatus(status))
-    if user_id:
-        conds.append(Order.user_id == user_id)
-    if date_from:
-        from sqlalchemy import text
-        conds.append(Order.created_at >= text(f"'{date_from}'"))
-    if date_to:
-        from sqlalchemy import text
-        conds.append(Order.created_at <= text(f"'{date_to}'"))
-    if conds:
-        from sqlalchemy import and_
-        stmt = stmt.where(and_(*conds))
+    filters = (status, user_id, product_id, date_from, date_to)
+    order_by = []
     if sort:
         for field in [s.strip() for s in sort.split(",")]:
             if not field: continue
             desc_flag = field.startswith("-"); fname = field[1:] if desc_flag else field
-            col = getattr(Order, fname, None)
-            if col is not None:
-                stmt = stmt.order_by(desc(col) if desc_flag else col)
-    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
-    rows = db.execute(stmt.offset(offset).limit(limit)).scalars().all()
-    data = [order_to_dict(db, o, get_lang(request)) for o in rows]
+            if fname in Order.__table__.c:
+                order_by.append((fname, desc_flag))
+
+    if not include_archived:
+        stmt = select(Order).where(*order_filters(Order, OrderItem, *filters))
+        for fname, desc_flag in order_by:
+            col = getattr(Order, fname)
+            stmt = stmt.order_by(desc(col) if desc_flag else col)
+        total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+        rows = db.execute(stmt.options(joinedload(Order.user)).offset(offset).limit(limit)).scalars().all()
+    else:
+        # Page over hot + archived ids together, then load each page row from its own table
+        sort_names = list(dict.fromkeys([f for f, _ in order_by] + ["created_at"]))
+        def ids(model, item_model, archived):
+            return select(
+                model.id, literal(archived).label("archived"), *[getattr(model, f) for f in sort_names]
+            ).where(*order_filters(model, item_model, *filters))
+        both = union_all(ids(Order, OrderItem, False), ids(OrderArchive, OrderItemArchive, True)).subquery()
+        total = db.execute(select(func.count()).select_from(both)).scalar()
+        page = select(both.c.id, both.c.archived)
+        for fname, desc_flag in order_by:
+            page = page.order_by(desc(both.c[fname]) if desc_flag else both.c[fname])
+        # Ties (and no sort at all) still need a stable order across pages of the union
+        page = page.order_by(both.c.created_at, both.c.id)
+        page = db.execute(page.offset(offset).limit(limit)).all()
+        loaded = {}
+        for model, archived in ((Order, False), (OrderArchive, True)):
+            wanted = [r.id for r in page if r.archived == archived]
+            if wanted:
+                loaded.update({(o.id, archived): o for o in db.execute(
+                    select(model).options(joinedload(model.user)).where(model.id.in_(wanted))
+                ).scalars()})
+        rows = [loaded[(r.id, r.archived)] for r in page]
+
+    items = get_items_by_order(db, rows)
+    data = [order_to_dict(db, o, get_lang(request), items[(type(o), o.id)]) for o in rows]
     return base_success(data, lang=get_lang(request), pagination={"limit":limit,"offset":offset,"count":len(data),"total":total})
 
+TRANSITION_HTTP_STATUS = {ErrorCodes.NOT_FOUND: 404, ErrorCodes.FORBIDDEN: 403, ErrorCodes.INVALID_ORDER: 422}
+
+def transition_one(db: Session, id: int, target: OrderStatus, **kwargs) -> dict:
+    res = transition_orders(db, [id], target, **kwargs)[0]
+    if not res["success"]:
+        err = res["error"]
+        raise BaseHTTPException(TRANSITION_HTTP_STATUS[err["code"]], err["code"], err["message"])
+    return res
+
+def bulk_response(results: list[dict]) -> dict:
+    succeeded = sum(1 for r in results if r["success"])
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+@router.post("/bulk/verify", response_model=BaseResponse[BulkTransitionResponse])
+def bulk_verify(body: BulkOrderIds, db: Session = Depends(get_db), admin=Depends(admin_required), request: Request=None):
+    results = transition_orders(db, body.ids, OrderStatus.verified)
+    return base_success(bulk_response(results), lang=get_lang(request))
+
+@router.post("/bulk/cancel", response_model=BaseResponse[BulkTransitionResponse])
+def bulk_cancel(body: BulkCancelRequest, db: Session = Depends(get_db), admin=Depends(admin_required), request: Request=None):
+    results = transition_orders(db, body.ids, OrderStatus.cancelled, cancel_reason=body.cancel_reason)
+    return base_success(bulk_response(results), lang=get_lang(request))
+
+@router.post("/bulk/complete", response_model=BaseResponse[BulkTransitionResponse])
+def bulk_complete(body: BulkOrderIds, db: Session = Depends(get_db), admin=Depends(admin_required), request: Request=None):
+    results = transition_orders(db, body.ids, OrderStatus.done)
+    return base_success(bulk_response(results), lang=get_lang(request))
+
 @router.patch("/{id}/verify", response_model=BaseResponse[OrderUpdateResponse])
 def verify(id: int, db: Session = Depends(get_db), admin=Depends(admin_required), request: Request=None):
-    o = db.get(Order, id)
-    if not o:
-        raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order not found.")
-    if o.status in {OrderStatus.cancelled, OrderStatus.done}:
-        raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Cannot verify cancelled/done order.")
-    o.status = OrderStatus.verified
-    db.commit(); db.refresh(o)
-    return base_success({"order_id": o.id, "status": o.status.value}, lang=get_lang(request))
+    res = transition_one(db, id, OrderStatus.verified)
+    return base_success({"order_id": res["order_id"], "status": res["status"]}, lang=get_lang(request))
 
 @router.patch("/{id}/cancel", response_model=BaseResponse[OrderUpdateResponse])
 def cancel(id: int, body: CancelRequest, db: Session = Depends(get_db), user=Depends(get_current_user), request: Request=None):
-    o = db.get(Order, id)
-    if not o:
-        raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order not found.")
-    
     # RBAC: Admin can cancel any order, user only their own
-    if user.role.value != "admin" and o.user_id != user.id:
-        raise BaseHTTPException(403, ErrorCodes.FORBIDDEN, "Not your order.")
-    
-    # Check if body.user_id matches (optional validation, but good to have)
-    if user.role.value != "admin" and body.user_id != user.id:
-         raise BaseHTTPException(403, ErrorCodes.FORBIDDEN, "User ID mismatch.")
+    owner_id = None
+    if user.role.value != "admin":
+        # Check if body.user_id matches (optional validation, but good to have)
+        if body.user_id != user.id:
+            raise BaseHTTPException(403, ErrorCodes.FORBIDDEN, "User ID mismatch.")
+        owner_id = user.id
 
-    if o.status in {OrderStatus.done, OrderStatus.cancelled}:
-        raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Cannot cancel completed/already cancelled order.")
-    o.status = OrderStatus.cancelled
-    o.cancel_reason = body.cancel_reason
-    db.commit(); db.refresh(o)
-    return base_success({"order_id": o.id, "status": o.status.value, "cancel_reason": o.cancel_reason}, lang=get_lang(request))
+    res = transition_one(db, id, OrderStatus.cancelled, owner_id=owner_id, cancel_reason=body.cancel_reason)
+    return base_success({"order_id": res["order_id"], "status": res["status"], "cancel_reason": res["cancel_reason"]}, lang=get_lang(request))
 
 @router.patch("/{id}/complete", response_model=BaseResponse[OrderUpdateResponse])
 def complete(id: int, db: Session = Depends(get_db), admin=Depends(admin_required), request: Request=None):
-    o = db.get(Order, id)
-    if not o:
-        raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Order not found.")
-    if o.status != OrderStatus.verified:
-        raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Only verified orders can be completed.")
-    o.status = OrderStatus.done
-    db.commit(); db.refresh(o)
-    return base_success({"order_id": o.id, "status": o.status.value}, lang=get_lang(request))
+    res = transition_one(db, id, OrderStatus.done)
+    return base_success({"order_id": res["order_id"], "status": res["status"]}, lang=get_lang(request))
 
 @router.get("/{id}/receipt")
 def get_receipt(id: int, request: Request, db: Session = Depends(get_db)):
-    order = db.get(Order, id)
+    order = get_order(db, id)
     if not order:
         return {"error": "Order not found"}
 
-    items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-
-    total = sum([i.subtotal for i in items])
-    tax = (total * Decimal("0.12")).quantize(Decimal("0.01"))
-    shipping = Decimal("100000.00")
-    total_all = total + shipping + tax
-
-    tz = ZoneInfo("Asia/Tashkent")
-    created_local = order.created_at.astimezone(tz)
-    base_url = str(request.base_url).rstrip('/')
-
-    data = {
-        "order_id": order.id,
-        "customer_name": order.user.customer_name,
-        "phone_number": order.phone_number,
-        "shipping_address": order.shipping_address,
-        "date": created_local.strftime("%d.%m.%Y"),
-        "time": created_local.strftime("%H:%M:%S"),
-        "subtotal": total,
-        "shipping": shipping,
-        "tax": tax,
-        "total": total_all,
-        "items": [],
-    }
-
-    for i in items:
-        # Try to get category name
-        category_name = "-"
-        category_id = i.product_snapshot.get("category_id")
-        if category_id:
-            category = db.get(Category, category_id)
-            if category:
-                category_name = getattr(category, "name_uz", None) or getattr(category, "name", "-")
-
-        data["items"].append({
-            "name": i.product_snapshot.get("name", "-"),
-            "category": category_name,
-            "price": i.product_snapshot.get("price", 0),
-            "quantity": i.quantity,
-            "subtotal": i.subtotal,
-            "image_url": f"{base_url}{i.product_snapshot.get('image_url', '')}"
-        })
-
-    pdf = generate_order_pdf(data)
+    # Normally pre-rendered by the worker; render inline only if that has not happened yet
+    pdf = receipt_service.stored_receipt(order.id)
+    metrics.CACHE_REQUESTS.inc(cache="receipts", result="miss" if pdf is None else "hit")
+    if pdf is None:
+        pdf = receipt_service.render_receipt(db, order, str(request.base_url).rstrip('/'))
     headers = {"Content-Disposition": f'inline; filename=\"order_{order.id}_receipt.pdf\"'}
-    return Response(content=pdf, media_type="application/pdf", headers=headers)
\ No newline at end of file
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
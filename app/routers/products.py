@@ -1,23 +1,53 @@
 from fastapi import APIRouter, Depends, Request, Query, Form, File, UploadFile
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_, or_
-from app.schemas.product import ProductCreate, ProductUpdate, ProductOut, ProductListResponse
+from sqlalchemy import select, func, and_
+from sqlalchemy.exc import IntegrityError
+from app.schemas.product import ProductCreate, ProductUpdate, ProductOut, ProductListResponse, ProductBatchRequest, ProductBatchResponse, ProductSuggestResponse
 from app.schemas.base import BaseResponse
 from app.core.deps import get_db, admin_required
 from app.core.response import base_success, BaseHTTPException, ErrorCodes
 from app.core.pagination import page_params
+from app.core import fieldsets
+from app.core.fieldsets import fieldset_params, format_param
 from app.core.i18n import get_lang
+from app.core.config import settings
+from app.core.timing import TimedRoute
 from app.db.models.product import Product
 from app.db.models.category import Category
+from app.services.product_cache import product_cache
+from app.services import product_facets, product_search
+from app.services.product_facets import facet_cache
+from app.services.product_suggest import suggest_index
+from app.services import catalog_sync
+from app.schemas.sync import ChangesResponse
 from pathlib import Path
 import uuid, shutil
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 UPLOAD_DIR = Path("app/static/uploads/products")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def product_out(p, lang: str) -> ProductOut:
+    return ProductOut(
+        id=p.id,
+        name=(p.name_en if lang == "en" else (p.name_ru if lang == "ru" else p.name_uz)),
+        name_uz=p.name_uz,
+        name_ru=p.name_ru,
+        name_en=p.name_en,
+        description=(p.description_en if lang == "en" else (p.description_ru if lang == "ru" else p.description_uz)),
+        description_uz=p.description_uz,
+        description_ru=p.description_ru,
+        description_en=p.description_en,
+        price=float(p.price),
+        image_url=p.image_url,
+        category_id=p.category_id,
+        stock=p.stock
+    )
+
+
 @router.post("", response_model=BaseResponse[ProductOut])
 async def create_product(
     name_uz: str = Form(...),
@@ -29,6 +59,7 @@ async def create_product(
     description_ru: str | None = Form(None),
     description_en: str | None = Form(None),
     image_url: str = Form(...), # Changed to string URL as per TZ
+    stock: int | None = Form(None, ge=0, description="Units in stock; omit to not track stock"),
     db: Session = Depends(get_db),
     admin=Depends(admin_required),
     request: Request = None
@@ -51,11 +82,15 @@ async def create_product(
         description_en=description_en,
         price=price,
         category_id=category_id,
-        image_url=image_url
+        image_url=image_url,
+        stock=stock
     )
     db.add(p)
     db.commit()
+    product_cache.invalidate()
+    facet_cache.invalidate()
     db.refresh(p)
+    suggest_index.upsert(p)
 
     # ✅ Tilni aniqlash
     lang = get_lang(request)
@@ -76,6 +111,7 @@ async def create_product(
             price=float(p.price),
             image_url=p.image_url,
             category_id=p.category_id,
+            stock=p.stock,
         ),
         lang=lang
     )
@@ -92,6 +128,8 @@ async def update_product(
     description_ru: str | None = Form(None),
     description_en: str | None = Form(None),
     image_url: str | None = Form(None),
+    stock: int | None = Form(None, ge=0, description="Set the stock count"),
+    stock_delta: int | None = Form(None, description="Add to (or take from) the current stock atomically, e.g. a restock"),
     db: Session = Depends(get_db),
     admin=Depends(admin_required),
     request: Request = None
@@ -111,30 +149,29 @@ async def update_product(
         "description_en": description_en,
         "price": price,
         "category_id": category_id,
-        "image_url": image_url
+        "image_url": image_url,
+        "stock": stock
     }
     for key, value in updates.items():
         if value is not None:
             setattr(p, key, value)
+    if stock_delta is not None:
+        # Relative to the committed value, so it cannot lose concurrent order reservations
+        p.stock = func.coalesce(Product.stock, 0) + stock_delta
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, "Stock cannot be negative.")
 
     db.commit()
+    product_cache.invalidate()
+    facet_cache.invalidate()
     db.refresh(p)
+    suggest_index.upsert(p)
 
     lang = get_lang(request)
-    return base_success(ProductOut(
-        id=p.id,
-        name=(p.name_en if lang == "en" else (p.name_ru if lang == "ru" else p.name_uz)),
-        name_uz=p.name_uz,
-        name_ru=p.name_ru,
-        name_en=p.name_en,
-        description=(p.description_en if lang == "en" else (p.description_ru if lang == "ru" else p.description_uz)),
-        description_uz=p.description_uz,
-        description_ru=p.description_ru,
-        description_en=p.description_en,
-        price=float(p.price),
-        image_url=p.image_url,
-        category_id=p.category_id
-    ), lang=lang)
+    return base_success(product_out(p, lang), lang=lang)
 
 @router.delete("/{id}", status_code=204)
 def delete_product(id: int, db: Session = Depends(get_db), admin=Depends(admin_required)):
@@ -142,28 +179,97 @@ def delete_product(id: int, db: Session = Depends(get_db), admin=Depends(admin_r
     if not p:
         raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Product not found.")
     db.delete(p); db.commit()
+    product_cache.invalidate()
+    facet_cache.invalidate()
+    suggest_index.remove(id)
     return
 
+def batch_lookup(db: Session, ids: list[int], lang: str) -> dict:
+    if len(ids) > settings.PRODUCT_BATCH_MAX_IDS:
+        raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, f"At most {settings.PRODUCT_BATCH_MAX_IDS} ids per request.", {"fields": {"ids": "Too many ids."}})
+    # A warm product cache answers without touching the database. It is per process, so ids it
+    # lacks (created through another worker or sqladmin) are still looked up before being reported missing
+    cached = product_cache.peek() or {}
+    found = {i: cached[i] for i in ids if i in cached}
+    misses = set(ids) - found.keys()
+    if misses:
+        found.update({p.id: p for p in db.execute(select(Product).where(Product.id.in_(misses))).scalars()})
+    items = [
+        {"id": i, "found": True, "product": product_out(found[i], lang)} if i in found else {"id": i, "found": False, "product": None}
+        for i in ids
+    ]
+    return {"items": items, "missing": [i for i in dict.fromkeys(ids) if i not in found]}
+
+@router.get("/batch", response_model=BaseResponse[ProductBatchResponse])
+def get_batch(
+    ids: str = Query(..., description="Comma separated product ids, e.g. 1,2,3"),
+    db: Session = Depends(get_db),
+    request: Request = None,
+):
+    """Several products at once (cart, order history), in the requested order; unknown ids come back with found=false."""
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, "ids must be comma separated integers.", {"fields": {"ids": "Not an integer list."}})
+    if not parsed:
+        raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, "ids is empty.", {"fields": {"ids": "Give at least one id."}})
+    lang = get_lang(request)
+    return base_success(batch_lookup(db, parsed, lang), lang=lang)
+
+@router.post("/batch", response_model=BaseResponse[ProductBatchResponse])
+def post_batch(body: ProductBatchRequest, db: Session = Depends(get_db), request: Request = None):
+    """Same as GET /products/batch, for id lists too long for a URL."""
+    lang = get_lang(request)
+    return base_success(batch_lookup(db, body.ids, lang), lang=lang)
+
+@router.get("/suggest", response_model=BaseResponse[ProductSuggestResponse])
+async def suggest(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far, in any script"),
+    limit: int = Query(settings.SUGGEST_LIMIT, ge=1, le=settings.SUGGEST_MAX_LIMIT),
+):
+    """
+    Search-as-you-type: the best-selling products with a name word starting with `q`, served
+    from this worker's in-memory index without a database query.
+    """
+    lang = get_lang(request)
+    if not suggest_index.ready:
+        # Only until the startup load finishes (or for apps run without startup events)
+        suggest_index.start()
+        return JSONResponse(base_success({"items": [], "ready": False}, lang=lang))
+    items = [
+        {"id": s.id, "name": s.name_en if lang == "en" else (s.name_ru if lang == "ru" else s.name_uz), "price": s.price, "image_url": s.image_url}
+        for s in suggest_index.suggest(q, limit)
+    ]
+    # Plain JSON types already; skip response-model validation on the hot path
+    return JSONResponse(base_success({"items": items, "ready": True}, lang=lang))
+
+@router.get("/changes", response_model=BaseResponse[ChangesResponse[ProductOut]])
+def product_changes(
+    db: Session = Depends(get_db),
+    request: Request = None,
+    since: str | None = Query(None, description="next_token from the previous call; omit for everything"),
+    limit: int = Query(500, ge=1, le=1000),
+):
+    """Products created or updated since the token, plus deleted ids, for client-side caches."""
+    lang = get_lang(request)
+    res = catalog_sync.changes(db, "product", since, limit)
+    res["changed"] = [product_out(p, lang) for p in res["changed"]]
+    return base_success(res, lang=lang)
+
 @router.get("/{id}", response_model=BaseResponse[ProductOut])
-def get_product(id: int, db: Session = Depends(get_db), request: Request=None):
+def get_product(id: int, db: Session = Depends(get_db), request: Request=None, fs: tuple[str | None, bool]=Depends(fieldset_params)):
+    lang = get_lang(request)
+    names = fieldsets.resolve(fs, fieldsets.PRODUCT_FIELDS, fieldsets.PRODUCT_COMPACT)
+    if names:
+        row = db.execute(select(*fieldsets.columns(Product, names, lang)).where(Product.id == id)).first()
+        if not row:
+            raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Product not found.")
+        return fieldsets.sparse_response(dict(zip(names, row)), lang)
     p = db.get(Product, id)
     if not p:
         raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Product not found.")
-    lang = get_lang(request)
-    return base_success(ProductOut(
-        id=p.id,
-        name=(p.name_en if lang == "en" else (p.name_ru if lang == "ru" else p.name_uz)),
-        name_uz=p.name_uz,
-        name_ru=p.name_ru,
-        name_en=p.name_en,
-        description=(p.description_en if lang == "en" else (p.description_ru if lang == "ru" else p.description_uz)),
-        description_uz=p.description_uz,
-        description_ru=p.description_ru,
-        description_en=p.description_en,
-        price=float(p.price),
-        image_url=p.image_url,
-        category_id=p.category_id
-    ), lang=lang)
+    return base_success(product_out(p, lang), lang=lang)
 
 @router.get("", response_model=BaseResponse[list[ProductOut]])
 def list_products(
@@ -175,28 +281,28 @@ def list_products(
     max_price: float | None = None,
     q: str | None = None,
     sort: str | None = Query(None, description="Comma separated fields e.g. price,-created_at"),
+    fs: tuple[str | None, bool]=Depends(fieldset_params),
+    format: str=Depends(format_param),
+    facets: str | None = Query(None, description="Comma separated: category,price. Counts come back in meta.facets"),
 ):
     limit, offset = lp
+    lang = get_lang(request)
+    names = fieldsets.resolve(fs, fieldsets.PRODUCT_FIELDS, fieldsets.PRODUCT_COMPACT, format)
+    wanted = product_facets.parse(facets)
     stmt = select(Product)
-    conds = []
+    # Kept apart so each facet can leave out its own filter
+    category_conds, price_conds, search_conds = [], [], []
     if category_id:
-        conds.append(Product.category_id == category_id)
+        category_conds.append(Product.category_id == category_id)
     if min_price is not None:
-        conds.append(Product.price >= min_price)
+        price_conds.append(Product.price >= min_price)
     if max_price is not None:
-        conds.append(Product.price <= max_price)
-    if q:
-        like = f"%{q}%"
-        conds.append(or_(
-            Product.name_uz.ilike(like), 
-            Product.name_ru.ilike(like), 
-            Product.name_en.ilike(like),
-            Product.description_uz.ilike(like), 
-            Product.description_ru.ilike(like),
-            Product.description_en.ilike(like)
-        ))
+        price_conds.append(Product.price <= max_price)
+    match = product_search.matches(q)
+    if match is not None:
+        search_conds.append(match)
+    conds = search_conds + category_conds + price_conds
     if conds:
-        from sqlalchemy import and_
         stmt = stmt.where(and_(*conds))
 
     # Sorting
@@ -210,10 +316,23 @@ def list_products(
             if col is not None:
                 stmt = stmt.order_by(desc(col) if desc_flag else col)
 
-    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+    facet_data = None
+    if wanted:
+        # The facet query also yields the total; cached, only the page itself is queried
+        key = (category_id or None, min_price, max_price, product_search.normalize(q) if match is not None else None)
+        cached = facet_cache.get(key)
+        if cached is None:
+            cached = product_facets.compute(db, search_conds, category_conds, price_conds)
+            facet_cache.put(key, *cached)
+        total, facet_data = cached[0], product_facets.pick(cached[1], wanted)
+    else:
+        total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+    if names:
+        rows = db.execute(stmt.with_only_columns(*fieldsets.columns(Product, names, lang)).offset(offset).limit(limit)).all()
+        data = fieldsets.encode(rows, names, format)
+        return fieldsets.sparse_response(data, lang, {"limit":limit,"offset":offset,"count":len(rows),"total":total}, facet_data)
     rows = db.execute(stmt.offset(offset).limit(limit)).scalars().all()
-    lang = get_lang(request)
-    
+
     def get_name(p):
         if lang == "en": return p.name_en
         if lang == "ru": return p.name_ru
@@ -236,33 +355,26 @@ def list_products(
         description_en=p.description_en,
         price=float(p.price),
         image_url=p.image_url,
-        category_id=p.category_id
+        category_id=p.category_id,
+        stock=p.stock
     ) for p in rows]
-    return base_success(data, lang=lang, pagination={"limit":limit,"offset":offset,"count":len(data),"total":total})
+    return base_success(data, lang=lang, pagination={"limit":limit,"offset":offset,"count":len(data),"total":total}, facets=facet_data)
 
 @router.get("/category/{category_id}", response_model=BaseResponse[list[ProductOut]])
-def by_category(category_id: int, db: Session = Depends(get_db), request: Request=None, lp: tuple[int,int]=Depends(page_params)):
+def by_category(category_id: int, db: Session = Depends(get_db), request: Request=None, lp: tuple[int,int]=Depends(page_params), fs: tuple[str | None, bool]=Depends(fieldset_params), format: str=Depends(format_param)):
     limit, offset = lp
+    lang = get_lang(request)
+    names = fieldsets.resolve(fs, fieldsets.PRODUCT_FIELDS, fieldsets.PRODUCT_COMPACT, format)
     # ensure category exists
     from app.db.models.category import Category
     cat = db.get(Category, category_id)
     if not cat:
         raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, "Category not found.")
     total = db.execute(select(func.count()).select_from(Product).where(Product.category_id == category_id)).scalar()
+    if names:
+        rows = db.execute(select(*fieldsets.columns(Product, names, lang)).where(Product.category_id == category_id).offset(offset).limit(limit)).all()
+        data = fieldsets.encode(rows, names, format)
+        return fieldsets.sparse_response(data, lang, {"limit":limit,"offset":offset,"count":len(rows),"total":total})
     rows = db.execute(select(Product).where(Product.category_id == category_id).offset(offset).limit(limit)).scalars().all()
-    lang = get_lang(request)
-    data = [ProductOut(
-        id=p.id,
-        name=(p.name_en if lang == "en" else (p.name_ru if lang == "ru" else p.name_uz)),
-        name_uz=p.name_uz,
-        name_ru=p.name_ru,
-        name_en=p.name_en,
-        description=(p.description_en if lang == "en" else (p.description_ru if lang == "ru" else p.description_uz)),
-        description_uz=p.description_uz,
-        description_ru=p.description_ru,
-        description_en=p.description_en,
-        price=float(p.price),
-        image_url=p.image_url,
-        category_id=p.category_id
-    ) for p in rows]
+    data = [product_out(p, lang) for p in rows]
     return base_success(data, lang=lang, pagination={"limit":limit,"offset":offset,"count":len(data),"total":total})
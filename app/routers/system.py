@@ -1,8 +1,47 @@
-from fastapi import APIRouter
-from app.core.response import base_success
+import hmac
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from app.core.deps import get_db, admin_required
+from app.core.response import base_success, BaseHTTPException, ErrorCodes
+from app.core.config import settings
+from app.core import metrics
+from app.core.i18n import get_lang
+from app.core.timing import TimedRoute
+from app.services.job_queue import queue_stats
+from app.services.slow_queries import top_slow_queries
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/health")
 def health():
     return base_success({"status": "ok"})
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(authorization: str | None = Header(None)):
+    """Prometheus text exposition for every API/worker process on this host (see METRICS_DIR)."""
+    if settings.METRICS_TOKEN and not (authorization and hmac.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}")):
+        raise BaseHTTPException(401, ErrorCodes.AUTH_FAILED, "Invalid metrics token.")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/slow-queries")
+def slow_query_list(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total", pattern="^(total|max|mean|calls|recent)$"),
+    include_plan: bool = False,
+    db: Session = Depends(get_db),
+    admin=Depends(admin_required),
+    request: Request = None,
+):
+    """Slowest statement fingerprints seen above SLOW_QUERY_MS, with the latest EXPLAIN plan on request."""
+    return base_success(top_slow_queries(db, limit, sort, include_plan), lang=get_lang(request))
+
+@router.get("/jobs")
+def jobs(
+    window_minutes: int = Query(60, ge=1, le=1440, description="Latency window over recently finished jobs"),
+    db: Session = Depends(get_db),
+    admin=Depends(admin_required),
+    request: Request = None,
+):
+    """Background queue depth (ready/scheduled/running/failed) and wait/run latency per queue."""
+    return base_success(queue_stats(db, window_minutes), lang=get_lang(request))
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+class SalesRow(BaseModel):
+    day: str | None = None
+    product_id: int | None = None
+    category_id: int | None = None
+    status: str | None = None
+    quantity: int
+    revenue: float
+    orders_count: int
+
+class TopProductOut(BaseModel):
+    product_id: int
+    product_name: str | None = None
+    category_id: int
+    quantity: int
+    revenue: float
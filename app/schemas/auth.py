@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class RegisterRequest(BaseModel):
@@ -38,4 +38,35 @@ class UserResponse(BaseModel):
 
 class UserListResponse(BaseModel):
     users: list[UserResponse]
-    count: int
\ No newline at end of file
+    count: int
+    next_cursor: int | None = None
+
+class UserUpsertItem(BaseModel):
+    phone_number: str = Field(min_length=1, max_length=20)
+    customer_name: str = Field(min_length=1, max_length=100)
+    # Omit to leave the user's current Telegram ID as it is
+    telegram_id: int | None = None
+
+
+class UserUpsertRequest(BaseModel):
+    users: list[UserUpsertItem] = Field(min_length=1, max_length=5000)
+
+
+class UserUpsertError(BaseModel):
+    code: str
+    message: str
+
+
+class UserUpsertResult(BaseModel):
+    phone_number: str
+    status: str
+    user_id: int | None = None
+    error: UserUpsertError | None = None
+
+
+class UserUpsertResponse(BaseModel):
+    results: list[UserUpsertResult]
+    created: int
+    updated: int
+    unchanged: int
+    conflicted: int
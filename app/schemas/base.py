@@ -21,6 +21,7 @@ class MetaResponse(BaseModel):
     trace_id: str | None = None
     lang: str | None = None
     pagination: PaginationMeta | None = None
+    facets: dict[str, list[dict[str, Any]]] | None = None
 
 class BaseResponse(BaseModel, Generic[DataT]):
     success: bool = True
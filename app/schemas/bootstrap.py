@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from app.schemas.auth import UserResponse
+from app.schemas.base import PaginationMeta
+from app.schemas.category import CategoryOut
+from app.schemas.product import ProductOut
+
+
+class BootstrapResponse(BaseModel):
+    # A section is null when the client's If-None-Match already has its ETag (see not_modified)
+    user: UserResponse | None = None
+    categories: list[CategoryOut] | None = None
+    products: list[ProductOut] | None = None
+    products_pagination: PaginationMeta | None = None
+    etags: dict[str, str]
+    not_modified: list[str] = []
@@ -4,6 +4,8 @@ from typing import List, Optional
 class OrderItemIn(BaseModel):
     product_id: int
     quantity: int = Field(ge=1)
+    # Price the client showed in the cart; the order is refused if it no longer matches
+    price: Optional[float] = None
 
 class OrderCreate(BaseModel):
     user_id: int
@@ -12,6 +14,13 @@ class OrderCreate(BaseModel):
     comment: Optional[str] = Field(default=None, max_length=500)
     items: List[OrderItemIn]
 
+class OrderIntakeResponse(BaseModel):
+    token: str
+    status: str
+    order_id: Optional[int] = None
+    total_amount: float
+    error: Optional[str] = None
+
 class OrderUpdate(BaseModel):
     shipping_address: str | None = None
     phone_number: str | None = None
@@ -21,6 +30,12 @@ class CancelRequest(BaseModel):
     user_id: int
     cancel_reason: str = Field(min_length=1, max_length=300)
 
+class BulkOrderIds(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=1000)
+
+class BulkCancelRequest(BulkOrderIds):
+    cancel_reason: str = Field(min_length=1, max_length=300)
+
 class OrderCreateResponse(BaseModel):
     order_id: int
     status: str
@@ -32,6 +47,22 @@ class OrderUpdateResponse(BaseModel):
     status: str
     cancel_reason: str | None = None
 
+class BulkTransitionError(BaseModel):
+    code: str
+    message: str
+
+class BulkTransitionResult(BaseModel):
+    order_id: int
+    success: bool
+    status: str | None = None
+    cancel_reason: str | None = None
+    error: BulkTransitionError | None = None
+
+class BulkTransitionResponse(BaseModel):
+    results: list[BulkTransitionResult]
+    succeeded: int
+    failed: int
+
 class OrderItemOut(BaseModel):
     product_id: int
     product_name: str
@@ -35,6 +35,31 @@ class ProductOut(BaseModel):
     price: float
     image_url: str | None = None
     category_id: int
+    stock: int | None = None
+
+class ProductBatchRequest(BaseModel):
+    ids: list[int] = Field(min_length=1)
+
+class ProductBatchItem(BaseModel):
+    id: int
+    found: bool
+    product: ProductOut | None = None
+
+class ProductBatchResponse(BaseModel):
+    # One item per requested id, in request order
+    items: list[ProductBatchItem]
+    missing: list[int]
+
+class ProductSuggestion(BaseModel):
+    id: int
+    name: str
+    price: float
+    image_url: str | None = None
+
+class ProductSuggestResponse(BaseModel):
+    items: list[ProductSuggestion]
+    # False while this worker is still loading its index (items is empty then)
+    ready: bool
 
 class ProductListResponse(BaseModel):
     products: list[ProductOut]
@@ -0,0 +1,12 @@
+from typing import Generic, TypeVar
+from pydantic import BaseModel
+
+ItemT = TypeVar("ItemT")
+
+class ChangesResponse(BaseModel, Generic[ItemT]):
+    changed: list[ItemT]
+    # Ids deleted since the token; drop them from the local copy
+    deleted: list[int]
+    # Pass as `since` next time; while has_more is true, call again right away
+    next_token: str
+    has_more: bool
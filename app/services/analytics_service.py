@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, cast, literal, distinct, text, union_all, Date, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db.models.analytics import SalesDaily
+from app.db.models.order import Order, OrderItem, OrderArchive, OrderItemArchive, OrderStatus
+
+ROLLUP_KEYS = ["day", "product_id", "category_id", "status"]
+ROLLUP_VALUES = ["quantity", "revenue", "orders_count"]
+
+
+def _item_keys(order_model=Order, item_model=OrderItem):
+    return (
+        cast(order_model.created_at, Date),
+        item_model.product_id,
+        item_model.product_snapshot["category_id"].as_integer(),
+    )
+
+
+def _upsert(db: Session, source):
+    stmt = pg_insert(SalesDaily).from_select(ROLLUP_KEYS + ROLLUP_VALUES, source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=ROLLUP_KEYS,
+        set_={k: getattr(SalesDaily, k) + getattr(stmt.excluded, k) for k in ROLLUP_VALUES},
+    )
+    db.execute(stmt)
+
+
+def _apply(db: Session, order_ids: list[int], status: OrderStatus, sign: int):
+    """Add (sign=1) or subtract (sign=-1) the items of `order_ids` under `status`."""
+    if not order_ids:
+        return
+    day, product_id, category_id = _item_keys()
+    source = (
+        select(
+            day, product_id, category_id, literal(OrderStatus(status).value, String),
+            func.sum(OrderItem.quantity) * sign,
+            func.sum(OrderItem.subtotal) * sign,
+            func.count(distinct(OrderItem.order_id)) * sign,
+        )
+        .join(Order, (Order.id == OrderItem.order_id) & (Order.created_at == OrderItem.order_created_at))
+        .where(OrderItem.order_id.in_(order_ids))
+        .group_by(day, product_id, category_id)
+    )
+    _upsert(db, source)
+
+
+def record_orders(db: Session, order_ids: list[int], status: OrderStatus = OrderStatus.checking):
+    """Count freshly created orders. Runs inside the caller's transaction; items must be flushed."""
+    _apply(db, order_ids, status, 1)
+
+
+def move_orders(db: Session, order_ids: list[int], old_status: OrderStatus, new_status: OrderStatus):
+    """Move orders from one status bucket to another after a status transition."""
+    if OrderStatus(old_status) == OrderStatus(new_status):
+        return
+    _apply(db, order_ids, old_status, -1)
+    _apply(db, order_ids, new_status, 1)
+
+
+def forget_orders(db: Session, order_ids: list[int], status: OrderStatus):
+    """Remove deleted orders from the rollup."""
+    _apply(db, order_ids, status, -1)
+
+
+def rebuild_sales_rollup(db: Session, date_from: date | None = None, date_to: date | None = None) -> int:
+    """
+    Recompute the rollup from live and archived order items for [date_from, date_to]
+    (whole history by default). The table lock makes concurrent order writes wait,
+    so their deltas land on top of the rebuilt rows.
+    """
+    db.execute(text("LOCK TABLE sales_daily IN EXCLUSIVE MODE"))
+    wipe = delete(SalesDaily)
+    if date_from:
+        wipe = wipe.where(SalesDaily.day >= date_from)
+    if date_to:
+        wipe = wipe.where(SalesDaily.day <= date_to)
+    db.execute(wipe)
+
+    parts = []
+    for order_model, item_model in ((Order, OrderItem), (OrderArchive, OrderItemArchive)):
+        day, product_id, category_id = _item_keys(order_model, item_model)
+        part = (
+            select(
+                day.label("day"), product_id.label("product_id"), category_id.label("category_id"),
+                cast(order_model.status, String).label("status"),
+                item_model.quantity, item_model.subtotal, item_model.order_id,
+            )
+            .join(order_model, (order_model.id == item_model.order_id) & (order_model.created_at == item_model.order_created_at))
+        )
+        if date_from:
+            part = part.where(order_model.created_at >= date_from)
+        if date_to:
+            part = part.where(order_model.created_at < date_to + timedelta(days=1))
+        parts.append(part)
+    rows = union_all(*parts).subquery()
+    keys = [rows.c.day, rows.c.product_id, rows.c.category_id, rows.c.status]
+    source = (
+        select(*keys, func.sum(rows.c.quantity), func.sum(rows.c.subtotal), func.count(distinct(rows.c.order_id)))
+        .group_by(*keys)
+    )
+    _upsert(db, source)
+    db.commit()
+    return db.execute(select(func.count()).select_from(SalesDaily)).scalar()
@@ -0,0 +1,66 @@
+import time
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from app.db.models.order import Order, OrderItem, OrderArchive, OrderItemArchive, OrderStatus
+
+ARCHIVABLE_STATUSES = (OrderStatus.done, OrderStatus.cancelled)
+
+
+def _columns(model) -> str:
+    return ", ".join(c.name for c in model.__table__.c if c.name != "archived_at")
+
+
+def archive_batch(db: Session, older_than_days: int, batch_size: int, order_ids: list[int] | None = None) -> int:
+    """
+    Move up to `batch_size` done/cancelled orders older than `older_than_days` (and their items)
+    into the archive tables in one statement and commit; `order_ids` limits it to those orders.
+    Rows locked by other transactions are skipped, so the job never waits on live traffic.
+    """
+    statuses = ", ".join(f"'{s.value}'" for s in ARCHIVABLE_STATUSES)
+    order_cols, item_cols = _columns(OrderArchive), _columns(OrderItemArchive)
+    moved = db.execute(text(f"""
+        WITH batch AS (
+            SELECT id, created_at FROM {Order.__tablename__}
+            WHERE status IN ({statuses}) AND created_at < localtimestamp - make_interval(days => :days)
+            {"AND id = ANY(:order_ids)" if order_ids is not None else ""}
+            ORDER BY created_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        ),
+        moved_items AS (
+            DELETE FROM {OrderItem.__tablename__} i USING batch b
+            WHERE i.order_id = b.id AND i.order_created_at = b.created_at
+            RETURNING i.*
+        ),
+        moved_orders AS (
+            DELETE FROM {Order.__tablename__} o USING batch b
+            WHERE o.id = b.id AND o.created_at = b.created_at
+            RETURNING o.*
+        ),
+        archived_orders AS (
+            INSERT INTO {OrderArchive.__tablename__} ({order_cols})
+            SELECT {order_cols} FROM moved_orders
+            RETURNING id
+        ),
+        archived_items AS (
+            INSERT INTO {OrderItemArchive.__tablename__} ({item_cols})
+            SELECT {item_cols} FROM moved_items
+        )
+        SELECT count(*) FROM archived_orders
+    """), {"days": older_than_days, "batch_size": batch_size, "order_ids": order_ids}).scalar()
+    db.commit()
+    return moved
+
+
+def archive_orders(
+    db: Session, older_than_days: int, batch_size: int = 500, pause: float = 0.0, order_ids: list[int] | None = None,
+) -> int:
+    """Archive in short batches until nothing old is left; returns the number of orders moved."""
+    total = 0
+    while True:
+        moved = archive_batch(db, older_than_days, batch_size, order_ids)
+        total += moved
+        if moved < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
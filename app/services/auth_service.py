@@ -1,8 +1,18 @@
+import csv
+import enum
+import io
+import json
+import re
 import secrets
+from datetime import datetime
+from typing import Iterator
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, func, or_, bindparam, literal_column, String, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 
 from app.db.models.user import User, RoleEnum
+from app.db.session import SessionLocal
 from app.core.response import BaseHTTPException, ErrorCodes
 
 
@@ -74,4 +84,187 @@ def login(db: Session, phone_number: str) -> User:
             "Phone number is not registered."
         )
 
-    return user
\ No newline at end of file
+    return user
+
+# --- batch upsert (bot sync) ------------------------------------------------------
+
+UPSERT_ATTEMPTS = 3
+
+
+def _upsert_statement(rows: list[dict]):
+    """One INSERT ... ON CONFLICT (phone_number) DO UPDATE for every row, fed from three arrays."""
+    source = select(
+        func.unnest(bindparam("phones", [r["phone_number"] for r in rows], type_=ARRAY(String))),
+        func.unnest(bindparam("names", [r["customer_name"] for r in rows], type_=ARRAY(String))),
+        func.unnest(bindparam("telegram_ids", [r["telegram_id"] for r in rows], type_=ARRAY(BigInteger))),
+    )
+    stmt = pg_insert(User).from_select(["phone_number", "customer_name", "telegram_id"], source)
+    ex = stmt.excluded
+    new_telegram_id = func.coalesce(ex.telegram_id, User.telegram_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.phone_number],
+        set_={"customer_name": ex.customer_name, "telegram_id": new_telegram_id, "updated_at": func.now()},
+        # Rows that would not change are skipped (and so not returned)
+        where=or_(User.customer_name.is_distinct_from(ex.customer_name), User.telegram_id.is_distinct_from(new_telegram_id)),
+    )
+    # xmax is 0 only on freshly inserted row versions
+    return stmt.returning(User.id, User.phone_number, literal_column("xmax = 0").label("inserted"))
+
+
+def upsert_users(db: Session, items: list[dict]) -> list[dict]:
+    """
+    Create or update users by phone number in a single statement and commit. New users get the
+    `user` role; existing users keep theirs and get the new name and, when given, Telegram ID.
+
+    An item is a conflict (and left out) when its phone number already appeared earlier in the
+    batch, or its Telegram ID belongs to another user. Returns one result per item, in order.
+    """
+    conflicts: dict[int, dict] = {}
+    first_phone: dict[str, int] = {}
+    first_telegram: dict[int, str] = {}
+    for n, item in enumerate(items):
+        if item["phone_number"] in first_phone:
+            conflicts[n] = {"code": ErrorCodes.DUPLICATE, "message": "Phone number repeated in this batch."}
+            continue
+        tid = item["telegram_id"]
+        if tid is not None and first_telegram.setdefault(tid, item["phone_number"]) != item["phone_number"]:
+            conflicts[n] = {"code": ErrorCodes.DUPLICATE, "message": "Telegram ID repeated in this batch."}
+            continue
+        first_phone[item["phone_number"]] = n
+
+    for attempt in range(UPSERT_ATTEMPTS):
+        candidates = [n for n in first_phone.values() if n not in conflicts]
+        tids = [items[n]["telegram_id"] for n in candidates if items[n]["telegram_id"] is not None]
+        owners = dict(db.execute(select(User.telegram_id, User.phone_number).where(User.telegram_id.in_(tids))).all()) if tids else {}
+        rows = []
+        for n in candidates:
+            owner = owners.get(items[n]["telegram_id"])
+            if owner is not None and owner != items[n]["phone_number"]:
+                conflicts[n] = {"code": ErrorCodes.USER_EXISTS, "message": "Telegram ID already in use"}
+            else:
+                rows.append(items[n])
+        written = {}
+        if not rows:
+            break
+        try:
+            written = {r.phone_number: r for r in db.execute(_upsert_statement(rows))}
+            break
+        except IntegrityError:
+            # A concurrent request took one of the Telegram IDs after the check; only reads
+            # preceded the upsert, so start over and look again
+            db.rollback()
+            if attempt == UPSERT_ATTEMPTS - 1:
+                raise
+
+    results = []
+    for n, item in enumerate(items):
+        phone = item["phone_number"]
+        if n in conflicts:
+            results.append({"phone_number": phone, "status": "conflict", "user_id": None, "error": conflicts[n]})
+        elif phone in written:
+            r = written[phone]
+            results.append({"phone_number": phone, "status": "created" if r.inserted else "updated", "user_id": r.id, "error": None})
+        else:
+            results.append({"phone_number": phone, "status": "unchanged", "user_id": None, "error": None})
+    unchanged = [r for r in results if r["status"] == "unchanged"]
+    if unchanged:
+        ids = dict(db.execute(select(User.phone_number, User.id).where(User.phone_number.in_([r["phone_number"] for r in unchanged]))).all())
+        for r in unchanged:
+            r["user_id"] = ids.get(r["phone_number"])
+    db.commit()
+    return results
+
+
+# --- admin user list / export ------------------------------------------------------
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ("id", "customer_name", "phone_number", "role", "telegram_id", "created_at")
+PHONE_NOISE = re.compile(r"[\s()\-]")
+
+
+def _prefix_pattern(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def user_filters(phone: str | None = None, name: str | None = None) -> list:
+    """
+    Prefix filters served by ix_users_phone_number_prefix / ix_users_customer_name_prefix:
+    `phone` matches the start of the number (spaces, dashes, brackets ignored), `name` the
+    start of the name, case-insensitively.
+    """
+    conds = []
+    if phone and PHONE_NOISE.sub("", phone):
+        conds.append(User.phone_number.like(_prefix_pattern(PHONE_NOISE.sub("", phone)), escape="\\"))
+    if name and name.strip():
+        conds.append(func.lower(User.customer_name).like(_prefix_pattern(name.strip().lower()), escape="\\"))
+    return conds
+
+
+def list_users(db: Session, limit: int, cursor: int | None = None, phone: str | None = None, name: str | None = None) -> tuple[list[User], int | None]:
+    """
+    One page of users, newest first. Keyset pagination on the primary key: pass the returned
+    cursor back to get the next page (None when there is none), so deep pages cost the same as the first.
+    """
+    stmt = select(User).where(*user_filters(phone, name))
+    if cursor is not None:
+        stmt = stmt.where(User.id < cursor)
+    users = db.execute(stmt.order_by(User.id.desc()).limit(limit + 1)).scalars().all()
+    if len(users) > limit:
+        return users[:limit], users[limit - 1].id
+    return users, None
+
+
+def _export_value(value):
+    if value is None:
+        return None
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return str(value)
+    return value
+
+
+# Cells starting like a formula are run by Excel/LibreOffice when the CSV is opened
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+    value = _export_value(value)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        # A leading apostrophe makes spreadsheets show the cell as text (phone numbers keep their "+")
+        return "'" + value
+    return value
+
+
+def export_users(fmt: str, phone: str | None = None, name: str | None = None) -> Iterator[str]:
+    """
+    Stream every matching user as NDJSON or CSV chunks of EXPORT_BATCH_SIZE rows.
+
+    Rows come from a server-side cursor on a session of its own (the request's session is
+    closed as soon as the endpoint returns, before the body is streamed), so memory stays flat
+    however many users there are.
+    """
+    stmt = (
+        select(*(getattr(User, c) for c in EXPORT_COLUMNS))
+        .where(*user_filters(phone, name))
+        .order_by(User.id)
+    )
+    with SessionLocal() as db:
+        result = db.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(EXPORT_COLUMNS)
+            for rows in result.partitions():
+                writer.writerows([_csv_value(v) for v in row] for row in rows)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+        else:
+            for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, map(_export_value, row))), ensure_ascii=False) + "\n"
+                    for row in rows
+                )
@@ -0,0 +1,90 @@
+"""
+Delta sync for client-side catalog caches.
+
+    GET /products/changes                 everything, page by page (follow next_token while has_more)
+    GET /products/changes?since=<token>   rows created/updated after the token, plus deleted ids
+
+Tokens are opaque: a position in (updated_at, id) order plus the time deletes are reported from
+(when the sync, or the catch-up it continues, started). Only that second time decides whether the
+tombstones a token needs are still kept, so paging over rows untouched for months keeps working.
+`updated_at` is the writing transaction's
+start time, so a write can commit after a reader already passed its timestamp; the token handed
+out once a client is caught up therefore points CATALOG_SYNC_OVERLAP_SECONDS back, and the next
+call re-sends that window. Clients apply changes as upserts by id, so repeats are harmless.
+
+Deletes leave a row in `catalog_tombstones` (written from the mapper, so sqladmin deletes count
+too), kept CATALOG_TOMBSTONE_RETENTION_DAYS; older tokens get `410` and clients reload in full.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, insert, func, tuple_, event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.response import BaseHTTPException, ErrorCodes
+from app.db.models.catalog_tombstone import CatalogTombstone
+from app.db.models.category import Category
+from app.db.models.product import Product
+
+ENTITIES = {"product": Product, "category": Category}
+
+
+def encode_token(updated_at: datetime, last_id: int, deletes_from: datetime) -> str:
+    raw = f"{updated_at.isoformat()}|{last_id}|{deletes_from.isoformat()}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> tuple[datetime, int, datetime]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        stamp, last_id, deletes_from = raw.split("|")
+        return datetime.fromisoformat(stamp), int(last_id), datetime.fromisoformat(deletes_from)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise BaseHTTPException(422, ErrorCodes.VALIDATION_ERROR, "Invalid sync token.", {"fields": {"since": "Use a next_token from a previous response."}})
+
+
+def _record_tombstone(entity: str):
+    def after_delete(mapper, connection, target):
+        connection.execute(insert(CatalogTombstone).values(entity=entity, entity_id=target.id))
+    return after_delete
+
+
+for _entity, _model in ENTITIES.items():
+    event.listen(_model, "after_delete", _record_tombstone(_entity))
+
+
+def changes(db: Session, entity: str, since: str | None, limit: int) -> dict:
+    """Up to `limit` rows changed after `since` (ORM objects, in change order) and the deleted ids."""
+    model = ENTITIES[entity]
+    now = db.execute(select(func.localtimestamp())).scalar()
+    stmt = select(model).order_by(model.updated_at, model.id).limit(limit + 1)
+    deleted = []
+    # A full load reports deletes from its start: rows on pages already sent may go meanwhile
+    deletes_from = now
+    if since:
+        stamp, last_id, deletes_from = decode_token(since)
+        if deletes_from < now - timedelta(days=settings.CATALOG_TOMBSTONE_RETENTION_DAYS):
+            raise BaseHTTPException(410, ErrorCodes.SYNC_TOKEN_EXPIRED, "Sync token expired; reload the full catalog.")
+        stmt = stmt.where(tuple_(model.updated_at, model.id) > tuple_(stamp, last_id))
+        deleted = db.execute(
+            select(CatalogTombstone.entity_id).distinct()
+            .where(CatalogTombstone.entity == entity, CatalogTombstone.deleted_at >= deletes_from)
+        ).scalars().all()
+
+    rows = db.execute(stmt).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        next_token = encode_token(rows[-1].updated_at, rows[-1].id, deletes_from)
+    else:
+        caught_up = now - timedelta(seconds=settings.CATALOG_SYNC_OVERLAP_SECONDS)
+        next_token = encode_token(caught_up, 0, caught_up)
+    return {"changed": rows, "deleted": sorted(deleted), "next_token": next_token, "has_more": has_more}
+
+
+def prune_tombstones(db: Session, older_than_days: int) -> int:
+    deleted = db.execute(
+        delete(CatalogTombstone).where(CatalogTombstone.deleted_at < func.localtimestamp() - func.make_interval(0, 0, 0, older_than_days))
+    ).rowcount
+    db.commit()
+    return deleted
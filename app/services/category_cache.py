@@ -0,0 +1,49 @@
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.db.models.category import Category
+
+
+@dataclass(frozen=True, slots=True)
+class CachedCategory:
+    id: int
+    name_uz: str
+    name_ru: str
+    name_en: str
+
+
+class CategoryCache:
+    """
+    Per-process list of all categories (by id), reloaded with one query when older than
+    CATEGORY_CACHE_TTL. Category writes through the API invalidate it.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._categories: list[CachedCategory] = []
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_all(self, db: Session) -> list[CachedCategory]:
+        if time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                if time.monotonic() - self._loaded_at > self.ttl:
+                    metrics.CACHE_REQUESTS.inc(cache="categories", result="miss")
+                    rows = db.execute(
+                        select(Category.id, Category.name_uz, Category.name_ru, Category.name_en).order_by(Category.id)
+                    ).all()
+                    self._categories = [CachedCategory(*r) for r in rows]
+                    self._loaded_at = time.monotonic()
+                    return self._categories
+        metrics.CACHE_REQUESTS.inc(cache="categories", result="hit")
+        return self._categories
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+category_cache = CategoryCache(settings.CATEGORY_CACHE_TTL)
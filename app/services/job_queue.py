@@ -0,0 +1,189 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+from dataclasses import dataclass
+from typing import Callable
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db.models.job import Job, JobStatus
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "jobs"
+
+
+class Abort(Exception):
+    """Raised by a task to fail its job right away instead of retrying."""
+
+
+@dataclass
+class Task:
+    name: str
+    fn: Callable
+    queue: str
+    max_attempts: int
+
+
+TASKS: dict[str, Task] = {}
+
+
+def task(name: str, queue: str = "default", max_attempts: int = 5):
+    """Register `fn(db, **payload)` as a job handler under `name`."""
+    def decorator(fn):
+        TASKS[name] = Task(name, fn, queue, max_attempts)
+        return fn
+    return decorator
+
+
+def get_task(name: str) -> Task:
+    # Handlers live in app.services.tasks; importing it here keeps callers free of import cycles
+    import app.services.tasks  # noqa
+    return TASKS[name]
+
+
+def enqueue(db: Session, task_name: str, payload: dict | None = None, delay: float = 0, dedupe_key: str | None = None) -> int | None:
+    """
+    Add a job in the caller's transaction; it becomes visible to workers when the caller commits.
+    Returns the job id, or None when a job with the same `dedupe_key` is already waiting to run.
+    """
+    spec = get_task(task_name)
+    stmt = pg_insert(Job).values(
+        queue=spec.queue,
+        task=spec.name,
+        payload=payload or {},
+        max_attempts=spec.max_attempts,
+        dedupe_key=dedupe_key,
+        run_at=func.localtimestamp() + timedelta(seconds=delay),
+    )
+    if dedupe_key is not None:
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[Job.dedupe_key], index_where=Job.status == JobStatus.queued.value
+        )
+    job_id = db.execute(stmt.returning(Job.id)).scalar()
+    if job_id is not None:
+        # Wakes idle workers early; delivered on commit like the job itself
+        db.execute(select(func.pg_notify(CHANNEL, spec.queue)))
+    return job_id
+
+
+def claim(db: Session, queue: str, limit: int, worker_id: str, lease_seconds: int) -> Job | None:
+    """
+    Take the next due job of `queue` unless `limit` jobs of that queue are already running
+    (across all workers), and commit. Claims of one queue serialize on an advisory lock;
+    SKIP LOCKED keeps them from waiting on rows someone else holds.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext("jobs:" + queue))))
+    # Jobs of dead workers: retry them, or give up if that was their last attempt
+    db.execute(text("""
+        UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+               last_error = 'Lease expired (worker died?)', locked_by = NULL, locked_until = NULL,
+               finished_at = CASE WHEN attempts >= max_attempts THEN localtimestamp END
+        WHERE queue = :queue AND status = 'running' AND locked_until <= localtimestamp
+    """), {"queue": queue})
+    running = db.execute(
+        select(func.count()).select_from(Job).where(Job.queue == queue, Job.status == JobStatus.running.value)
+    ).scalar()
+    if running >= limit:
+        db.commit()
+        return None
+    job = db.execute(
+        select(Job)
+        .where(Job.queue == queue, Job.status == JobStatus.queued.value, Job.run_at <= func.localtimestamp())
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if job is not None:
+        job.status = JobStatus.running.value
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_until = func.localtimestamp() + timedelta(seconds=lease_seconds)
+        job.started_at = func.localtimestamp()
+    db.commit()
+    if job is not None:
+        db.refresh(job)
+    return job
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter: ~base, 2*base, 4*base, ... capped at JOB_BACKOFF_MAX."""
+    delay = min(settings.JOB_BACKOFF_MAX, settings.JOB_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _finish(db: Session, job: Job, worker_id: str, **values):
+    # Guarded by locked_by: if our lease expired and another worker took the job over, leave it alone
+    db.execute(
+        Job.__table__.update()
+        .where(Job.id == job.id, Job.locked_by == worker_id, Job.status == JobStatus.running.value)
+        .values(locked_by=None, locked_until=None, **values)
+    )
+    db.commit()
+
+
+def run_job(db: Session, job: Job, worker_id: str) -> bool:
+    """Run a claimed job with its own session and record the outcome. Returns True on success."""
+    from app.db.session import SessionLocal
+    try:
+        spec = get_task(job.task)
+        with SessionLocal() as task_db:
+            spec.fn(task_db, **job.payload)
+    except Exception as exc:
+        error = "".join(traceback.format_exception_only(exc)).strip()
+        superseded = job.dedupe_key is not None and db.execute(
+            select(Job.id).where(Job.dedupe_key == job.dedupe_key, Job.status == JobStatus.queued.value)
+        ).first() is not None
+        if superseded:
+            # A newer job with the same key is already waiting and will redo the work
+            _finish(db, job, worker_id, status=JobStatus.failed.value, last_error=f"{error} (superseded)", finished_at=func.localtimestamp())
+        elif isinstance(exc, Abort) or job.attempts >= job.max_attempts:
+            log.error("job %s (%s) failed for good: %s", job.id, job.task, error)
+            _finish(db, job, worker_id, status=JobStatus.failed.value, last_error=error, finished_at=func.localtimestamp())
+        else:
+            delay = backoff_seconds(job.attempts)
+            log.warning("job %s (%s) attempt %s failed, retrying in %.0fs: %s", job.id, job.task, job.attempts, delay, error)
+            _finish(
+                db, job, worker_id, status=JobStatus.queued.value, last_error=error,
+                run_at=func.localtimestamp() + timedelta(seconds=delay),
+            )
+        return False
+    _finish(db, job, worker_id, status=JobStatus.done.value, last_error=None, finished_at=func.localtimestamp())
+    return True
+
+
+def queue_stats(db: Session, window_minutes: int = 60) -> list[dict]:
+    """Depth per queue plus wait/run latency of jobs finished in the last `window_minutes`."""
+    rows = db.execute(text("""
+        SELECT queue,
+               count(*) FILTER (WHERE status = 'queued' AND run_at <= localtimestamp) AS ready,
+               count(*) FILTER (WHERE status = 'queued' AND run_at > localtimestamp) AS scheduled,
+               count(*) FILTER (WHERE status = 'running') AS running,
+               count(*) FILTER (WHERE status = 'failed') AS failed,
+               extract(epoch FROM localtimestamp - min(run_at) FILTER (WHERE status = 'queued' AND run_at <= localtimestamp)) AS oldest_ready_seconds,
+               count(*) FILTER (WHERE status = 'done' AND finished_at >= localtimestamp - make_interval(mins => :window)) AS done_recent,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM started_at - run_at))
+                   FILTER (WHERE status = 'done' AND finished_at >= localtimestamp - make_interval(mins => :window)) AS wait_p50_seconds,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM started_at - run_at))
+                   FILTER (WHERE status = 'done' AND finished_at >= localtimestamp - make_interval(mins => :window)) AS wait_p95_seconds,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY extract(epoch FROM finished_at - started_at))
+                   FILTER (WHERE status = 'done' AND finished_at >= localtimestamp - make_interval(mins => :window)) AS run_p95_seconds
+        FROM jobs
+        GROUP BY queue
+        ORDER BY queue
+    """), {"window": window_minutes}).mappings().all()
+    return [
+        {k: round(float(v), 3) if k.endswith("_seconds") and v is not None else v for k, v in r.items()}
+        for r in rows
+    ]
+
+
+def prune_jobs(db: Session, older_than_days: int) -> int:
+    """Delete finished (done/failed) jobs older than `older_than_days`."""
+    deleted = db.execute(text("""
+        DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < localtimestamp - make_interval(days => :days)
+    """), {"days": older_than_days}).rowcount
+    db.commit()
+    return deleted
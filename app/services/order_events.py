@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import psycopg
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, bindparam, Text
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.db.models.order import OrderEvent
+from app.db.session import SessionLocal, engine
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "order_events"
+REPLAY_LIMIT = 1000
+
+
+def event_to_dict(e) -> dict:
+    return {
+        "id": e.id,
+        "type": e.type,
+        "order_id": e.order_id,
+        "user_id": e.user_id,
+        "status": e.status,
+        "previous_status": e.previous_status,
+        "created_at": str(e.created_at),
+    }
+
+
+def emit(db: Session, events: list[dict]) -> None:
+    """
+    Record events in the caller's transaction and NOTIFY listeners about them.
+    Postgres delivers the notifications only if (and when) the transaction commits.
+    """
+    if not events:
+        return
+    rows = db.execute(insert(OrderEvent).returning(*OrderEvent.__table__.c), events).all()
+    payloads = [json.dumps(event_to_dict(r)) for r in rows]
+    db.execute(select(func.pg_notify(CHANNEL, func.unnest(bindparam("payloads", payloads, type_=ARRAY(Text))))))
+
+
+def order_created(order_id: int, user_id: int, status: str) -> dict:
+    return {"type": "order.created", "order_id": order_id, "user_id": user_id, "status": status, "previous_status": None}
+
+
+def status_changed(order_id: int, user_id: int | None, status: str, previous_status: str) -> dict:
+    return {"type": "order.status_changed", "order_id": order_id, "user_id": user_id, "status": status, "previous_status": previous_status}
+
+
+def replay(after_id: int, limit: int = REPLAY_LIMIT) -> list[dict]:
+    """Events after `after_id`, oldest first. Uses its own session: streams outlive the request's `db`."""
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(OrderEvent).where(OrderEvent.id > after_id).order_by(OrderEvent.id).limit(limit)
+        ).scalars().all()
+        return [event_to_dict(e) for e in rows]
+
+
+def prune_events(db: Session, older_than_days: int) -> int:
+    """Drop events older than `older_than_days`; clients further behind than that start from scratch."""
+    deleted = db.execute(
+        delete(OrderEvent).where(OrderEvent.created_at < func.localtimestamp() - func.make_interval(0, 0, 0, older_than_days))
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+class OrderEventHub:
+    """
+    One LISTEN connection per worker process, fanned out to every subscribed stream.
+    A subscriber that falls too far behind (or any subscriber while the listener
+    reconnects) gets `None` and should end its stream; clients resume with Last-Event-ID.
+    """
+
+    def __init__(self, queue_size: int = 256, reconnect_delay: float = 1.0, connect_timeout: float = 5.0):
+        self.queue_size = queue_size
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.subscribers: set[asyncio.Queue] = set()
+        self._task: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+
+    def _dsn(self) -> str:
+        return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._ready = asyncio.Event()
+            self._task = loop.create_task(self._listen())
+        # Raises TimeoutError while the database is unreachable; the listener keeps retrying
+        await asyncio.wait_for(self._ready.wait(), self.connect_timeout)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self._drop_all()
+
+    async def subscribe(self) -> asyncio.Queue:
+        await self.start()
+        q = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        self.subscribers.discard(q)
+
+    def publish(self, event: dict):
+        for q in list(self.subscribers):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(q)
+
+    def _drop(self, q: asyncio.Queue):
+        self.subscribers.discard(q)
+        while not q.empty():
+            q.get_nowait()
+        q.put_nowait(None)
+
+    def _drop_all(self):
+        for q in list(self.subscribers):
+            self._drop(q)
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self._dsn(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    self._ready.set()
+                    async for n in conn.notifies():
+                        self.publish(json.loads(n.payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("order event listener lost its connection, reconnecting")
+                # Anything sent while disconnected is lost; make streams resume from the table
+                self._ready.clear()
+                self._drop_all()
+                await asyncio.sleep(self.reconnect_delay)
+
+
+hub = OrderEventHub()
@@ -0,0 +1,190 @@
+import logging
+import uuid
+from decimal import Decimal
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, func
+from app.db.models.order import Order, OrderItem, OrderIntake, OrderStatus
+from app.db.models.product import Product
+from app.db.models.user import User
+from app.core.response import BaseHTTPException, ErrorCodes
+from app.services import analytics_service, order_events, job_queue
+from app.services.order_service import snapshot_product, check_item
+from app.services.product_cache import product_cache
+
+log = logging.getLogger(__name__)
+
+
+def submit(db: Session, user_id: int, shipping_address: str, phone_number: str, comment: str | None, items: list[dict], lang: str, base_url: str) -> dict:
+    """
+    Validate and price the order against the cached product map, append it to the intake
+    queue and commit: a single-row insert, no product reads or order locks on the hot path.
+    """
+    if not items:
+        raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Items cannot be empty.")
+    products = product_cache.get_all(db)
+    priced = []
+    total = Decimal("0.00")
+    for it in items:
+        p = products.get(it["product_id"])
+        check_item(p, it)
+        snap = snapshot_product(p, lang)
+        subtotal = Decimal(str(snap["price"])) * Decimal(it["quantity"])
+        priced.append({"product_id": p.id, "quantity": it["quantity"], "product_snapshot": snap, "subtotal": str(subtotal)})
+        total += subtotal
+
+    token = uuid.uuid4().hex
+    intake = OrderIntake(
+        token=token,
+        user_id=user_id,
+        payload={
+            "shipping_address": shipping_address,
+            "phone_number": phone_number,
+            "comment": comment,
+            "items": priced,
+            "base_url": base_url,
+        },
+    )
+    db.add(intake)
+    job_queue.enqueue(db, "orders.drain_intake", dedupe_key="orders.drain_intake")
+    db.commit()
+    return {"token": token, "status": "pending", "order_id": None, "total_amount": float(total), "error": None}
+
+
+def intake_to_dict(intake) -> dict:
+    return {
+        "token": intake.token,
+        "status": intake.status,
+        "order_id": intake.order_id,
+        "total_amount": float(sum(Decimal(i["subtotal"]) for i in intake.payload["items"])),
+        "error": intake.error,
+    }
+
+
+def get_intake(db: Session, token: str):
+    """Fresh row (not the session's cached instance), so repeated polls see the writer's updates."""
+    return db.execute(select(*OrderIntake.__table__.c).where(OrderIntake.token == token)).first()
+
+
+def _fail(intake: OrderIntake, error: str):
+    intake.status = "failed"
+    intake.error = error
+    intake.processed_at = func.localtimestamp()
+
+
+def process_batch(db: Session, batch_size: int, only_id: int | None = None) -> int:
+    """
+    Turn up to `batch_size` pending intakes into orders in one transaction: one multi-row
+    INSERT each for orders and order_items, one stock UPDATE per product, one analytics
+    update and one event NOTIFY.
+    Returns the number of intakes handled (created or failed).
+    """
+    q = select(OrderIntake).where(OrderIntake.status == "pending")
+    if only_id is not None:
+        q = q.where(OrderIntake.id == only_id)
+    batch = db.execute(q.order_by(OrderIntake.id).limit(batch_size).with_for_update(skip_locked=True)).scalars().all()
+    if not batch:
+        return 0
+
+    # Lock the batch's products once, in id order, and hand out their stock in intake order
+    product_ids = {i["product_id"] for b in batch for i in b.payload["items"]}
+    stock = dict(db.execute(
+        select(Product.id, Product.stock).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+    ).all())
+    existing_users = set(db.execute(select(User.id).where(User.id.in_({b.user_id for b in batch}))).scalars())
+    taken: dict[int, int] = {}
+    accepted = []
+    for b in batch:
+        items = b.payload["items"]
+        missing = [i["product_id"] for i in items if i["product_id"] not in stock]
+        demand: dict[int, int] = {}
+        for i in items:
+            if stock.get(i["product_id"]) is not None:
+                demand[i["product_id"]] = demand.get(i["product_id"], 0) + i["quantity"]
+        short = [pid for pid, qty in demand.items() if stock[pid] - taken.get(pid, 0) < qty]
+        if b.user_id not in existing_users:
+            _fail(b, "User not found.")
+        elif missing:
+            _fail(b, f"Product {missing[0]} not found.")
+        elif short:
+            _fail(b, f"Product {short[0]} is out of stock.")
+        else:
+            for pid, qty in demand.items():
+                taken[pid] = taken.get(pid, 0) + qty
+            accepted.append(b)
+
+    if accepted:
+        # The customer's checkout time, not the time the writer got to it
+        created = db.execute(
+            insert(Order).returning(Order.id, Order.created_at, sort_by_parameter_order=True),
+            [{
+                "user_id": b.user_id,
+                "shipping_address": b.payload["shipping_address"],
+                "phone_number": b.payload["phone_number"],
+                "comment": b.payload["comment"],
+                "created_at": b.created_at,
+            } for b in accepted],
+        ).all()
+        db.execute(insert(OrderItem), [
+            {
+                "order_id": order.id,
+                "order_created_at": order.created_at,
+                "product_id": i["product_id"],
+                "product_snapshot": i["product_snapshot"],
+                "quantity": i["quantity"],
+                "subtotal": Decimal(i["subtotal"]),
+                "reserved_quantity": i["quantity"] if stock[i["product_id"]] is not None else 0,
+            }
+            for b, order in zip(accepted, created) for i in b.payload["items"]
+        ])
+        for pid in sorted(taken):
+            db.execute(
+                update(Product).where(Product.id == pid).values(stock=Product.stock - taken[pid]),
+                execution_options={"synchronize_session": False},
+            )
+        order_ids = [order.id for order in created]
+        analytics_service.record_orders(db, order_ids, OrderStatus.checking)
+        order_events.emit(db, [
+            order_events.order_created(order.id, b.user_id, OrderStatus.checking.value) for b, order in zip(accepted, created)
+        ])
+        for b, order in zip(accepted, created):
+            job_queue.enqueue(
+                db, "receipts.render", {"order_id": order.id, "base_url": b.payload["base_url"]},
+                dedupe_key=f"receipts.render:{order.id}",
+            )
+            b.status = "created"
+            b.order_id = order.id
+            b.processed_at = func.localtimestamp()
+    db.commit()
+    return len(batch)
+
+
+def drain(db: Session, batch_size: int) -> int:
+    """Process pending intakes until none are left. A batch that fails is retried row by row."""
+    total = 0
+    while True:
+        try:
+            handled = process_batch(db, batch_size)
+        except Exception:
+            log.exception("intake batch failed, retrying its rows one by one")
+            db.rollback()
+            handled = _drain_one_by_one(db, batch_size)
+        if not handled:
+            return total
+        total += handled
+
+
+def _drain_one_by_one(db: Session, batch_size: int) -> int:
+    ids = db.execute(
+        select(OrderIntake.id).where(OrderIntake.status == "pending").order_by(OrderIntake.id).limit(batch_size)
+    ).scalars().all()
+    db.rollback()
+    for intake_id in ids:
+        try:
+            process_batch(db, 1, only_id=intake_id)
+        except Exception as exc:
+            db.rollback()
+            log.error("intake %s failed: %s", intake_id, exc)
+            intake = db.get(OrderIntake, intake_id)
+            _fail(intake, "Could not create the order.")
+            db.commit()
+    return len(ids)
@@ -1,14 +1,70 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, func, update
 from app.db.models.product import Product
-from app.db.models.order import Order, OrderItem, OrderStatus
+from app.db.models.order import Order, OrderItem, OrderArchive, OrderItemArchive, OrderStatus
 from app.core.response import BaseHTTPException, ErrorCodes
+from app.services import analytics_service, order_events
+from app.core.config import settings
 from decimal import Decimal
+from datetime import timedelta
 
 def snapshot_product(p: Product, lang: str) -> dict:
     name = p.name_en if lang == "en" else (p.name_ru if lang == "ru" else p.name_uz)
     return {"id": p.id, "name": name, "price": float(p.price), "image_url": p.image_url, "category_id": p.category_id}
 
+def check_item(p: Product | None, item: dict) -> None:
+    if not p:
+        raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, f"Product {item['product_id']} not found.")
+    if item["quantity"] < 1:
+        raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Quantity must be >= 1.")
+    if item.get("price") is not None and Decimal(str(item["price"])) != Decimal(str(p.price)):
+        raise BaseHTTPException(409, ErrorCodes.PRICE_CHANGED, f"Price of product {p.id} has changed.", {"product_id": p.id, "price": float(p.price)})
+
+def out_of_stock(product_id: int) -> BaseHTTPException:
+    return BaseHTTPException(409, ErrorCodes.OUT_OF_STOCK, f"Product {product_id} is out of stock.", {"product_id": product_id})
+
+def reserve_stock(db: Session, demand: dict[int, int]) -> None:
+    """
+    Take `demand` (product id -> units, tracked products only) off products.stock with one
+    conditional UPDATE ... WHERE stock >= qty per product. Products are updated in id order,
+    so carts sharing products lock them in the same order and cannot deadlock. The row locks
+    last until commit: call this as the final step before committing.
+
+    Lock order: every path that writes both takes the products rows before the sales_daily
+    rows (create_order reserves, then records; cancel/expire/delete release, then move or
+    forget), so a cancellation racing a checkout of the same product waits instead of deadlocking.
+    """
+    for product_id in sorted(demand):
+        left = db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock >= demand[product_id])
+            .values(stock=Product.stock - demand[product_id])
+            .returning(Product.stock),
+            execution_options={"synchronize_session": False},
+        ).scalar()
+        if left is None:
+            raise out_of_stock(product_id)
+
+def release_stock(db: Session, order_ids: list[int]) -> None:
+    """Give the units reserved by these orders back to products.stock (in product id order) and zero the reservations."""
+    reserved = db.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.reserved_quantity))
+        .where(OrderItem.order_id.in_(order_ids), OrderItem.reserved_quantity > 0)
+        .group_by(OrderItem.product_id)
+        .order_by(OrderItem.product_id)
+    ).all()
+    if not reserved:
+        return
+    for product_id, quantity in reserved:
+        db.execute(
+            update(Product).where(Product.id == product_id).values(stock=Product.stock + quantity),
+            execution_options={"synchronize_session": False},
+        )
+    db.execute(
+        update(OrderItem).where(OrderItem.order_id.in_(order_ids), OrderItem.reserved_quantity > 0).values(reserved_quantity=0),
+        execution_options={"synchronize_session": False},
+    )
+
 def create_order(db: Session, user_id: int, shipping_address: str, phone_number: str, comment: str | None, items: list[dict], lang: str):
     if not items:
         raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Items cannot be empty.")
@@ -18,43 +74,158 @@ def create_order(db: Session, user_id: int, shipping_address: str, phone_number:
     db.add(order); db.flush()
 
     total = Decimal("0.00")
+    demand: dict[int, int] = {}
     for it in items:
         p = products.get(it["product_id"])
-        if not p:
-            raise BaseHTTPException(404, ErrorCodes.NOT_FOUND, f"Product {it['product_id']} not found.")
-        if it["quantity"] < 1:
-            raise BaseHTTPException(422, ErrorCodes.INVALID_ORDER, "Quantity must be >= 1.")
+        check_item(p, it)
         snap = snapshot_product(p, lang)
         subtotal = Decimal(str(snap["price"])) * Decimal(it["quantity"])
-        db.add(OrderItem(order_id=order.id, product_snapshot=snap, quantity=it["quantity"], subtotal=subtotal))
+        reserved = it["quantity"] if p.stock is not None else 0
+        if reserved:
+            demand[p.id] = demand.get(p.id, 0) + reserved
+            # Sold out as of our read: refuse without queueing up on the row lock
+            if demand[p.id] > p.stock:
+                raise out_of_stock(p.id)
+        db.add(OrderItem(order_id=order.id, order_created_at=order.created_at, product_id=p.id, product_snapshot=snap, quantity=it["quantity"], subtotal=subtotal, reserved_quantity=reserved))
         total += subtotal
 
+    db.flush()
+    order_events.emit(db, [order_events.order_created(order.id, order.user_id, order.status.value)])
+    # Hot rows last (a popular product's stock and its sales_daily row), so their locks are held only until the commit
+    reserve_stock(db, demand)
+    analytics_service.record_orders(db, [order.id], order.status)
     db.commit()
     return {"order_id": order.id, "status": order.status.value, "total_amount": float(total), "created_at": str(order.created_at)}
 
+# target status -> (statuses it may be reached from, error message otherwise)
+TRANSITIONS = {
+    OrderStatus.verified: ({OrderStatus.checking, OrderStatus.verified}, "Cannot verify cancelled/done order."),
+    OrderStatus.cancelled: ({OrderStatus.checking, OrderStatus.verified}, "Cannot cancel completed/already cancelled order."),
+    OrderStatus.done: ({OrderStatus.verified}, "Only verified orders can be completed."),
+}
+
+def transition_orders(db: Session, order_ids: list[int], target: OrderStatus, owner_id: int | None = None, cancel_reason: str | None = None) -> list[dict]:
+    """
+    Move orders to `target` with a single conditional UPDATE ... RETURNING and commit.
+    The FOR UPDATE sub-select returns each row's previous status, so concurrent
+    transitions of the same order serialize instead of racing.
+    `owner_id` restricts the update to that user's orders.
+    Returns one result per distinct id, in request order.
+    """
+    allowed, invalid_message = TRANSITIONS[target]
+    ids = list(dict.fromkeys(order_ids))
+
+    prev = aliased(Order)
+    old = select(prev.id, prev.status).where(prev.id.in_(ids)).with_for_update().subquery("prev")
+    conds = [Order.id == old.c.id, Order.status.in_(allowed)]
+    if owner_id is not None:
+        conds.append(Order.user_id == owner_id)
+    values = {"status": target}
+    if cancel_reason is not None:
+        values["cancel_reason"] = cancel_reason
+    stmt = update(Order).where(*conds).values(**values).returning(Order.id, old.c.status, Order.user_id, Order.cancel_reason)
+    updated = {r.id: r for r in db.execute(stmt, execution_options={"synchronize_session": False})}
+
+    moved: dict[OrderStatus, list[int]] = {}
+    for r in updated.values():
+        moved.setdefault(r.status, []).append(r.id)
+    # Stock before the rollup: same lock order as create_order (see reserve_stock)
+    if target == OrderStatus.cancelled and updated:
+        release_stock(db, list(updated))
+    for old_status, moved_ids in moved.items():
+        analytics_service.move_orders(db, moved_ids, old_status, target)
+    order_events.emit(db, [
+        order_events.status_changed(i, updated[i].user_id, target.value, updated[i].status.value) for i in ids if i in updated
+    ])
+
+    failures = {}
+    missing = [i for i in ids if i not in updated]
+    if missing:
+        found = {r.id: r for r in db.execute(select(Order.id, Order.user_id).where(Order.id.in_(missing)))}
+        for i in missing:
+            if i not in found:
+                failures[i] = {"code": ErrorCodes.NOT_FOUND, "message": "Order not found."}
+            elif owner_id is not None and found[i].user_id != owner_id:
+                failures[i] = {"code": ErrorCodes.FORBIDDEN, "message": "Not your order."}
+            else:
+                failures[i] = {"code": ErrorCodes.INVALID_ORDER, "message": invalid_message}
+
+    db.commit()
+    results = []
+    for i in ids:
+        if i in updated:
+            results.append({"order_id": i, "success": True, "status": target.value, "cancel_reason": updated[i].cancel_reason, "error": None})
+        else:
+            results.append({"order_id": i, "success": False, "status": None, "cancel_reason": None, "error": failures[i]})
+    return results
+
+def expire_reservations(db: Session, older_than_minutes: int | None = None, batch_size: int = 500) -> int:
+    """
+    Cancel `checking` orders still holding stock after `older_than_minutes` (default
+    STOCK_RESERVATION_MINUTES), releasing their stock. Returns the number cancelled.
+    """
+    minutes = settings.STOCK_RESERVATION_MINUTES if older_than_minutes is None else older_than_minutes
+    holding = select(OrderItem.id).where(
+        OrderItem.order_id == Order.id, OrderItem.order_created_at == Order.created_at, OrderItem.reserved_quantity > 0
+    ).exists()
+    expired = 0
+    while True:
+        ids = db.execute(
+            select(Order.id)
+            .where(Order.status == OrderStatus.checking, Order.created_at < func.localtimestamp() - timedelta(minutes=minutes), holding)
+            .order_by(Order.created_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return expired
+        results = transition_orders(db, ids, OrderStatus.cancelled, cancel_reason="Stock reservation expired.")
+        expired += sum(r["success"] for r in results)
+        if len(ids) < batch_size:
+            return expired
+
 from sqlalchemy.orm import joinedload
 from sqlalchemy import select
 
-def order_to_dict(db: Session, order: Order, lang: str):
-    # ensure user relationship is loaded (just in case)
-    if not getattr(order, "user", None):
-        order = (
-            db.query(Order)
-            .options(joinedload(Order.user))
-            .filter(Order.id == order.id)
-            .first()
-        )
+def get_order(db: Session, id: int) -> Order | OrderArchive | None:
+    """Look the order up in the hot table first, then in the archive (with its user loaded)."""
+    return (
+        db.get(Order, id, options=[joinedload(Order.user)])
+        or db.get(OrderArchive, id, options=[joinedload(OrderArchive.user)])
+    )
 
-    items = db.execute(
-        select(OrderItem).where(OrderItem.order_id == order.id)
+def get_order_items(db: Session, order: Order | OrderArchive) -> list:
+    model = OrderItemArchive if isinstance(order, OrderArchive) else OrderItem
+    return db.execute(
+        select(model).where(model.order_id == order.id, model.order_created_at == order.created_at)
     ).scalars().all()
 
+def get_items_by_order(db: Session, orders: list[Order | OrderArchive]) -> dict[tuple[type, int], list]:
+    """Items for a page of orders: one query per table instead of one per order."""
+    out = {(type(o), o.id): [] for o in orders}
+    for order_model, item_model in ((Order, OrderItem), (OrderArchive, OrderItemArchive)):
+        page = [o for o in orders if isinstance(o, order_model)]
+        if not page:
+            continue
+        rows = db.execute(
+            select(item_model)
+            .where(item_model.order_id.in_([o.id for o in page]), item_model.order_created_at.in_({o.created_at for o in page}))
+            .order_by(item_model.id)
+        ).scalars()
+        for i in rows:
+            out[(order_model, i.order_id)].append(i)
+    return out
+
+def order_to_dict(db: Session, order: Order | OrderArchive, lang: str, items: list | None = None):
+    """`order.user` must already be loaded; pass `items` from get_items_by_order when serializing a page."""
+    if items is None:
+        items = get_order_items(db, order)
+
     total = sum(float(i.subtotal) for i in items)
 
     out_items = []
     for i in items:
         out_items.append({
-            "product_id": i.product_snapshot.get("id"),
+            "product_id": i.product_id or i.product_snapshot.get("id"),
             "product_name": i.product_snapshot.get("name"),
             "product_price": i.product_snapshot.get("price"),
             "quantity": i.quantity,
@@ -0,0 +1,67 @@
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.db.models.product import Product
+
+
+@dataclass(frozen=True, slots=True)
+class CachedProduct:
+    """Product row without ORM state; duck-types as Product for `snapshot_product` and `product_out`."""
+    id: int
+    name_uz: str
+    name_ru: str
+    name_en: str
+    price: float
+    image_url: str | None
+    category_id: int
+    description_uz: str | None
+    description_ru: str | None
+    description_en: str | None
+    # Reservations do not invalidate the cache, so this may lag by up to the TTL
+    stock: int | None
+
+
+class ProductCache:
+    """
+    Per-process id -> product map, reloaded with one query when older than PRODUCT_CACHE_TTL.
+    Product writes through the API invalidate it; other workers (and sqladmin edits) catch up within the TTL.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._products: dict[int, CachedProduct] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_all(self, db: Session) -> dict[int, CachedProduct]:
+        if time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                if time.monotonic() - self._loaded_at > self.ttl:
+                    metrics.CACHE_REQUESTS.inc(cache="products", result="miss")
+                    rows = db.execute(select(
+                        Product.id, Product.name_uz, Product.name_ru, Product.name_en,
+                        Product.price, Product.image_url, Product.category_id,
+                        Product.description_uz, Product.description_ru, Product.description_en, Product.stock,
+                    )).all()
+                    self._products = {r.id: CachedProduct(*r) for r in rows}
+                    self._loaded_at = time.monotonic()
+                    return self._products
+        metrics.CACHE_REQUESTS.inc(cache="products", result="hit")
+        return self._products
+
+    def peek(self) -> dict[int, CachedProduct] | None:
+        """The map if it is fresh, else None (without reloading it)."""
+        if time.monotonic() - self._loaded_at > self.ttl:
+            return None
+        metrics.CACHE_REQUESTS.inc(cache="products", result="hit")
+        return self._products
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+product_cache = ProductCache(settings.PRODUCT_CACHE_TTL)
@@ -0,0 +1,118 @@
+"""
+Facet counts for GET /products?facets=category,price.
+
+One statement returns the page total and every requested facet: the rows matching the search
+term are grouped by GROUPING SETS ((category_id), (price bucket), ()), and each grouping counts
+only the rows that pass the *other* filters (`count(*) FILTER (WHERE ...)`), so the category
+counts ignore the selected category and the price buckets ignore the price range, the way a
+filter sidebar shows them. Both facets are always computed (the grouping sets share one scan);
+results are cached per worker by filter values, whichever facets were asked for.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import Numeric, and_, cast, func, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.core.response import BaseHTTPException, ErrorCodes
+from app.db.models.product import Product
+
+FACETS = ("category", "price")
+
+# grouping(category_id, bucket): a bit is set for each column the grouping set leaves out
+BY_CATEGORY, BY_PRICE, TOTAL = 0b01, 0b10, 0b11
+
+
+def parse(value: str | None) -> tuple[str, ...]:
+    if not value:
+        return ()
+    names = tuple(dict.fromkeys(f.strip() for f in value.split(",") if f.strip()))
+    unknown = [n for n in names if n not in FACETS]
+    if unknown or not names:
+        raise BaseHTTPException(
+            422, ErrorCodes.VALIDATION_ERROR, "Unknown facets requested.",
+            {"fields": {n: f"Not one of: {', '.join(FACETS)}" for n in unknown or ["facets"]}},
+        )
+    return tuple(n for n in FACETS if n in names)
+
+
+def _count(conds: list):
+    return func.count().filter(and_(*conds)) if conds else func.count()
+
+
+def compute(db: Session, search: list, category: list, price: list) -> tuple[int, dict]:
+    """(total matching every filter, {facet: counts} for every facet) in one query."""
+    bounds = settings.PRICE_FACET_BOUNDS
+    bucket = func.width_bucket(Product.price, cast(array(bounds), ARRAY(Numeric))).label("bucket")
+    stmt = (
+        select(
+            Product.category_id,
+            bucket,
+            func.grouping(Product.category_id, bucket).label("grouping"),
+            _count(price).label("by_category"),
+            _count(category).label("by_price"),
+            _count(category + price).label("total"),
+        )
+        .where(*search)
+        .group_by(func.grouping_sets(tuple_(Product.category_id), tuple_(bucket), tuple_()))
+    )
+    total = 0
+    categories, buckets = [], {}
+    for row in db.execute(stmt):
+        if row.grouping == TOTAL:
+            total = row.total
+        elif row.grouping == BY_CATEGORY and row.by_category:
+            categories.append({"category_id": row.category_id, "count": row.by_category})
+        elif row.grouping == BY_PRICE and row.by_price:
+            buckets[row.bucket] = row.by_price
+
+    # width_bucket: i for bounds[i-1] <= price < bounds[i], len(bounds) past the last one
+    edges = [*bounds, None]
+    return total, {
+        "category": sorted(categories, key=lambda c: (-c["count"], c["category_id"] or 0)),
+        "price": [{"min": edges[i - 1], "max": edges[i], "count": buckets.get(i, 0)} for i in range(1, len(edges))],
+    }
+
+
+def pick(data: dict, facets: tuple[str, ...]) -> dict:
+    return {name: data[name] for name in facets}
+
+
+class FacetCache:
+    """
+    Per-process LRU of facet results by filter values. The unfiltered catalog and the common
+    category/price/search combinations stay warm; entries expire after FACET_CACHE_TTL and
+    product writes through the API clear it.
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self._entries: OrderedDict[tuple, tuple[float, int, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[int, dict] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                metrics.CACHE_REQUESTS.inc(cache="facets", result="miss")
+                return None
+            self._entries.move_to_end(key)
+        metrics.CACHE_REQUESTS.inc(cache="facets", result="hit")
+        return entry[1], entry[2]
+
+    def put(self, key: tuple, total: int, data: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), total, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+facet_cache = FacetCache(settings.FACET_CACHE_TTL, settings.FACET_CACHE_SIZE)
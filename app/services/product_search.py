@@ -0,0 +1,117 @@
+"""
+Script-independent product search. Every product carries a `search_key`: its names and
+descriptions case-folded, transliterated to one Latin spelling and stripped of punctuation, so
+"Qoʻgʻirchoq", "Қўғирчоқ" and "qo'g'irchoq" all become "kogirchok". Queries are normalized the
+same way and every query word must prefix-match a word of the key:
+
+    GET /products?q=КУКЛ        matches "Кукла"
+    GET /products?q=ўйинчоқ     matches "Oʻyinchoq"
+
+The key is matched through a `to_tsvector('simple', search_key)` GIN index (prefix `:*`
+queries) instead of ILIKE scans over six columns. Keys are set from the mapper on every ORM
+insert/update (API and sqladmin alike); rows that existed before were filled in by the migration,
+and `python -m app.cli backfill-search-keys` fills in any written around the ORM.
+"""
+import re
+import unicodedata
+from sqlalchemy import bindparam, event, func, inspect, literal_column, select, update
+from sqlalchemy.orm import Session
+from app.db.models.product import Product
+
+APOSTROPHES = "ʻʼ’‘'`´"
+
+# Apostrophes (oʻ, gʻ, tutuq belgisi) go; Uzbek and Russian Cyrillic become Latin. Letters Uzbek has
+# its own sign for (ғ қ ў ҳ) fold onto the nearest Russian one, since Russian keyboards lack them
+SCRIPTS = str.maketrans({
+    **dict.fromkeys(APOSTROPHES, None),
+    "а": "a", "б": "b", "в": "v", "г": "g", "ғ": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "қ": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ў": "o", "ф": "f", "х": "h", "ҳ": "h",
+    "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+})
+# Uzbek Latin q/x and Russian-style romanizations spelled like the Cyrillic above
+LATIN = (("zh", "j"), ("kh", "h"), ("q", "k"), ("x", "h"), ("w", "v"))
+NON_WORD = re.compile(r"[^a-z0-9]+")
+
+SIMPLE = literal_column("'simple'::regconfig")
+# Same expression as the ix_products_search_key index
+SEARCH_VECTOR = func.to_tsvector(SIMPLE, Product.search_key)
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def normalize(text: str | None) -> str:
+    if not text:
+        return ""
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFC", text).translate(SCRIPTS)
+        # Remaining diacritics (é, ü, ...) go with their combining marks
+        if not text.isascii():
+            text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    elif "'" in text or "`" in text:
+        text = text.translate(SCRIPTS)
+    for src, dst in LATIN:
+        text = text.replace(src, dst)
+    return " ".join(NON_WORD.split(text)).strip()
+
+
+def search_key(*texts: str | None) -> str:
+    """Normalized words of all `texts`, each kept once."""
+    words = dict.fromkeys(w for t in texts for w in normalize(t).split())
+    return " ".join(words)
+
+
+KEY_FIELDS = ("name_uz", "name_ru", "name_en", "description_uz", "description_ru", "description_en")
+
+
+def product_key(p) -> str:
+    return search_key(*(getattr(p, f) for f in KEY_FIELDS))
+
+
+def _set_key(mapper, connection, target):
+    target.search_key = product_key(target)
+
+
+def _update_key(mapper, connection, target):
+    state = inspect(target)
+    if target.search_key is None or any(state.attrs[f].history.has_changes() for f in KEY_FIELDS):
+        target.search_key = product_key(target)
+
+
+event.listen(Product, "before_insert", _set_key)
+event.listen(Product, "before_update", _update_key)
+
+
+def matches(q: str | None):
+    """WHERE clause for a search query, or None when it has no searchable words."""
+    words = normalize(q).split()
+    if not words:
+        return None
+    # Words are [a-z0-9]+ only, so they can go into the tsquery as-is
+    return SEARCH_VECTOR.op("@@")(func.to_tsquery(SIMPLE, " & ".join(f"{w}:*" for w in words)))
+
+
+def backfill(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Fill in missing search keys in batches; returns the number of products updated."""
+    table = Product.__table__
+    # updated_at is kept as is: the key is not part of what delta sync sends
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("product_id"))
+        .values(search_key=bindparam("key"), updated_at=table.c.updated_at)
+    )
+    done = 0
+    while True:
+        rows = db.execute(
+            select(Product.id, *(getattr(Product, f) for f in KEY_FIELDS))
+            .where(Product.search_key.is_(None))
+            .order_by(Product.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return done
+        db.execute(stmt, [{"product_id": r.id, "key": search_key(*r[1:])} for r in rows])
+        db.commit()
+        done += len(rows)
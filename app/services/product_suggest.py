@@ -0,0 +1,237 @@
+"""
+Search-as-you-type for GET /products/suggest?q=, answered from memory without touching Postgres.
+
+Each language (name_uz, name_ru, name_en) has a prefix tree over its normalized product names
+(app.services.product_search.normalize, so any script matches), keyed from every word onwards:
+"Yumshoq ayiq" is found by "yum", "yumshok a" and "ayi". Every node keeps the ids of its best
+SUGGEST_MAX_LIMIT products by units sold over the last SUGGEST_POPULARITY_DAYS, so a lookup is
+a walk of len(q) nodes plus a merge of three short lists, whatever the catalog size.
+
+The index is loaded by a daemon thread on startup and reloaded every SUGGEST_REBUILD_INTERVAL
+(picking up other workers' writes and new sales); product writes through this worker patch it
+right away. `make bench-suggest` checks the lookup latency.
+"""
+import heapq
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.models.analytics import SalesDaily
+from app.db.models.order import OrderStatus
+from app.db.models.product import Product
+from app.services.product_search import normalize
+
+log = logging.getLogger(__name__)
+
+LANGS = ("uz", "ru", "en")
+
+
+@dataclass(frozen=True, slots=True)
+class Suggestion:
+    id: int
+    name_uz: str
+    name_ru: str
+    name_en: str
+    price: float
+    image_url: str | None
+
+
+class _Node:
+    __slots__ = ("children", "ids", "top")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        # Products with a key ending exactly here (most nodes have none; the set is made on demand)
+        self.ids: set[int] | None = None
+        # (-units sold, id) of the best products anywhere below, best first. Plain tuples, so
+        # ranking and merging compare in C without a key function
+        self.top: tuple[tuple[int, int], ...] = ()
+
+
+class PrefixTree:
+    """Prefix tree for one language. Not thread-safe for writes; SuggestIndex serializes them."""
+
+    def __init__(self, size: int, max_depth: int, popularity: dict[int, int]):
+        self.size = size
+        self.max_depth = max_depth
+        self.popularity = popularity
+        self.root = _Node()
+        # Full (untruncated) keys per product, to remove them again and to check long queries
+        self.keys: dict[int, tuple[str, ...]] = {}
+
+    @staticmethod
+    def keys_for(name: str | None) -> tuple[str, ...]:
+        words = normalize(name).split()
+        return tuple(dict.fromkeys(" ".join(words[i:]) for i in range(len(words))))
+
+    def rank(self, product_id: int) -> tuple[int, int]:
+        return -self.popularity.get(product_id, 0), product_id
+
+    def _best(self, node: _Node) -> tuple[tuple[int, int], ...]:
+        candidates = {self.rank(i) for i in node.ids or ()}
+        for child in node.children.values():
+            candidates.update(child.top)
+        return tuple(heapq.nsmallest(self.size, candidates))
+
+    def _stored(self, keys: tuple[str, ...]):
+        """Keys as stored in the tree: cut to max_depth (which can make two of them equal)."""
+        return dict.fromkeys(key[:self.max_depth] for key in keys)
+
+    def _insert_key(self, product_id: int, key: str) -> list[_Node]:
+        path = [self.root]
+        node = self.root
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            node = child
+            path.append(node)
+        if node.ids is None:
+            node.ids = set()
+        node.ids.add(product_id)
+        return path
+
+    def add(self, product_id: int, name: str | None):
+        keys = self.keys_for(name)
+        self.keys[product_id] = keys
+        entry = self.rank(product_id)
+        for key in self._stored(keys):
+            for node in self._insert_key(product_id, key)[1:]:
+                if entry not in node.top:
+                    node.top = tuple(heapq.nsmallest(self.size, (*node.top, entry)))
+
+    def remove(self, product_id: int):
+        entry = self.rank(product_id)
+        for key in self._stored(self.keys.pop(product_id, ())):
+            path = [self.root]
+            for ch in key:
+                path.append(path[-1].children[ch])
+            if path[-1].ids:
+                path[-1].ids.discard(product_id)
+            for depth in range(len(path) - 1, 0, -1):
+                node = path[depth]
+                if not node.ids and not node.children:
+                    del path[depth - 1].children[key[depth - 1]]
+                elif entry in node.top:
+                    node.top = self._best(node)
+
+    def load(self, names: dict[int, str | None]):
+        """Bulk build: insert every key, then fill the top lists in one bottom-up pass."""
+        for product_id, name in names.items():
+            keys = self.keys_for(name)
+            self.keys[product_id] = keys
+            for key in self._stored(keys):
+                self._insert_key(product_id, key)
+
+        def finish(node: _Node):
+            for child in node.children.values():
+                finish(child)
+            node.top = self._best(node)
+
+        for child in self.root.children.values():
+            finish(child)
+
+    def lookup(self, prefix: str) -> tuple[tuple[int, int], ...]:
+        node = self.root
+        for ch in prefix[:self.max_depth]:
+            node = node.children.get(ch)
+            if node is None:
+                return ()
+        if len(prefix) <= self.max_depth:
+            return node.top
+        return tuple(e for e in node.top if any(k.startswith(prefix) for k in self.keys.get(e[1], ())))
+
+
+class SuggestIndex:
+    def __init__(self, size: int, max_depth: int):
+        self.size = size
+        self.max_depth = max_depth
+        self.ready = False
+        # (products by id, tree per language), swapped as a whole on reload
+        self._state: tuple[dict[int, Suggestion], dict[str, PrefixTree]] = ({}, {})
+        self._write_lock = threading.Lock()
+        self._refresher: threading.Thread | None = None
+
+    def load(self, products: list[Suggestion], popularity: dict[int, int]):
+        """Replace the whole index; readers keep using the old one until the swap."""
+        trees = {lang: PrefixTree(self.size, self.max_depth, popularity) for lang in LANGS}
+        for lang, tree in trees.items():
+            tree.load({p.id: getattr(p, f"name_{lang}") for p in products})
+        self._state = ({p.id: p for p in products}, trees)
+        self.ready = True
+
+    def rebuild(self, db: Session):
+        since = date.today() - timedelta(days=settings.SUGGEST_POPULARITY_DAYS)
+        # Held throughout, so a write made during the reload is applied to the new index, not lost
+        with self._write_lock:
+            products = [Suggestion(r.id, r.name_uz, r.name_ru, r.name_en, float(r.price), r.image_url) for r in db.execute(
+                select(Product.id, Product.name_uz, Product.name_ru, Product.name_en, Product.price, Product.image_url)
+            )]
+            popularity = dict(db.execute(
+                select(SalesDaily.product_id, func.sum(SalesDaily.quantity))
+                .where(SalesDaily.day >= since, SalesDaily.status != OrderStatus.cancelled.value)
+                .group_by(SalesDaily.product_id)
+            ).all())
+            db.rollback()
+            self.load(products, popularity)
+
+    def upsert(self, p):
+        """Apply a created or updated product (anything with Product's name/price/image fields)."""
+        if not self.ready:
+            return
+        item = Suggestion(p.id, p.name_uz, p.name_ru, p.name_en, float(p.price), p.image_url)
+        with self._write_lock:
+            products, trees = self._state
+            old = products.get(p.id)
+            for lang, tree in trees.items():
+                name = getattr(item, f"name_{lang}")
+                if old is not None and getattr(old, f"name_{lang}") == name:
+                    continue
+                tree.remove(p.id)
+                tree.add(p.id, name)
+            products[p.id] = item
+
+    def remove(self, product_id: int):
+        if not self.ready:
+            return
+        with self._write_lock:
+            products, trees = self._state
+            for tree in trees.values():
+                tree.remove(product_id)
+            products.pop(product_id, None)
+
+    def suggest(self, q: str, limit: int) -> list[Suggestion]:
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        products, trees = self._state
+        found = [top for top in (tree.lookup(prefix) for tree in trees.values()) if top]
+        if len(found) > 1:
+            # A product matching in several languages has the same entry in each list
+            found = [sorted(set().union(*found))]
+        return [products[i] for _, i in found[0][:limit] if i in products] if found else []
+
+    def start(self):
+        """Load now and every SUGGEST_REBUILD_INTERVAL seconds from a daemon thread (idempotent per process)."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        from app.db.session import SessionLocal
+
+        def loop():
+            while True:
+                try:
+                    with SessionLocal() as db:
+                        self.rebuild(db)
+                except Exception:
+                    log.exception("suggest index rebuild failed")
+                time.sleep(settings.SUGGEST_REBUILD_INTERVAL)
+
+        self._refresher = threading.Thread(target=loop, name="suggest-index", daemon=True)
+        self._refresher.start()
+
+
+suggest_index = SuggestIndex(settings.SUGGEST_MAX_LIMIT, settings.SUGGEST_MAX_PREFIX)
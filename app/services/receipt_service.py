@@ -0,0 +1,88 @@
+import os
+import time
+from decimal import Decimal
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core import metrics, timing, cancellation
+from app.core.config import settings
+from app.db.models.category import Category
+from app.db.models.order import Order, OrderArchive
+from app.services.order_service import get_order_items
+from app.utils.pdf import generate_order_pdf
+
+RECEIPTS_DIR = Path(settings.RECEIPTS_DIR)
+
+
+def receipt_path(order_id: int) -> Path:
+    return RECEIPTS_DIR / f"order_{order_id}_receipt.pdf"
+
+
+def build_receipt_data(db: Session, order: Order | OrderArchive, base_url: str) -> dict:
+    items = get_order_items(db, order)
+
+    total = sum([i.subtotal for i in items])
+    tax = (total * Decimal("0.12")).quantize(Decimal("0.01"))
+    shipping = Decimal("100000.00")
+    total_all = total + shipping + tax
+
+    tz = ZoneInfo("Asia/Tashkent")
+    created_local = order.created_at.astimezone(tz)
+
+    data = {
+        "order_id": order.id,
+        "customer_name": order.user.customer_name,
+        "phone_number": order.phone_number,
+        "shipping_address": order.shipping_address,
+        "date": created_local.strftime("%d.%m.%Y"),
+        "time": created_local.strftime("%H:%M:%S"),
+        "subtotal": total,
+        "shipping": shipping,
+        "tax": tax,
+        "total": total_all,
+        "items": [],
+    }
+
+    category_ids = {i.product_snapshot.get("category_id") for i in items} - {None}
+    categories = dict(db.execute(
+        select(Category.id, Category.name_uz).where(Category.id.in_(category_ids))
+    ).all()) if category_ids else {}
+
+    for i in items:
+        data["items"].append({
+            "name": i.product_snapshot.get("name", "-"),
+            "category": categories.get(i.product_snapshot.get("category_id")) or "-",
+            "price": i.product_snapshot.get("price", 0),
+            "quantity": i.quantity,
+            "subtotal": i.subtotal,
+            "image_url": f"{base_url}{i.product_snapshot.get('image_url', '')}"
+        })
+    return data
+
+
+def render_receipt(db: Session, order: Order | OrderArchive, base_url: str, source: str = "inline") -> bytes:
+    """Render the receipt PDF and store it for later requests. `source` labels the render timing metric."""
+    started = time.perf_counter()
+    data = build_receipt_data(db, order, base_url)
+    cancellation.check("pdf")
+    with timing.span("pdf"):
+        pdf = generate_order_pdf(data)
+    metrics.RECEIPT_RENDER.observe(time.perf_counter() - started, source=source)
+    path = receipt_path(order.id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(pdf)
+    os.replace(tmp, path)
+    return pdf
+
+
+def stored_receipt(order_id: int) -> bytes | None:
+    try:
+        return receipt_path(order_id).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def discard_receipt(order_id: int) -> None:
+    receipt_path(order_id).unlink(missing_ok=True)
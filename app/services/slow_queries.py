@@ -0,0 +1,207 @@
+"""
+Slow-query log. Statements slower than SLOW_QUERY_MS (timed by app/db/query_stats.py) are logged
+with their parameters, route and trace id, and aggregated per fingerprint in `slow_queries`.
+A SLOW_QUERY_EXPLAIN_SAMPLE_RATE sample of slow SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS)
+on a separate connection, at most once per SLOW_QUERY_EXPLAIN_INTERVAL per fingerprint.
+
+The database work happens on a background thread; the request that ran the slow statement
+only pays for a log line and a queue put.
+"""
+import hashlib
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import create_engine, select, func, desc
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.models.slow_query import SlowQuery
+
+log = logging.getLogger("app.db.slow")
+
+PARAMS_MAX_CHARS = 1000
+SELECT_RE = re.compile(r"^\s*SELECT\b", re.I)
+LOCKING_RE = re.compile(r"\bFOR\s+(UPDATE|NO\s+KEY\s+UPDATE|SHARE|KEY\s+SHARE)\b", re.I)
+# SELECTs that do something besides reading (EXPLAIN ANALYZE would do it again)
+SIDE_EFFECT_RE = re.compile(r"\b(pg_notify|pg_advisory\w*|nextval|setval|set_config|pg_sleep|pg_cancel_backend|pg_terminate_backend)\s*\(", re.I)
+
+_NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                    # string literals
+    (re.compile(r"%\(\w+\)s|%s|\$\d+"), "?"),                # bind parameters
+    (re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b"), "?"),       # numbers (not digits inside identifiers)
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),     # IN lists of any length
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(statement: str) -> tuple[str, str]:
+    """(md5, normalized text) of a statement, identical for every parameter value and IN-list size."""
+    normalized = statement.strip()
+    for pattern, repl in _NORMALIZE:
+        normalized = pattern.sub(repl, normalized)
+    return hashlib.md5(normalized.encode()).hexdigest(), normalized
+
+
+@dataclass
+class SlowStatement:
+    statement: str
+    parameters: object
+    executemany: bool
+    ms: float
+    route: str | None
+    trace_id: str | None
+
+
+class Recorder:
+    """Single background thread that EXPLAINs and upserts slow statements."""
+
+    def __init__(self, maxsize: int = 1000):
+        self.queue: queue.Queue[SlowStatement] = queue.Queue(maxsize)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._engine = None
+        self._explained_at: dict[str, float] = {}
+
+    def submit(self, item: SlowStatement):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="slow-queries", daemon=True)
+                    self._thread.start()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            pass
+
+    def flush(self):
+        """Block until everything submitted so far is stored (tests, shutdown)."""
+        self.queue.join()
+
+    @property
+    def engine(self):
+        # Its own one-connection pool: never competes with requests for a pooled connection,
+        # and its statements are not fed back into the slow-query log
+        if self._engine is None:
+            self._engine = create_engine(settings.DATABASE_URL, pool_size=1, max_overflow=0, pool_pre_ping=True)
+        return self._engine
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self.save(item)
+            except Exception:
+                log.exception("could not record a slow query")
+            finally:
+                self.queue.task_done()
+
+    def _should_explain(self, fp: str, item: SlowStatement) -> bool:
+        if (item.executemany or not SELECT_RE.match(item.statement)
+                or LOCKING_RE.search(item.statement) or SIDE_EFFECT_RE.search(item.statement)):
+            return False
+        if time.monotonic() - self._explained_at.get(fp, -1e9) < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+            return False
+        return random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+
+    def explain(self, item: SlowStatement) -> tuple[list | None, float | None]:
+        with self.engine.connect().execution_options(slow_query_log=False) as conn:
+            try:
+                # Give up well before the plan costs more than a few slow executions
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(max(item.ms * 5, 1000))}")
+                plan = conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + item.statement, item.parameters or {}
+                ).scalar()
+            except Exception as exc:
+                log.info("EXPLAIN failed for %s: %s", item.trace_id, exc)
+                return None, None
+            finally:
+                conn.rollback()
+        return plan, plan[0].get("Execution Time")
+
+    def save(self, item: SlowStatement):
+        fp, normalized = fingerprint(item.statement)
+        plan = plan_ms = None
+        if self._should_explain(fp, item):
+            self._explained_at[fp] = time.monotonic()
+            plan, plan_ms = self.explain(item)
+        stmt = pg_insert(SlowQuery).values(
+            fingerprint=fp,
+            query=normalized,
+            calls=1,
+            total_ms=item.ms,
+            max_ms=item.ms,
+            last_statement=item.statement,
+            last_params=repr(item.parameters)[:PARAMS_MAX_CHARS],
+            last_route=item.route,
+            last_trace_id=item.trace_id,
+            plan=plan,
+            plan_ms=plan_ms,
+            plan_at=func.now() if plan else None,
+        )
+        ex = stmt.excluded
+        stmt = stmt.on_conflict_do_update(index_elements=[SlowQuery.fingerprint], set_={
+            "calls": SlowQuery.calls + 1,
+            "total_ms": SlowQuery.total_ms + ex.total_ms,
+            "max_ms": func.greatest(SlowQuery.max_ms, ex.max_ms),
+            "last_seen": func.now(),
+            "last_statement": ex.last_statement,
+            "last_params": ex.last_params,
+            "last_route": ex.last_route,
+            "last_trace_id": ex.last_trace_id,
+            "plan": func.coalesce(ex.plan, SlowQuery.plan),
+            "plan_ms": func.coalesce(ex.plan_ms, SlowQuery.plan_ms),
+            "plan_at": func.coalesce(ex.plan_at, SlowQuery.plan_at),
+        })
+        with self.engine.connect().execution_options(slow_query_log=False) as conn:
+            conn.execute(stmt)
+            conn.commit()
+
+
+recorder = Recorder()
+
+
+def record(statement: str, parameters, executemany: bool, seconds: float, route: str | None, trace_id: str | None):
+    """Called from the statement hook for every statement over SLOW_QUERY_MS."""
+    ms = seconds * 1000
+    params = repr(parameters)
+    log.warning("slow query %.1f ms route=%s trace_id=%s: %s params=%s",
+                ms, route, trace_id, " ".join(statement.split()), params[:PARAMS_MAX_CHARS])
+    recorder.submit(SlowStatement(statement, parameters, executemany, ms, route, trace_id))
+
+
+SORTS = {
+    "total": desc(SlowQuery.total_ms),
+    "max": desc(SlowQuery.max_ms),
+    "calls": desc(SlowQuery.calls),
+    "mean": desc(SlowQuery.total_ms / SlowQuery.calls),
+    "recent": desc(SlowQuery.last_seen),
+}
+
+
+def top_slow_queries(db: Session, limit: int = 20, sort: str = "total", include_plan: bool = False) -> list[dict]:
+    rows = db.execute(select(SlowQuery).order_by(SORTS[sort]).limit(limit)).scalars().all()
+    out = []
+    for r in rows:
+        item = {
+            "fingerprint": r.fingerprint,
+            "query": r.query,
+            "calls": r.calls,
+            "total_ms": round(r.total_ms, 1),
+            "mean_ms": round(r.total_ms / r.calls, 1) if r.calls else None,
+            "max_ms": round(r.max_ms, 1),
+            "first_seen": str(r.first_seen),
+            "last_seen": str(r.last_seen),
+            "last_route": r.last_route,
+            "last_trace_id": r.last_trace_id,
+            "last_params": r.last_params,
+            "plan_ms": r.plan_ms,
+            "plan_at": str(r.plan_at) if r.plan_at else None,
+        }
+        if include_plan:
+            item["plan"] = r.plan
+        out.append(item)
+    return out
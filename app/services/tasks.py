@@ -0,0 +1,79 @@
+"""
+Background job handlers. Each runs in `python -m app.worker` with its own session:
+
+    job_queue.enqueue(db, "receipts.render", {"order_id": 1, "base_url": "https://..."}); db.commit()
+"""
+import logging
+from pathlib import Path
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.services.job_queue import task, Abort
+
+log = logging.getLogger(__name__)
+
+
+@task("receipts.render", queue="receipts")
+def render_receipt(db: Session, order_id: int, base_url: str):
+    from app.services.order_service import get_order
+    from app.services.receipt_service import render_receipt as render
+    order = get_order(db, order_id)
+    if not order:
+        raise Abort(f"Order {order_id} not found.")
+    render(db, order, base_url, source="worker")
+
+
+@task("orders.drain_intake", queue="intake", max_attempts=10)
+def drain_order_intake(db: Session):
+    from app.services.order_intake import drain
+    drain(db, settings.ORDER_INTAKE_BATCH_SIZE)
+
+
+@task("orders.expire_reservations")
+def expire_reservations(db: Session):
+    """Cancel stale `checking` orders that hold stock, then schedule the next run."""
+    from app.services.order_service import expire_reservations as expire
+    from app.services.job_queue import enqueue
+    expire(db)
+    enqueue(db, "orders.expire_reservations", delay=settings.STOCK_EXPIRY_INTERVAL, dedupe_key="orders.expire_reservations")
+    db.commit()
+
+
+@task("orders.ensure_partitions")
+def ensure_partitions(db: Session):
+    """Create upcoming order partitions, report coverage and default-partition rows, then schedule the next run."""
+    from app.db.partitions import ensure_order_partitions, default_rows, months_covered, PARTITIONED_TABLES
+    from app.services.job_queue import enqueue
+    conn = db.connection()
+    ensure_order_partitions(conn, settings.ORDER_PARTITIONS_AHEAD)
+    covered, stray = months_covered(conn), default_rows(conn)
+    metrics.ORDER_PARTITIONS_AHEAD.set(covered)
+    for table in PARTITIONED_TABLES:
+        metrics.ORDER_PARTITION_DEFAULT_ROWS.set(stray.get(table, 0), table=table)
+    if covered < settings.ORDER_PARTITIONS_AHEAD:
+        log.error("order partitions cover %d months ahead, %d wanted", covered, settings.ORDER_PARTITIONS_AHEAD)
+    if stray:
+        log.error("rows in the default order partitions: %s", stray)
+    enqueue(db, "orders.ensure_partitions", delay=settings.ORDER_PARTITIONS_CHECK_INTERVAL, dedupe_key="orders.ensure_partitions")
+    db.commit()
+
+
+@task("images.optimize", queue="images", max_attempts=3)
+def optimize_image(db: Session, path: str):
+    """Scale an uploaded image down to IMAGE_MAX_SIDE in place; the public URL stays the same."""
+    file = Path(path)
+    if not file.exists():
+        raise Abort(f"{path} does not exist.")
+    try:
+        with Image.open(file) as img:
+            img.load()
+            if max(img.size) <= settings.IMAGE_MAX_SIDE:
+                return
+            fmt = img.format
+            img.thumbnail((settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE))
+            tmp = file.with_name(f".{file.name}.tmp")
+            img.save(tmp, format=fmt)
+    except UnidentifiedImageError:
+        raise Abort(f"{path} is not a readable image.")
+    tmp.replace(file)
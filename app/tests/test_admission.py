@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from app.core import admission
+from app.core.config import settings
+
+
+def test_route_classes():
+    assert admission.classify("GET", "/api/v1/system/health") is None
+    assert admission.classify("GET", "/api/v1/orders/events") is None
+    assert admission.classify("GET", "/api/v1/orders/intake/3f9c2a7b") is None
+    assert admission.classify("GET", "/api/v1/products/12") == "catalog"
+    assert admission.classify("PUT", "/api/v1/products/12") == "admin"
+    assert admission.classify("POST", "/api/v1/orders") == "checkout"
+    assert admission.classify("GET", "/api/v1/auth/get-me") == "checkout"
+    assert admission.classify("GET", "/api/v1/auth/get-all-users") == "admin"
+    assert admission.classify("GET", "/api/v1/orders") == "admin"
+    assert admission.classify("PATCH", "/api/v1/orders/5/verify") == "admin"
+    assert admission.classify("GET", "/api/v1/orders/5/receipt") == "receipts"
+    assert admission.classify("PATCH", "/api/v1/orders/5/cancel") == "default"
+
+
+def test_budget_hands_slots_to_waiters(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_FACTOR", 1)
+
+    async def scenario():
+        budget = admission.Budget("t", 1)
+        assert await budget.acquire(0.01)
+        # Full: the waiter times out, a second concurrent waiter would overflow the queue
+        assert not await budget.acquire(0.01)
+        waiter = asyncio.create_task(budget.acquire(1.0))
+        await asyncio.sleep(0)
+        assert not await budget.acquire(1.0)
+        budget.release()
+        assert await waiter
+        assert budget.in_flight == 1
+        budget.release()
+        assert budget.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_overload_sheds_catalog_but_not_checkout(test_client, admin_headers, user_headers, monkeypatch):
+    unique_id = uuid.uuid4().hex[:8]
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": f"AdmCat_uz_{unique_id}", "name_ru": f"AdmCat_ru_{unique_id}", "name_en": f"AdmCat_en_{unique_id}"
+    }, headers=admin_headers).json()["data"]["id"]
+    prod_id = test_client.post("/api/v1/products", data={
+        "name_uz": f"AdmProd_{unique_id}", "name_ru": f"AdmProd_{unique_id}", "name_en": f"AdmProd_{unique_id}",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com"
+    }, headers=admin_headers).json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+
+    def checkout():
+        return test_client.post("/api/v1/orders", json={
+            "user_id": user_id, "shipping_address": "Tashkent", "phone_number": "+998901234567",
+            "items": [{"product_id": prod_id, "quantity": 1}]
+        }, headers=user_headers)
+
+    # Catalog budget used up: catalog requests wait briefly, then 503
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 0.05)
+    catalog = admission.budgets["catalog"]
+    monkeypatch.setattr(catalog, "in_flight", catalog.limit)
+    resp = test_client.get("/api/v1/products")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == str(settings.ADMISSION_RETRY_AFTER)
+    assert resp.json()["error"]["code"] == "SERVICE_UNAVAILABLE"
+    assert resp.json()["meta"]["trace_id"] == resp.headers["X-Trace-Id"]
+    assert test_client.get("/api/v1/system/health").status_code == 200
+    assert checkout().status_code == 200
+    monkeypatch.setattr(catalog, "in_flight", 0)
+
+    # DB pool down to the reserved connections: everything but checkout is shed
+    monkeypatch.setattr(admission, "db_pool_busy", lambda: True)
+    assert test_client.get("/api/v1/products").status_code == 503
+    assert test_client.get("/api/v1/orders", headers=admin_headers).status_code == 503
+    assert test_client.get("/api/v1/system/health").status_code == 200
+    assert checkout().status_code == 200
+
+    monkeypatch.undo()
+    metrics_text = test_client.get("/api/v1/system/metrics").text
+    assert 'admission_rejected_total{route_class="catalog",reason="db_pool"}' in metrics_text
+    assert 'admission_rejected_total{route_class="catalog",reason="budget"}' in metrics_text
+
+
+def scope_for(method, path):
+    return {"type": "http", "method": method, "path": path, "raw_path": path.encode(), "root_path": "",
+            "scheme": "http", "server": ("testserver", 80), "query_string": b"", "headers": []}
+
+
+def test_statement_timeout_per_route_class(test_client, admin_headers, monkeypatch):
+    from fastapi import Request
+    from sqlalchemy import text
+    from app.core.deps import get_db
+    from app.routers import system
+
+    gen = get_db(Request(scope_for("GET", "/api/v1/products")))
+    db = next(gen)
+    assert db.execute(text("SHOW statement_timeout")).scalar() == "3s"
+    db.commit()
+    # Applies to every transaction of the request, not only the first
+    assert db.execute(text("SHOW statement_timeout")).scalar() == "3s"
+    gen.close()
+
+    monkeypatch.setitem(settings.STATEMENT_TIMEOUTS_MS, "admin", 50)
+    monkeypatch.setattr(system, "queue_stats", lambda db, window: db.execute(text("SELECT pg_sleep(2)")).all())
+    resp = test_client.get("/api/v1/system/jobs", headers=admin_headers)
+    assert resp.status_code == 503
+    assert resp.json()["error"]["code"] == "TIMEOUT"
+    assert resp.headers["Retry-After"]
+    assert 'db_statements_cancelled_total{reason="timeout"}' in test_client.get("/api/v1/system/metrics").text
+
+
+def test_client_disconnect_cancels_query_and_pdf():
+    import contextvars
+    import time
+    import pytest
+    from fastapi import Request
+    from psycopg.errors import QueryCanceled
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.core import cancellation
+    from app.core.deps import get_db
+    from app.utils.pdf import load_image_from_url
+
+    result = {}
+
+    async def endpoint(scope, receive, send):
+        def work():
+            gen = get_db(Request(scope))
+            db = next(gen)
+            try:
+                db.execute(text("SELECT pg_sleep(5)"))
+            except OperationalError as exc:
+                result["error"] = exc.orig
+            finally:
+                gen.close()
+            # Python-side work stops at its next checkpoint too
+            with pytest.raises(cancellation.ClientDisconnected):
+                load_image_from_url("http://127.0.0.1:9/never-fetched.png", 10, 10)
+        await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, work)
+
+    async def receive():
+        await asyncio.sleep(0.2)
+        return {"type": "http.disconnect"}
+
+    started = time.monotonic()
+    asyncio.run(cancellation.DisconnectMiddleware(endpoint)(scope_for("GET", "/api/v1/products"), receive, None))
+    assert isinstance(result["error"], QueryCanceled)
+    assert time.monotonic() - started < 3
@@ -0,0 +1,52 @@
+import uuid
+from app.cli import main as cli_main
+
+
+def test_sales_rollup_follows_order_status(test_client, admin_headers, user_headers):
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"StatCat_uz_{unique_id}",
+        "name_ru": f"StatCat_ru_{unique_id}",
+        "name_en": f"StatCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    resp = test_client.post("/api/v1/products", data={
+        "name_uz": f"StatProd_{unique_id}", "name_ru": f"StatProd_{unique_id}", "name_en": f"StatProd_{unique_id}",
+        "price": 250, "category_id": cat_id, "image_url": "http://img.com"
+    }, headers=admin_headers)
+    prod_id = resp.json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+
+    resp = test_client.post("/api/v1/orders", json={
+        "user_id": user_id,
+        "shipping_address": "Tashkent",
+        "phone_number": "+998901234567",
+        "items": [{"product_id": prod_id, "quantity": 3}]
+    }, headers=user_headers)
+    order_id = resp.json()["data"]["order_id"]
+
+    def sales_by_status():
+        resp = test_client.get(
+            f"/api/v1/analytics/sales?group_by=status&product_id={prod_id}&status=checking,verified,done,cancelled",
+            headers=admin_headers,
+        )
+        assert resp.status_code == 200
+        return {r["status"]: (r["quantity"], r["revenue"]) for r in resp.json()["data"] if r["quantity"]}
+
+    assert sales_by_status() == {"checking": (3, 750.0)}
+
+    test_client.patch(f"/api/v1/orders/{order_id}/verify", headers=admin_headers)
+    assert sales_by_status() == {"verified": (3, 750.0)}
+
+    resp = test_client.get(f"/api/v1/analytics/top-products?category_id={cat_id}", headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.json()["data"][0]["product_id"] == prod_id
+
+    # A full rebuild must agree with the incrementally maintained rows
+    cli_main(["backfill-sales"])
+    assert sales_by_status() == {"verified": (3, 750.0)}
+
+
+def test_analytics_requires_admin(test_client, user_headers):
+    resp = test_client.get("/api/v1/analytics/sales", headers=user_headers)
+    assert resp.status_code == 403
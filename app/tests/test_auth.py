@@ -28,3 +28,85 @@ def test_register_login_flow(test_client):
 def test_auth_required_fail(test_client):
     resp = test_client.get("/api/v1/auth/get-me")
     assert resp.status_code == 401
+
+
+def test_get_all_users_keyset_pages_and_export(test_client, admin_headers):
+    import csv
+    import io
+    import json
+
+    prefix = f"+7{uuid.uuid4().int % 100000000:08d}"
+    phones = [f"{prefix}{n:03d}" for n in range(5)]
+    for n, phone in enumerate(phones):
+        name = f"Zuhra {prefix} {n}" if n % 2 else f"Bobur {prefix} {n}"
+        assert test_client.post("/api/v1/auth/register", json={"customer_name": name, "phone_number": phone}).status_code == 200
+
+    seen, cursor = [], None
+    while True:
+        params = {"phone": prefix[:4] + " " + prefix[4:], "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        data = test_client.get("/api/v1/auth/get-all-users", params=params, headers=admin_headers).json()["data"]
+        assert data["count"] == len(data["users"]) <= 2
+        seen += data["users"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    # Newest first, every user exactly once
+    assert [u["phone_number"] for u in seen] == phones[::-1]
+
+    data = test_client.get("/api/v1/auth/get-all-users", params={"name": f"zuhra {prefix}"}, headers=admin_headers).json()["data"]
+    assert sorted(u["phone_number"] for u in data["users"]) == [phones[1], phones[3]]
+
+    resp = test_client.get("/api/v1/auth/export-users", params={"phone": prefix}, headers=admin_headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["phone_number"] for r in rows] == phones
+    assert rows[0]["role"] == "user"
+
+    resp = test_client.get("/api/v1/auth/export-users", params={"phone": prefix, "format": "csv"}, headers=admin_headers)
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    # Escaped against formula injection: a cell starting with "+" would be evaluated by a spreadsheet
+    assert [r["phone_number"] for r in rows] == ["'" + p for p in phones]
+
+    resp = test_client.get("/api/v1/auth/export-users", params={"phone": prefix + "9"}, headers=admin_headers)
+    assert resp.status_code == 200 and resp.text == ""
+    assert test_client.get("/api/v1/auth/export-users").status_code == 401
+
+
+def test_upsert_users_batch(test_client, admin_headers, query_budget):
+    prefix = f"+6{uuid.uuid4().int % 100000000:08d}"
+    base_tid = 10**11 + uuid.uuid4().int % 10**9
+    existing = f"{prefix}000"
+    test_client.post("/api/v1/auth/register", json={"customer_name": "Old Name", "phone_number": existing})
+    taken = f"{prefix}001"
+    test_client.post("/api/v1/auth/register", json={"customer_name": "Taken", "phone_number": taken})
+    test_client.patch("/api/v1/auth/set-telegram-id", json={"phone_number": taken, "telegram_id": base_tid})
+
+    users = [
+        {"phone_number": existing, "customer_name": "New Name", "telegram_id": base_tid + 1},   # updated
+        {"phone_number": taken, "customer_name": "Taken"},                                     # unchanged
+        {"phone_number": f"{prefix}002", "customer_name": "Steals", "telegram_id": base_tid},  # conflict: taken's id
+        {"phone_number": existing, "customer_name": "Again"},                                  # conflict: repeated
+        {"phone_number": f"{prefix}003", "customer_name": "Dup", "telegram_id": base_tid + 1}, # conflict: repeated id
+    ] + [{"phone_number": f"{prefix}{n:03d}", "customer_name": f"Bot {n}", "telegram_id": base_tid + n} for n in range(10, 200)]
+
+    with query_budget(5):
+        resp = test_client.post("/api/v1/auth/upsert-users", json={"users": users}, headers=admin_headers)
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert (data["created"], data["updated"], data["unchanged"], data["conflicted"]) == (190, 1, 1, 3)
+    statuses = [r["status"] for r in data["results"][:5]]
+    assert statuses == ["updated", "unchanged", "conflict", "conflict", "conflict"]
+    assert data["results"][2]["error"]["code"] == "USER_EXISTS"
+    assert data["results"][1]["user_id"] is not None
+
+    # New users can authenticate with their Telegram ID straight away
+    me = test_client.get("/api/v1/auth/get-me", headers={"X-Telegram-Id": str(base_tid + 1)}).json()["data"]
+    assert (me["phone_number"], me["customer_name"]) == (existing, "New Name")
+    assert test_client.get("/api/v1/auth/get-me", headers={"X-Telegram-Id": str(base_tid + 42)}).json()["data"]["role"] == "user"
+
+    # Re-running the same sync changes nothing
+    again = test_client.post("/api/v1/auth/upsert-users", json={"users": users[5:]}, headers=admin_headers).json()["data"]
+    assert again["unchanged"] == 190
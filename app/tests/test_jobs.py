@@ -0,0 +1,64 @@
+import uuid
+from sqlalchemy import update
+from app.db.models.job import Job
+from app.db.session import SessionLocal
+from app.services import job_queue
+
+calls = []
+
+
+@job_queue.task("tests.flaky", queue="tests-flaky", max_attempts=2)
+def flaky(db, n: int):
+    calls.append(n)
+    raise RuntimeError("boom")
+
+
+@job_queue.task("tests.ok", queue="tests-ok")
+def ok(db, n: int):
+    calls.append(n)
+
+
+def test_retry_then_fail():
+    with SessionLocal() as db:
+        job_id = job_queue.enqueue(db, "tests.flaky", {"n": 1})
+        db.commit()
+
+        job = job_queue.claim(db, "tests-flaky", 1, "test", 60)
+        assert job.id == job_id and job.attempts == 1
+        assert job_queue.run_job(db, job, "test") is False
+        job = db.get(Job, job_id)
+        db.refresh(job)
+        assert job.status == "queued" and "boom" in job.last_error
+        # Backoff pushed it into the future
+        assert job_queue.claim(db, "tests-flaky", 1, "test", 60) is None
+
+        db.execute(update(Job).where(Job.id == job_id).values(run_at=Job.created_at))
+        db.commit()
+        job = job_queue.claim(db, "tests-flaky", 1, "test", 60)
+        assert job_queue.run_job(db, job, "test") is False
+        db.refresh(job)
+        assert (job.status, job.attempts) == ("failed", 2)
+
+
+def test_concurrency_limit_and_dedupe(test_client, admin_headers):
+    key = f"tests.ok:{uuid.uuid4().hex}"
+    with SessionLocal() as db:
+        first = job_queue.enqueue(db, "tests.ok", {"n": 10}, dedupe_key=key)
+        assert job_queue.enqueue(db, "tests.ok", {"n": 11}, dedupe_key=key) is None
+        job_queue.enqueue(db, "tests.ok", {"n": 12})
+        db.commit()
+
+        running = job_queue.claim(db, "tests-ok", 1, "w1", 60)
+        assert running.id == first
+        # The queue allows one running job, whichever worker asks
+        assert job_queue.claim(db, "tests-ok", 1, "w2", 60) is None
+        assert job_queue.run_job(db, running, "w1") is True
+        nxt = job_queue.claim(db, "tests-ok", 1, "w2", 60)
+        assert job_queue.run_job(db, nxt, "w2") is True
+    assert calls[-2:] == [10, 12]
+
+    resp = test_client.get("/api/v1/system/jobs", headers=admin_headers)
+    assert resp.status_code == 200
+    stats = {s["queue"]: s for s in resp.json()["data"]}
+    assert stats["tests-ok"]["done_recent"] >= 2
+    assert stats["tests-flaky"]["failed"] >= 1
@@ -0,0 +1,117 @@
+import json
+import os
+import time
+from pathlib import Path
+from app.core import metrics
+from app.core.config import settings
+
+
+def sample(text: str, line_prefix: str) -> float:
+    return sum(float(l.rsplit(" ", 1)[1]) for l in text.splitlines() if l.startswith(line_prefix))
+
+
+def test_metrics_exposition(test_client, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "METRICS_DIR", str(tmp_path))
+    test_client.get("/api/v1/categories/999999999")
+    test_client.get("/api/v1/categories/999999998")
+
+    resp = test_client.get("/api/v1/system/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    series = 'http_requests_total{method="GET",route="/api/v1/categories/{id}",status="404"}'
+    assert sample(text, series) >= 2
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/v1/categories/{id}",status="404",le="+Inf"}' in text
+    assert f'db_pool_connections{{state="size",pid="{os.getpid()}"}}' in text
+    own = sample(text, series)
+
+    # Another live process on the host (e.g. the worker or a second API worker) adds to the counters
+    other = metrics.registry.snapshot()
+    other["pid"] = os.getppid()
+    other["metrics"] = {"http_requests_total": other["metrics"]["http_requests_total"]}
+    Path(tmp_path, f"{other['pid']}.json").write_text(json.dumps(other))
+    text = test_client.get("/api/v1/system/metrics").text
+    assert sample(text, series) == 2 * own
+    # ...while an exited process's stale snapshot is dropped
+    other["pid"], other["at"] = 2 ** 22 + 1, time.time() - metrics.STALE_SNAPSHOT_SECONDS - 1
+    stale = Path(tmp_path, f"{other['pid']}.json")
+    stale.write_text(json.dumps(other))
+    test_client.get("/api/v1/system/metrics")
+    assert not stale.exists()
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+    assert test_client.get("/api/v1/system/metrics").status_code == 401
+    assert test_client.get("/api/v1/system/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_server_timing_and_trace_id(test_client, admin_headers, monkeypatch):
+    import logging
+    from app.core import timing
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    timing.log.addHandler(handler)
+    monkeypatch.setattr(settings, "TIMING_LOG_SAMPLE_RATE", 1.0)
+    try:
+        resp = test_client.get("/api/v1/orders?limit=1", headers={**admin_headers, "X-Trace-Id": "bot-1234abcd"})
+    finally:
+        timing.log.removeHandler(handler)
+    assert resp.headers["X-Trace-Id"] == "bot-1234abcd"
+    spans = dict(part.split(";", 1)[0:2] for part in resp.headers["Server-Timing"].split(", "))
+    assert {"auth", "db", "serialize", "total"} <= set(spans)
+    assert 'desc="' in spans["db"]
+
+    line = json.loads(records[-1].getMessage())
+    assert line["trace_id"] == "bot-1234abcd"
+    assert line["route"] == "/api/v1/orders"
+    assert line["ms"]["total"] >= line["ms"]["db"]
+
+    # A bogus incoming id is replaced
+    resp = test_client.get("/api/v1/system/health", headers={"X-Trace-Id": "x y"})
+    assert resp.headers["X-Trace-Id"] != "x y" and len(resp.headers["X-Trace-Id"]) == 36
+
+    # Unhandled errors still get the trace id, Server-Timing and a log line
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routers import system
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(system, "base_success", broken)
+    timing.log.addHandler(handler)
+    try:
+        resp = TestClient(app, raise_server_exceptions=False).get("/api/v1/system/health", headers={"X-Trace-Id": "err-1234abcd"})
+    finally:
+        timing.log.removeHandler(handler)
+    assert resp.status_code == 500
+    assert resp.headers["X-Trace-Id"] == "err-1234abcd"
+    assert "total;dur=" in resp.headers["Server-Timing"]
+    line = json.loads(records[-1].getMessage())
+    assert (line["trace_id"], line["status"]) == ("err-1234abcd", 500)
+
+
+def test_slow_query_log(test_client, admin_headers, monkeypatch):
+    from app.services import slow_queries
+    from app.services.product_search import normalize
+    a, _ = slow_queries.fingerprint("SELECT * FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND name = 'x' LIMIT 5")
+    b, text = slow_queries.fingerprint("SELECT *  FROM t\nWHERE id IN (%(id_1_1)s) AND name = 'it''s' LIMIT 50")
+    assert a == b and "IN (...)" in text and "LIMIT ?" in text
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0001)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_INTERVAL", 0.0)
+    resp = test_client.get("/api/v1/products?q=slowquerytest&sort=-price", headers={"X-Trace-Id": "slow-query-test"})
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0)
+    slow_queries.recorder.flush()
+
+    resp = test_client.get("/api/v1/system/slow-queries?sort=recent&limit=50&include_plan=true", headers=admin_headers)
+    assert resp.status_code == 200
+    ours = [r for r in resp.json()["data"] if r["last_trace_id"] == "slow-query-test"]
+    assert ours and all(r["last_route"] == "/api/v1/products" for r in ours)
+    listing = next(r for r in ours if "to_tsquery" in r["query"] and "count(" not in r["query"].lower())
+    assert normalize("slowquerytest") in listing["last_params"]
+    assert listing["plan"][0]["Plan"]["Node Type"]
+    assert listing["plan_ms"] is not None
+
+    assert test_client.get("/api/v1/system/slow-queries").status_code == 401
@@ -34,7 +34,17 @@ def test_order_flow(test_client, admin_headers, user_headers):
     assert resp.status_code == 200
     order_id = resp.json()["data"]["order_id"]
     assert resp.json()["data"]["status"] == "checking"
-    
+
+    # Admin: Filter orders by product
+    resp = test_client.get(f"/api/v1/orders?product_id={prod_id}", headers=admin_headers)
+    assert resp.status_code == 200
+    assert [o["order_id"] for o in resp.json()["data"]] == [order_id]
+    assert resp.json()["data"][0]["items"][0]["product_id"] == prod_id
+    resp = test_client.get(f"/api/v1/orders?product_id={prod_id}&date_to=2000-01-01", headers=admin_headers)
+    assert resp.json()["data"] == []
+    resp = test_client.get("/api/v1/orders?date_from=yesterday'--", headers=admin_headers)
+    assert resp.status_code == 422
+
     # Admin: Verify
     resp = test_client.patch(f"/api/v1/orders/{order_id}/verify", headers=admin_headers)
     assert resp.status_code == 200
@@ -58,3 +68,401 @@ def test_order_rbac(test_client, user_headers):
     # Actually, verify endpoint has `admin=Depends(admin_required)`.
     # So it should return 403 immediately if not admin.
     assert resp.status_code == 403
+
+def test_bulk_transitions(test_client, admin_headers, user_headers):
+    import uuid
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"BulkCat_uz_{unique_id}",
+        "name_ru": f"BulkCat_ru_{unique_id}",
+        "name_en": f"BulkCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    resp = test_client.post("/api/v1/products", data={
+        "name_uz": f"BulkProd_{unique_id}", "name_ru": f"BulkProd_{unique_id}", "name_en": f"BulkProd_{unique_id}",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com"
+    }, headers=admin_headers)
+    prod_id = resp.json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+
+    order_ids = []
+    for _ in range(3):
+        resp = test_client.post("/api/v1/orders", json={
+            "user_id": user_id,
+            "shipping_address": "Tashkent",
+            "phone_number": "+998901234567",
+            "items": [{"product_id": prod_id, "quantity": 1}]
+        }, headers=user_headers)
+        order_ids.append(resp.json()["data"]["order_id"])
+
+    resp = test_client.patch(f"/api/v1/orders/{order_ids[2]}/cancel", json={"user_id": user_id, "cancel_reason": "changed mind"}, headers=user_headers)
+    assert resp.status_code == 200
+    assert resp.json()["data"]["cancel_reason"] == "changed mind"
+
+    resp = test_client.post("/api/v1/orders/bulk/verify", json={"ids": order_ids + [999999]}, headers=admin_headers)
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert (data["succeeded"], data["failed"]) == (2, 2)
+    results = {r["order_id"]: r for r in data["results"]}
+    assert results[order_ids[0]]["status"] == "verified"
+    assert results[order_ids[2]]["error"]["code"] == "INVALID_ORDER"
+    assert results[999999]["error"]["code"] == "NOT_FOUND"
+
+    # Single-order endpoints share the same path and error mapping
+    resp = test_client.patch(f"/api/v1/orders/{order_ids[2]}/complete", headers=admin_headers)
+    assert resp.status_code == 422
+    resp = test_client.post("/api/v1/orders/bulk/complete", json={"ids": order_ids[:2]}, headers=admin_headers)
+    assert resp.json()["data"]["succeeded"] == 2
+
+def test_archived_orders_stay_readable(test_client, admin_headers, user_headers):
+    import uuid
+    from app.db.session import SessionLocal
+    from app.services.archive_service import archive_orders
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"ArchCat_uz_{unique_id}",
+        "name_ru": f"ArchCat_ru_{unique_id}",
+        "name_en": f"ArchCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    resp = test_client.post("/api/v1/products", data={
+        "name_uz": f"ArchProd_{unique_id}", "name_ru": f"ArchProd_{unique_id}", "name_en": f"ArchProd_{unique_id}",
+        "price": 300, "category_id": cat_id, "image_url": "http://img.com"
+    }, headers=admin_headers)
+    prod_id = resp.json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+    resp = test_client.post("/api/v1/orders", json={
+        "user_id": user_id,
+        "shipping_address": "Tashkent",
+        "phone_number": "+998901234567",
+        "items": [{"product_id": prod_id, "quantity": 2}]
+    }, headers=user_headers)
+    order_id = resp.json()["data"]["order_id"]
+    test_client.patch(f"/api/v1/orders/{order_id}/cancel", json={"user_id": user_id, "cancel_reason": "test"}, headers=user_headers)
+
+    # Negative age: the order counts as cold right away (and only this test's order is touched)
+    with SessionLocal() as db:
+        assert archive_orders(db, older_than_days=-1, batch_size=2, order_ids=[order_id]) == 1
+
+    resp = test_client.get(f"/api/v1/orders/{order_id}", headers=user_headers)
+    assert resp.status_code == 200
+    assert resp.json()["data"]["status"] == "cancelled"
+    assert resp.json()["data"]["items"][0]["quantity"] == 2
+
+    resp = test_client.get(f"/api/v1/orders?product_id={prod_id}", headers=admin_headers)
+    assert resp.json()["data"] == []
+    resp = test_client.get(f"/api/v1/orders?product_id={prod_id}&include_archived=true&sort=-created_at", headers=admin_headers)
+    assert [o["order_id"] for o in resp.json()["data"]] == [order_id]
+    assert resp.json()["meta"]["pagination"]["total"] == 1
+
+async def test_intake_wait_without_subscription():
+    from app.routers.orders import wait_for_user_event
+    # The hub refused the subscription: the long poll just waits out the interval
+    assert await wait_for_user_event(None, 1, 0.01) is None
+
+def test_default_order_partition(test_client, user_headers):
+    from datetime import date
+    from sqlalchemy import text
+    from app.db.session import engine
+    from app.db.partitions import default_rows, ensure_order_partitions, months_covered
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+    with engine.connect() as conn:
+        try:
+            # No partition for 2001: the row goes to orders_default instead of failing
+            conn.execute(text(
+                "INSERT INTO orders (user_id, shipping_address, phone_number, created_at) "
+                "VALUES (:user_id, 'Tashkent', '+998901234567', '2001-01-15')"
+            ), {"user_id": user_id})
+            assert default_rows(conn, date(2001, 1, 1), date(2001, 2, 1)) == {"orders": 1}
+            # The month is skipped rather than failing the whole run; the next one is created
+            created = ensure_order_partitions(conn, 1, start=date(2001, 1, 1))
+            assert created == ["orders_p2001_02", "order_items_p2001_02"]
+            assert months_covered(conn) >= 0
+        finally:
+            conn.rollback()
+
+async def test_order_event_stream(test_client, admin_headers, user_headers):
+    import asyncio
+    import uuid
+    from fastapi.concurrency import run_in_threadpool
+    from app.services import order_events
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"EvCat_uz_{unique_id}",
+        "name_ru": f"EvCat_ru_{unique_id}",
+        "name_en": f"EvCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    resp = test_client.post("/api/v1/products", data={
+        "name_uz": f"EvProd_{unique_id}", "name_ru": f"EvProd_{unique_id}", "name_en": f"EvProd_{unique_id}",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com"
+    }, headers=admin_headers)
+    prod_id = resp.json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+
+    assert test_client.get("/api/v1/orders/events", headers=user_headers).status_code == 403
+
+    queue = await order_events.hub.subscribe()
+    try:
+        resp = await run_in_threadpool(test_client.post, "/api/v1/orders", json={
+            "user_id": user_id,
+            "shipping_address": "Tashkent",
+            "phone_number": "+998901234567",
+            "items": [{"product_id": prod_id, "quantity": 1}]
+        }, headers=user_headers)
+        order_id = resp.json()["data"]["order_id"]
+        await run_in_threadpool(test_client.patch, f"/api/v1/orders/{order_id}/verify", headers=admin_headers)
+
+        live = []
+        while len(live) < 2:
+            event = await asyncio.wait_for(queue.get(), 5)
+            if event["order_id"] == order_id:
+                live.append(event)
+    finally:
+        await order_events.hub.stop()
+
+    assert [(e["type"], e["status"], e["previous_status"]) for e in live] == [
+        ("order.created", "checking", None),
+        ("order.status_changed", "verified", "checking"),
+    ]
+    # A client that saw the first event gets the rest replayed from the table
+    replayed = [e for e in order_events.replay(live[0]["id"]) if e["order_id"] == order_id]
+    assert replayed == live[1:]
+
+def test_async_order_intake(test_client, admin_headers, user_headers):
+    import uuid
+    from app.db.session import SessionLocal
+    from app.services.order_intake import drain
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"IntakeCat_uz_{unique_id}",
+        "name_ru": f"IntakeCat_ru_{unique_id}",
+        "name_en": f"IntakeCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    resp = test_client.post("/api/v1/products", data={
+        "name_uz": f"IntakeProd_{unique_id}", "name_ru": f"IntakeProd_{unique_id}", "name_en": f"IntakeProd_{unique_id}",
+        "price": 150, "category_id": cat_id, "image_url": "http://img.com"
+    }, headers=admin_headers)
+    prod_id = resp.json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+    order_data = {
+        "user_id": user_id,
+        "shipping_address": "Tashkent",
+        "phone_number": "+998901234567",
+        "items": [{"product_id": prod_id, "quantity": 2, "price": 150}]
+    }
+    async_headers = {**user_headers, "Prefer": "respond-async"}
+
+    resp = test_client.post("/api/v1/orders", json={**order_data, "items": [{"product_id": prod_id, "quantity": 1, "price": 99}]}, headers=async_headers)
+    assert resp.status_code == 409
+    assert resp.json()["error"]["code"] == "PRICE_CHANGED"
+
+    resp = test_client.post("/api/v1/orders", json=order_data, headers=async_headers)
+    assert resp.status_code == 202
+    token = resp.json()["data"]["token"]
+    assert resp.headers["location"] == f"/api/v1/orders/intake/{token}"
+    assert (resp.json()["data"]["status"], resp.json()["data"]["total_amount"]) == ("pending", 300)
+
+    resp = test_client.get(f"/api/v1/orders/intake/{token}", headers=user_headers)
+    assert resp.json()["data"]["status"] == "pending"
+
+    with SessionLocal() as db:
+        assert drain(db, batch_size=50) >= 1
+
+    resp = test_client.get(f"/api/v1/orders/intake/{token}?wait=5", headers=user_headers)
+    data = resp.json()["data"]
+    assert data["status"] == "created"
+    resp = test_client.get(f"/api/v1/orders/{data['order_id']}", headers=user_headers)
+    assert resp.json()["data"]["status"] == "checking"
+    assert resp.json()["data"]["total_amount"] == 300
+
+def test_stock_reservation(test_client, admin_headers, user_headers):
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core.response import BaseHTTPException
+    from app.db.session import SessionLocal
+    from app.services.order_service import create_order, expire_reservations
+    from app.services.order_intake import drain
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"StockCat_uz_{unique_id}",
+        "name_ru": f"StockCat_ru_{unique_id}",
+        "name_en": f"StockCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    resp = test_client.post("/api/v1/products", data={
+        "name_uz": f"StockProd_{unique_id}", "name_ru": f"StockProd_{unique_id}", "name_en": f"StockProd_{unique_id}",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com", "stock": 3
+    }, headers=admin_headers)
+    prod_id = resp.json()["data"]["id"]
+    assert resp.json()["data"]["stock"] == 3
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+
+    def order(qty, headers=user_headers):
+        return test_client.post("/api/v1/orders", json={
+            "user_id": user_id,
+            "shipping_address": "Tashkent",
+            "phone_number": "+998901234567",
+            "items": [{"product_id": prod_id, "quantity": qty}]
+        }, headers=headers)
+
+    def stock():
+        return test_client.get(f"/api/v1/products/{prod_id}").json()["data"]["stock"]
+
+    first = order(2).json()["data"]["order_id"]
+    assert stock() == 1
+    resp = order(2)
+    assert resp.status_code == 409
+    assert resp.json()["error"]["code"] == "OUT_OF_STOCK"
+    assert stock() == 1
+
+    test_client.patch(f"/api/v1/orders/{first}/cancel", json={"user_id": user_id, "cancel_reason": "changed mind"}, headers=user_headers)
+    assert stock() == 3
+    # Cancelling returns stock exactly once
+    test_client.patch(f"/api/v1/orders/{first}/cancel", json={"user_id": user_id, "cancel_reason": "again"}, headers=user_headers)
+    assert stock() == 3
+
+    # Unverified orders give their stock back once the reservation times out
+    stale = order(3).json()["data"]["order_id"]
+    assert stock() == 0
+    with SessionLocal() as db:
+        assert expire_reservations(db, older_than_minutes=-1) >= 1
+    assert test_client.get(f"/api/v1/orders/{stale}", headers=user_headers).json()["data"]["status"] == "cancelled"
+    assert stock() == 3
+
+    # Async intake hands out the remaining stock in arrival order
+    async_headers = {**user_headers, "Prefer": "respond-async"}
+    tokens = [order(2, async_headers).json()["data"]["token"] for _ in range(2)]
+    with SessionLocal() as db:
+        drain(db, batch_size=50)
+    statuses = [test_client.get(f"/api/v1/orders/intake/{t}", headers=user_headers).json()["data"] for t in tokens]
+    assert [s["status"] for s in statuses] == ["created", "failed"]
+    assert "out of stock" in statuses[1]["error"]
+    assert stock() == 1
+
+    # Parallel buyers never oversell
+    resp = test_client.put(f"/api/v1/products/{prod_id}", data={"stock_delta": 4}, headers=admin_headers)
+    assert resp.json()["data"]["stock"] == 5
+
+    def buy(_):
+        with SessionLocal() as db:
+            try:
+                create_order(db, user_id, "Tashkent", "+998901234567", None, [{"product_id": prod_id, "quantity": 1}], "uz")
+                return True
+            except BaseHTTPException as exc:
+                assert exc.code == "OUT_OF_STOCK"
+                return False
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        results = list(pool.map(buy, range(12)))
+    assert sum(results) == 5
+    assert stock() == 0
+
+
+def test_cancel_racing_checkout(test_client, admin_headers, user_headers, monkeypatch):
+    import threading
+    import uuid
+    from app.db.session import SessionLocal
+    from app.services import analytics_service
+    from app.services.order_service import create_order, transition_orders
+    from app.db.models.order import OrderStatus
+    unique_id = uuid.uuid4().hex[:8]
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": f"RaceCat_{unique_id}", "name_ru": f"RaceCat_{unique_id}", "name_en": f"RaceCat_{unique_id}"
+    }, headers=admin_headers).json()["data"]["id"]
+    prod_id = test_client.post("/api/v1/products", data={
+        "name_uz": f"RaceProd_{unique_id}", "name_ru": f"RaceProd_{unique_id}", "name_en": f"RaceProd_{unique_id}",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com", "stock": 5
+    }, headers=admin_headers).json()["data"]["id"]
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+    item = [{"product_id": prod_id, "quantity": 1}]
+    with SessionLocal() as db:
+        pending = create_order(db, user_id, "Tashkent", "+998901234567", None, item, "uz")["order_id"]
+
+    # The checkout holds the product row lock and pauses before its sales_daily update, while
+    # a cancel of a same-day order of that product starts; both touch the same two rows
+    stock_locked = threading.Event()
+    record = analytics_service.record_orders
+
+    def slow_record(db, order_ids, status=OrderStatus.checking):
+        stock_locked.set()
+        threading.Event().wait(0.5)
+        record(db, order_ids, status)
+
+    monkeypatch.setattr(analytics_service, "record_orders", slow_record)
+    errors = []
+
+    def checkout():
+        try:
+            with SessionLocal() as db:
+                create_order(db, user_id, "Tashkent", "+998901234567", None, item, "uz")
+        except Exception as exc:
+            errors.append(exc)
+
+    def cancel():
+        stock_locked.wait(5)
+        try:
+            with SessionLocal() as db:
+                assert transition_orders(db, [pending], OrderStatus.cancelled)[0]["success"]
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=checkout), threading.Thread(target=cancel)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    # 5 - 1 (pending) + 1 (cancelled) - 1 (new checkout)
+    assert test_client.get(f"/api/v1/products/{prod_id}").json()["data"]["stock"] == 4
+
+
+def test_order_query_budget(test_client, admin_headers, user_headers, query_budget):
+    import uuid
+    import pytest
+    from app.db.models.order import Order
+    from app.db.query_stats import LazyLoadError
+    from app.db.session import SessionLocal
+    unique_id = uuid.uuid4().hex[:8]
+    resp = test_client.post("/api/v1/categories", json={
+        "name_uz": f"BudgetCat_uz_{unique_id}",
+        "name_ru": f"BudgetCat_ru_{unique_id}",
+        "name_en": f"BudgetCat_en_{unique_id}"
+    }, headers=admin_headers)
+    cat_id = resp.json()["data"]["id"]
+    prod_ids = []
+    for n in range(3):
+        resp = test_client.post("/api/v1/products", data={
+            "name_uz": f"BudgetProd_{n}_{unique_id}", "name_ru": f"BudgetProd_{n}_{unique_id}", "name_en": f"BudgetProd_{n}_{unique_id}",
+            "price": 100, "category_id": cat_id, "image_url": "http://img.com"
+        }, headers=admin_headers)
+        prod_ids.append(resp.json()["data"]["id"])
+    user_id = test_client.get("/api/v1/auth/get-me", headers=user_headers).json()["data"]["id"]
+    order_ids = []
+    for _ in range(6):
+        resp = test_client.post("/api/v1/orders", json={
+            "user_id": user_id,
+            "shipping_address": "Tashkent",
+            "phone_number": "+998901234567",
+            "items": [{"product_id": pid, "quantity": 1} for pid in prod_ids]
+        }, headers=user_headers)
+        order_ids.append(resp.json()["data"]["order_id"])
+
+    # statement_timeout + admin lookup + count + page + items, whatever the page size
+    for limit in (1, 6):
+        with query_budget(5):
+            resp = test_client.get(f"/api/v1/orders?product_id={prod_ids[0]}&limit={limit}", headers=admin_headers)
+        assert len(resp.json()["data"]) == limit
+        assert all(len(o["items"]) == 3 for o in resp.json()["data"])
+        assert resp.headers["X-DB-Stats"].startswith("queries=")
+
+    # statement_timeout + order + items + categories, whatever the number of lines
+    with query_budget(4):
+        resp = test_client.get(f"/api/v1/orders/{order_ids[0]}/receipt")
+    assert resp.headers["content-type"] == "application/pdf"
+
+    with SessionLocal() as db:
+        order = db.get(Order, order_ids[0])
+        with pytest.raises(LazyLoadError):
+            order.user
@@ -1,4 +1,5 @@
 import uuid
+from app.core.fieldsets import PRODUCT_FIELDS, PRODUCT_COMPACT
 
 def test_category_crud(test_client, admin_headers):
     # Create
@@ -66,3 +67,393 @@ def test_product_crud(test_client, admin_headers):
     # Delete Category Success
     resp = test_client.delete(f"/api/v1/categories/{cat_id}", headers=admin_headers)
     assert resp.status_code == 204
+
+
+def test_sparse_fieldsets(test_client, admin_headers):
+    name_base = f"Sparse_{uuid.uuid4().hex[:6]}"
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": name_base + "_uz", "name_ru": name_base + "_ru", "name_en": name_base + "_en"
+    }, headers=admin_headers).json()["data"]["id"]
+    prod_id = test_client.post("/api/v1/products", data={
+        "name_uz": "Ayiq", "name_ru": "Медведь", "name_en": "Bear", "description_ru": "Плюшевый",
+        "price": 199.99, "category_id": cat_id, "image_url": "http://img.com/bear.png",
+    }, headers=admin_headers).json()["data"]["id"]
+
+    resp = test_client.get(f"/api/v1/products/category/{cat_id}", params={"fields": "id,name,price", "lang": "ru"})
+    assert resp.status_code == 200
+    assert resp.json()["data"] == [{"id": prod_id, "name": "Медведь", "price": 199.99}]
+    assert resp.json()["meta"]["pagination"]["total"] == 1
+
+    data = test_client.get("/api/v1/products", params={"category_id": cat_id, "compact": "true", "lang": "ru"}).json()["data"]
+    assert data == [{
+        "id": prod_id, "name": "Медведь", "description": "Плюшевый", "price": 199.99,
+        "image_url": "http://img.com/bear.png", "category_id": cat_id, "stock": None,
+    }]
+
+    assert test_client.get(f"/api/v1/products/{prod_id}", params={"fields": "name_en,stock"}).json()["data"] == {"name_en": "Bear", "stock": None}
+    assert test_client.get("/api/v1/products/0", params={"fields": "id"}).status_code == 404
+    # Without fields/compact the full representation is unchanged
+    assert test_client.get(f"/api/v1/products/{prod_id}").json()["data"]["name_ru"] == "Медведь"
+
+    cols = test_client.get(f"/api/v1/products/category/{cat_id}", params={"format": "columnar", "fields": "id,name,price"}).json()
+    assert cols["data"] == {"id": [prod_id], "name": ["Ayiq"], "price": [199.99]}
+    assert cols["meta"]["pagination"]["count"] == 1
+    cols = test_client.get("/api/v1/products", params={"category_id": cat_id, "format": "columnar"}).json()["data"]
+    assert list(cols) == list(PRODUCT_FIELDS) and cols["name_en"] == ["Bear"]
+    empty = test_client.get("/api/v1/products", params={"category_id": cat_id, "offset": 5, "format": "columnar", "compact": "true"}).json()["data"]
+    assert empty == {name: [] for name in PRODUCT_COMPACT}
+
+    resp = test_client.get("/api/v1/products", params={"fields": "id,password"})
+    assert resp.status_code == 422
+    assert "password" in resp.json()["error"]["details"]["fields"]
+
+    cats = test_client.get("/api/v1/categories", params={"compact": "true", "limit": 100}).json()["data"]
+    assert {"id": cat_id, "name": name_base + "_uz"} in cats
+
+    test_client.delete(f"/api/v1/products/{prod_id}", headers=admin_headers)
+    test_client.delete(f"/api/v1/categories/{cat_id}", headers=admin_headers)
+
+
+def test_bootstrap_sections_and_etags(test_client, admin_headers, user_headers):
+    resp = test_client.get("/api/v1/bootstrap", params={"limit": 5}, headers=user_headers)
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert data["user"]["telegram_id"] == int(user_headers["X-Telegram-Id"])
+    assert len(data["products"]) <= 5 and data["products_pagination"]["limit"] == 5
+    assert set(data["etags"]) == {"user", "categories", "products"} and data["not_modified"] == []
+
+    # Sections the client already has come back empty
+    etags = data["etags"]
+    known = {**user_headers, "If-None-Match": f'{etags["categories"]}, {etags["products"]}'}
+    data = test_client.get("/api/v1/bootstrap", params={"limit": 5}, headers=known).json()["data"]
+    assert data["categories"] is None and data["products"] is None
+    assert data["user"] is not None and sorted(data["not_modified"]) == ["categories", "products"]
+
+    everything = {**user_headers, "If-None-Match": ", ".join(etags.values())}
+    resp = test_client.get("/api/v1/bootstrap", params={"limit": 5}, headers=everything)
+    assert resp.status_code == 304 and resp.headers["ETag"]
+
+    # Category writes invalidate the cached list
+    name_base = f"Boot_{uuid.uuid4().hex[:6]}"
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": name_base + "_uz", "name_ru": name_base + "_ru", "name_en": name_base + "_en"
+    }, headers=admin_headers).json()["data"]["id"]
+    data = test_client.get("/api/v1/bootstrap", params={"limit": 5}, headers=known).json()["data"]
+    assert data["etags"]["categories"] != etags["categories"]
+    assert next(c for c in data["categories"] if c["id"] == cat_id)["name"] == name_base + "_uz"
+    test_client.delete(f"/api/v1/categories/{cat_id}", headers=admin_headers)
+
+    assert test_client.get("/api/v1/bootstrap").json()["data"]["user"] is None
+    assert test_client.get("/api/v1/bootstrap", headers={"X-Telegram-Id": "1"}).status_code == 401
+
+
+def test_catalog_delta_sync(test_client, admin_headers, monkeypatch):
+    from datetime import datetime
+    from app.core.config import settings
+    from app.services.catalog_sync import encode_token
+
+    def sync(path, since=None, limit=500):
+        seen, deleted = {}, set()
+        while True:
+            params = {"limit": limit, **({"since": since} if since else {})}
+            resp = test_client.get(path, params=params)
+            assert resp.status_code == 200, resp.text
+            data = resp.json()["data"]
+            seen.update({item["id"]: item for item in data["changed"]})
+            deleted.update(data["deleted"])
+            since = data["next_token"]
+            if not data["has_more"]:
+                return seen, deleted, since
+
+    name_base = f"Sync_{uuid.uuid4().hex[:6]}"
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": name_base + "_uz", "name_ru": name_base + "_ru", "name_en": name_base + "_en"
+    }, headers=admin_headers).json()["data"]["id"]
+    def create(name):
+        return test_client.post("/api/v1/products", data={
+            "name_uz": name, "name_ru": name, "name_en": name, "price": 10, "category_id": cat_id, "image_url": "http://img.com",
+        }, headers=admin_headers).json()["data"]["id"]
+    a, b = create("A"), create("B")
+
+    # Full load in small pages
+    products, _, token = sync("/api/v1/products/changes", limit=2)
+    assert {a, b} <= set(products)
+
+    test_client.put(f"/api/v1/products/{a}", data={"price": 20}, headers=admin_headers)
+    test_client.delete(f"/api/v1/products/{b}", headers=admin_headers)
+    c = create("C")
+    changed, deleted, token = sync("/api/v1/products/changes", since=token)
+    assert changed[a]["price"] == 20.0 and c in changed
+    assert b in deleted and b not in changed
+
+    # Caught up: without the overlap window nothing comes back
+    monkeypatch.setattr(settings, "CATALOG_SYNC_OVERLAP_SECONDS", 0)
+    _, _, token = sync("/api/v1/products/changes", since=token)
+    changed, deleted, _ = sync("/api/v1/products/changes", since=token)
+    assert not ({a, c} & set(changed)) and b not in deleted
+
+    cat2 = test_client.post("/api/v1/categories", json={
+        "name_uz": name_base + "2_uz", "name_ru": name_base + "2_ru", "name_en": name_base + "2_en"
+    }, headers=admin_headers).json()["data"]["id"]
+    test_client.delete(f"/api/v1/categories/{cat2}", headers=admin_headers)
+    _, deleted, _ = sync("/api/v1/categories/changes", since=token)
+    assert cat2 in deleted
+
+    assert test_client.get("/api/v1/products/changes", params={"since": "garbage"}).status_code == 422
+    old = datetime(2000, 1, 1)
+    expired = test_client.get("/api/v1/products/changes", params={"since": encode_token(old, 0, old)})
+    assert expired.status_code == 410 and expired.json()["error"]["code"] == "SYNC_TOKEN_EXPIRED"
+
+    # Rows untouched for longer than the tombstone retention still page through on a full load
+    from sqlalchemy import text
+    from app.db.session import SessionLocal
+    stale = [create(f"Old{n}") for n in range(3)]
+    with SessionLocal() as db:
+        db.execute(text("UPDATE products SET updated_at = '2001-01-01' WHERE id = ANY(:ids)"), {"ids": stale})
+        db.commit()
+    products, _, _ = sync("/api/v1/products/changes", limit=1)
+    assert set(stale) <= set(products)
+
+
+def test_product_batch_lookup(test_client, admin_headers, query_budget):
+    from app.db.session import SessionLocal
+    from app.services.product_cache import product_cache
+
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": f"Batch_{uuid.uuid4().hex[:6]}", "name_ru": f"Batch_{uuid.uuid4().hex[:6]}", "name_en": f"Batch_{uuid.uuid4().hex[:6]}"
+    }, headers=admin_headers).json()["data"]["id"]
+    ids = [test_client.post("/api/v1/products", data={
+        "name_uz": f"B{n}", "name_ru": f"Б{n}", "name_en": f"B{n}", "description_ru": "описание",
+        "price": 10 + n, "category_id": cat_id, "image_url": "http://img.com", "stock": 5,
+    }, headers=admin_headers).json()["data"]["id"] for n in range(3)]
+    wanted = [ids[2], 0, ids[0], ids[2]]
+
+    # Cold cache: one IN query
+    with query_budget(3):
+        resp = test_client.get("/api/v1/products/batch", params={"ids": ",".join(map(str, wanted)), "lang": "ru"})
+    data = resp.json()["data"]
+    assert [i["id"] for i in data["items"]] == wanted
+    assert [i["found"] for i in data["items"]] == [True, False, True, True]
+    assert data["items"][0]["product"]["name"] == "Б2" and data["items"][0]["product"]["description"] == "описание"
+    assert data["missing"] == [0]
+
+    # Warm cache: no SQL beyond the request's own setup
+    with SessionLocal() as db:
+        product_cache.get_all(db)
+    with query_budget(0):
+        resp = test_client.post("/api/v1/products/batch", json={"ids": ids})
+    assert [i["found"] for i in resp.json()["data"]["items"]] == [True, True, True]
+    # Ids the cache lacks go to the database in one IN query (plus the transaction's SET LOCAL) before they count as missing
+    with query_budget(2):
+        resp = test_client.post("/api/v1/products/batch", json={"ids": wanted})
+    assert resp.json()["data"] == {**data, "items": [
+        {**i, "product": i["product"] and {**i["product"], "name": i["product"]["name_uz"], "description": None}} for i in data["items"]
+    ]}
+
+    # Written around this worker's cache (another worker, sqladmin): found while the cache is still warm
+    from app.db.models.product import Product
+    with SessionLocal() as db:
+        p = Product(name_uz="B9", name_ru="Б9", name_en="B9", price=19, category_id=cat_id)
+        db.add(p)
+        db.commit()
+        fresh = p.id
+    assert product_cache.peek() is not None and fresh not in product_cache.peek()
+    resp = test_client.post("/api/v1/products/batch", json={"ids": [ids[0], fresh]})
+    assert [i["found"] for i in resp.json()["data"]["items"]] == [True, True]
+    assert resp.json()["data"]["missing"] == []
+
+    assert test_client.get("/api/v1/products/batch", params={"ids": "1,x"}).status_code == 422
+    too_many = list(range(1, 300))
+    assert test_client.post("/api/v1/products/batch", json={"ids": too_many}).status_code == 422
+
+
+def test_product_facets(test_client, admin_headers, query_budget, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "PRICE_FACET_BOUNDS", [0, 100, 200])
+    tag = f"facet{uuid.uuid4().hex[:6]}"
+    cats = [test_client.post("/api/v1/categories", json={
+        "name_uz": f"{tag}_{n}", "name_ru": f"{tag}_{n}", "name_en": f"{tag}_{n}"
+    }, headers=admin_headers).json()["data"]["id"] for n in range(2)]
+    for cat_id, price in [(cats[0], 50), (cats[0], 150), (cats[0], 250), (cats[1], 150)]:
+        test_client.post("/api/v1/products", data={
+            "name_uz": tag, "name_ru": tag, "name_en": tag,
+            "price": price, "category_id": cat_id, "image_url": "http://img.com",
+        }, headers=admin_headers)
+
+    with query_budget(10) as plain:
+        test_client.get("/api/v1/products", params={"q": tag, "category_id": cats[0], "min_price": 100})
+    # Facets and the total come from one statement, in place of the count query
+    with query_budget(10) as cold:
+        resp = test_client.get("/api/v1/products", params={
+            "q": tag.upper(), "category_id": cats[0], "min_price": 100, "facets": "price,category",
+        })
+    assert cold.count == plain.count
+    body = resp.json()
+    assert body["meta"]["pagination"]["total"] == 2
+    assert len(body["data"]) == 2
+    # Category counts keep the price filter but not the category one, and vice versa
+    assert body["meta"]["facets"]["category"] == [
+        {"category_id": cats[0], "count": 2}, {"category_id": cats[1], "count": 1},
+    ]
+    assert body["meta"]["facets"]["price"] == [
+        {"min": 0, "max": 100, "count": 1}, {"min": 100, "max": 200, "count": 1}, {"min": 200, "max": None, "count": 1},
+    ]
+
+    # Cached: only the page is queried; the sparse path carries facets too
+    with query_budget(10) as warm:
+        resp = test_client.get("/api/v1/products", params={
+            "q": tag, "category_id": cats[0], "min_price": 100, "facets": "category,price", "fields": "id",
+        })
+    assert warm.count == plain.count - 1
+    assert resp.json()["meta"]["facets"] == body["meta"]["facets"]
+
+    # Product writes clear the cache
+    test_client.post("/api/v1/products", data={
+        "name_uz": tag, "name_ru": tag, "name_en": tag,
+        "price": 120, "category_id": cats[1], "image_url": "http://img.com",
+    }, headers=admin_headers)
+    resp = test_client.get("/api/v1/products", params={"q": tag, "facets": "category"})
+    assert resp.json()["meta"]["facets"] == {"category": [
+        {"category_id": cats[0], "count": 3}, {"category_id": cats[1], "count": 2},
+    ]}
+    assert resp.json()["meta"]["pagination"]["total"] == 5
+
+    assert test_client.get("/api/v1/products", params={"facets": "brand"}).status_code == 422
+
+
+def test_search_key_normalization():
+    from app.services.product_search import normalize, search_key
+
+    # Uzbek Latin (any apostrophe), Uzbek Cyrillic and case all meet in one spelling
+    assert normalize("Qoʻgʻirchoq") == normalize("qo'g'irchoq") == normalize("ҚЎҒИРЧОҚ") == "kogirchok"
+    assert normalize("Машина!") == normalize("mashina") == "mashina"
+    assert normalize("Xo‘jayin") == normalize("Хўжайин")
+    assert normalize("Crème, brûlée") == "creme brulee"
+    assert search_key("Ayiq", "Медведь", None, "Yumshoq ayiq") == "ayik medved yumshok"
+
+
+def test_transliterated_search(test_client, admin_headers):
+    from sqlalchemy import text
+    from app.db.session import SessionLocal
+    from app.services.product_search import backfill
+
+    tag = f"tr{uuid.uuid4().hex[:6]}"
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": tag, "name_ru": tag, "name_en": tag
+    }, headers=admin_headers).json()["data"]["id"]
+    prod_id = test_client.post("/api/v1/products", data={
+        "name_uz": f"Qoʻgʻirchoq {tag}", "name_ru": f"Кукла {tag}", "name_en": f"Doll {tag}",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com",
+    }, headers=admin_headers).json()["data"]["id"]
+
+    def found(q):
+        resp = test_client.get("/api/v1/products", params={"q": q, "category_id": cat_id})
+        return [p["id"] for p in resp.json()["data"]]
+
+    for q in ["қўғирчоқ", "QO'G'IR", "кукл", "doll", f"куклa {tag}"]:
+        assert found(q) == [prod_id], q
+    assert found("mashina") == []
+
+    # Updates recompute the key
+    test_client.put(f"/api/v1/products/{prod_id}", data={"name_ru": f"Машинка {tag}"}, headers=admin_headers)
+    assert found("mashink") == [prod_id]
+    assert found("кукла") == []
+
+    # Rows without a key are invisible to search until the backfill fills them in
+    with SessionLocal() as db:
+        db.execute(text("UPDATE products SET search_key = NULL WHERE id = :id"), {"id": prod_id})
+        db.commit()
+    assert found("машинка") == []
+    with SessionLocal() as db:
+        assert backfill(db) >= 1
+    assert found("машинка") == [prod_id]
+
+    # Plain ORM writes (sqladmin) get their keys from the mapper too
+    from app.db.models.product import Product
+    with SessionLocal() as db:
+        p = Product(name_uz=f"Ayiqcha {tag}", name_ru=f"Мишка {tag}", name_en=f"Teddy {tag}", price=50, category_id=cat_id)
+        db.add(p)
+        db.commit()
+        other_id = p.id
+    assert found("мишк") == [other_id]
+    with SessionLocal() as db:
+        db.get(Product, other_id).name_en = f"Bear {tag}"
+        db.commit()
+    assert found("bear") == [other_id]
+
+
+def test_suggest_index_ranking():
+    from app.services.product_suggest import SuggestIndex, Suggestion
+
+    index = SuggestIndex(size=3, max_depth=6)
+    index.load([
+        Suggestion(1, "Yumshoq ayiq", "Мягкий медведь", "Soft bear", 10.0, None),
+        Suggestion(2, "Ayiqcha", "Медвежонок", "Teddy", 20.0, None),
+        Suggestion(3, "Mashina", "Машина", "Car", 30.0, None),
+        Suggestion(4, "Katta ayiq qo'g'irchoq", "Большой медведь", "Big bear doll", 40.0, None),
+    ], popularity={2: 5, 4: 9})
+
+    def ids(q, limit=3):
+        return [s.id for s in index.suggest(q, limit)]
+    # Any word, any script, best sellers first
+    assert ids("ayi") == [4, 2, 1]
+    assert ids("АЙИ") == [4, 2, 1]
+    assert ids("медв") == [4, 2, 1]
+    assert ids("ayi", limit=1) == [4]
+    # Longer than the indexed depth: checked against the full keys
+    assert ids("ayiqcha") == [2]
+    assert ids("katta ayiq k") == [4]
+    assert ids("zzz") == [] and ids("!!") == []
+
+    # Incremental writes keep every node's top list right
+    index.upsert(Suggestion(5, "Ayiq", "Медведь", "Bear", 50.0, None))
+    assert ids("ayi") == [4, 2, 1]
+    index.remove(4)
+    assert ids("ayi") == [2, 1, 5]
+    assert ids("kat") == []
+    index.upsert(Suggestion(2, "Quyoncha", "Зайчонок", "Bunny", 20.0, None))
+    assert ids("ayi") == [1, 5]
+    assert ids("kuyon") == [2]
+
+
+def test_product_suggest(test_client, admin_headers, query_budget):
+    from app.db.session import SessionLocal
+    from app.services.product_suggest import suggest_index
+
+    tag = f"sg{uuid.uuid4().hex[:6]}"
+    cat_id = test_client.post("/api/v1/categories", json={
+        "name_uz": tag, "name_ru": tag, "name_en": tag
+    }, headers=admin_headers).json()["data"]["id"]
+    first = test_client.post("/api/v1/products", data={
+        "name_uz": f"{tag} Robot", "name_ru": f"{tag} Робот", "name_en": f"{tag} Robot",
+        "price": 100, "category_id": cat_id, "image_url": "http://img.com/1.jpg",
+    }, headers=admin_headers).json()["data"]["id"]
+    with SessionLocal() as db:
+        suggest_index.rebuild(db)
+
+    # Written after the load: patched in by the endpoint itself
+    second = test_client.post("/api/v1/products", data={
+        "name_uz": f"{tag} Robotcha", "name_ru": f"{tag} Роботик", "name_en": f"{tag} Small robot",
+        "price": 50, "category_id": cat_id, "image_url": "http://img.com/2.jpg",
+    }, headers=admin_headers).json()["data"]["id"]
+
+    with query_budget(0):
+        resp = test_client.get("/api/v1/products/suggest", params={"q": f"{tag} РОБ", "lang": "ru"})
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert data["ready"] is True
+    assert data["items"] == [
+        {"id": first, "name": f"{tag} Робот", "price": 100.0, "image_url": "http://img.com/1.jpg"},
+        {"id": second, "name": f"{tag} Роботик", "price": 50.0, "image_url": "http://img.com/2.jpg"},
+    ]
+
+    resp = test_client.get("/api/v1/products/suggest", params={"q": f"{tag} small", "lang": "en"})
+    assert [(i["id"], i["name"]) for i in resp.json()["data"]["items"]] == [(second, f"{tag} Small robot")]
+
+    test_client.delete(f"/api/v1/products/{first}", headers=admin_headers)
+    resp = test_client.get("/api/v1/products/suggest", params={"q": f"{tag} robot"})
+    assert [i["id"] for i in resp.json()["data"]["items"]] == [second]
+
+    assert test_client.get("/api/v1/products/suggest", params={"q": ""}).status_code == 422
+    assert test_client.get("/api/v1/products/suggest", params={"q": "a", "limit": 500}).status_code == 422
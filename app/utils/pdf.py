@@ -6,12 +6,16 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from io import BytesIO
 import requests
+from app.core import timing, cancellation
 
 
 def load_image_from_url(url, width, height):
     """URL orqali rasmni yuklash"""
+    # Mijoz uzilgan bo'lsa, qolgan rasmlarni yuklamaymiz
+    cancellation.check("pdf")
     try:
-        response = requests.get(url, timeout=5)
+        with timing.span("img"):
+            response = requests.get(url, timeout=5)
         img = Image(BytesIO(response.content), width=width, height=height)
         return img
     except:
@@ -0,0 +1,97 @@
+"""
+Background job worker, run next to the API:
+
+    python -m app.worker [--queues receipts,images]
+
+Every queue gets as many threads as its JOB_QUEUES limit; the limit itself is enforced
+across all worker processes when jobs are claimed.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import psycopg
+from app.core import metrics
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.services import job_queue
+# Register every mapper up front; the worker does not go through app.main
+from app.db.models import user, category, product, order, analytics, job  # noqa
+
+log = logging.getLogger("app.worker")
+
+
+class Worker:
+    def __init__(self, queues: dict[str, int]):
+        self.queues = queues
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.wakeups = {q: threading.Event() for q in queues}
+
+    def run_slot(self, queue: str, limit: int):
+        wakeup = self.wakeups[queue]
+        with SessionLocal() as db:
+            while not self.stopping.is_set():
+                try:
+                    claimed = job_queue.claim(db, queue, limit, self.worker_id, settings.JOB_LEASE_SECONDS)
+                    if claimed is not None:
+                        job_queue.run_job(db, claimed, self.worker_id)
+                        continue
+                except Exception:
+                    log.exception("worker slot for queue %s failed", queue)
+                    db.rollback()
+                wakeup.wait(settings.JOB_POLL_INTERVAL)
+                wakeup.clear()
+
+    def listen(self):
+        """Wake idle slots as soon as a job is enqueued instead of at the next poll."""
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self.stopping.is_set():
+            try:
+                with psycopg.connect(dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {job_queue.CHANNEL}")
+                    while not self.stopping.is_set():
+                        for n in conn.notifies(timeout=1.0):
+                            if n.payload in self.wakeups:
+                                self.wakeups[n.payload].set()
+            except Exception:
+                log.exception("job listener lost its connection, falling back to polling")
+                self.stopping.wait(settings.JOB_POLL_INTERVAL)
+
+    def stop(self, *_):
+        log.info("stopping after the current jobs finish")
+        self.stopping.set()
+        for wakeup in self.wakeups.values():
+            wakeup.set()
+
+    def run(self):
+        threads = [threading.Thread(target=self.listen, daemon=True)]
+        for queue, limit in self.queues.items():
+            for _ in range(limit):
+                threads.append(threading.Thread(target=self.run_slot, args=(queue, limit), name=f"{queue}-slot"))
+        for t in threads:
+            t.start()
+        log.info("worker %s serving %s", self.worker_id, self.queues)
+        for t in threads[1:]:
+            t.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.worker")
+    parser.add_argument("--queues", default=",".join(settings.JOB_QUEUES), help="Comma-separated queues to serve")
+    args = parser.parse_args(argv)
+    queues = {q: settings.JOB_QUEUES.get(q, 1) for q in args.queues.split(",") if q}
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    worker = Worker(queues)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    metrics.registry.start_flusher()
+    worker.run()
+    metrics.registry.flush()
+
+
+if __name__ == "__main__":
+    main()
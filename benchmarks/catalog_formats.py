@@ -0,0 +1,129 @@
+"""
+Product page encoding benchmark: the default `BaseResponse[list[ProductOut]]` response against
+the row-tuple formats served with `fields`/`compact` and `format=columnar`.
+
+    python -m benchmarks.catalog_formats [--items 100] [--rounds 200] [--gzip-level 6]
+
+Needs no database: pages are built from synthetic rows shaped like the products table. For each
+format it reports the median time to turn one page of rows into response bytes (what the endpoint
+and FastAPI's serialization do after the query), and the raw and gzipped body size.
+"""
+import argparse
+import gzip
+import random
+import statistics
+import time
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from app.core import fieldsets
+from app.core.response import base_success
+from app.schemas.base import BaseResponse
+from app.schemas.product import ProductOut
+
+WORDS_UZ = ["ayiq", "mashina", "qo'g'irchoq", "konstruktor", "to'p", "poyezd", "robot", "kubik", "yumshoq", "katta"]
+WORDS_RU = ["медведь", "машинка", "кукла", "конструктор", "мяч", "поезд", "робот", "кубики", "мягкий", "большой"]
+WORDS_EN = ["bear", "car", "doll", "building set", "ball", "train", "robot", "blocks", "soft", "big"]
+
+
+def fake_rows(n: int, seed: int = 1) -> list[tuple]:
+    """Tuples in fieldsets.PRODUCT_FIELDS order, as the full ORM path would see them."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        words = rnd.sample(range(len(WORDS_UZ)), 3)
+        name = lambda vocab: " ".join(vocab[w] for w in words).capitalize()
+        desc = lambda vocab: " ".join(rnd.choice(vocab) for _ in range(25)).capitalize() + "."
+        rows.append((
+            1000 + i, None, name(WORDS_UZ), name(WORDS_RU), name(WORDS_EN),
+            None, desc(WORDS_UZ), desc(WORDS_RU), desc(WORDS_EN),
+            Decimal(rnd.randrange(10_000, 2_000_000)) / 100, f"https://cdn.example.uz/products/{1000 + i}.jpg",
+            rnd.randrange(1, 40), rnd.choice([None, rnd.randrange(0, 500)]),
+        ))
+    return rows
+
+
+def default_body(rows: list[tuple], lang: str) -> bytes:
+    """Endpoint builds ProductOut objects, FastAPI validates against the response model and encodes."""
+    adapter = TypeAdapter(BaseResponse[list[ProductOut]])
+    data = [ProductOut(
+        id=r[0], name=r[3] if lang == "ru" else r[2], name_uz=r[2], name_ru=r[3], name_en=r[4],
+        description=r[7] if lang == "ru" else r[6], description_uz=r[6], description_ru=r[7], description_en=r[8],
+        price=float(r[9]), image_url=r[10], category_id=r[11], stock=r[12],
+    ) for r in rows]
+    payload = base_success(data, lang=lang, pagination={"limit": len(rows), "offset": 0, "count": len(rows), "total": 10_000})
+    content = jsonable_encoder(adapter.validate_python(payload))
+    return JSONResponse(content).body
+
+
+def sparse_body(rows: list[tuple], lang: str, names: list[str], format: str) -> bytes:
+    """What the fieldset path does with the Core rows (the SQL already resolved language and price)."""
+    data = fieldsets.encode(rows, names, format)
+    return fieldsets.sparse_response(data, lang, {"limit": len(rows), "offset": 0, "count": len(rows), "total": 10_000}).body
+
+
+def select_columns(rows: list[tuple], names: list[str], lang: str) -> list[tuple]:
+    """Emulate the narrowed SELECT: pick and resolve the requested columns up front (not timed)."""
+    index = {n: i for i, n in enumerate(fieldsets.PRODUCT_FIELDS)}
+    out = []
+    for r in rows:
+        values = []
+        for n in names:
+            if n in fieldsets.LOCALIZED:
+                values.append(r[index[f"{n}_{lang}"]])
+            elif n == "price":
+                values.append(float(r[index[n]]))
+            else:
+                values.append(r[index[n]])
+        out.append(tuple(values))
+    return out
+
+
+def measure(fn, rounds: int) -> tuple[float, bytes]:
+    timings = []
+    body = b""
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.catalog_formats")
+    parser.add_argument("--items", type=int, default=100, help="products per page")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--lang", default="ru")
+    args = parser.parse_args(argv)
+
+    rows = fake_rows(args.items)
+    full = list(fieldsets.PRODUCT_FIELDS)
+    compact = list(fieldsets.PRODUCT_COMPACT)
+    grid = ["id", "name", "price", "image_url"]
+    cases = [
+        ("default (ProductOut)", lambda: default_body(rows, args.lang)),
+    ]
+    for label, names, format in [
+        ("format=columnar", full, "columnar"),
+        ("compact=true", compact, "rows"),
+        ("compact + columnar", compact, "columnar"),
+        ("fields=id,name,price,image_url", grid, "rows"),
+        ("  same, columnar", grid, "columnar"),
+    ]:
+        selected = select_columns(rows, names, args.lang)
+        cases.append((label, lambda s=selected, n=names, f=format: sparse_body(s, args.lang, n, f)))
+
+    print(f"{args.items} products per page, median of {args.rounds} rounds, gzip level {args.gzip_level}\n")
+    print(f"{'format':34} {'encode µs':>10} {'bytes':>9} {'gzip bytes':>11} {'vs default':>11}")
+    baseline = None
+    for label, fn in cases:
+        seconds, body = measure(fn, args.rounds)
+        zipped = len(gzip.compress(body, args.gzip_level))
+        baseline = baseline or zipped
+        print(f"{label:34} {seconds * 1e6:10.0f} {len(body):9d} {zipped:11d} {zipped / baseline:10.0%}")
+
+
+if __name__ == "__main__":
+    main()
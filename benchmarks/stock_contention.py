@@ -0,0 +1,101 @@
+"""
+Flash-sale benchmark: hundreds of buyers call create_order on the same product at once.
+
+    python -m benchmarks.stock_contention [--buyers 300] [--stock 100] [--qty 1] [--pool 64]
+
+Runs against DATABASE_URL (use a scratch database). Creates its own category, product and
+users, then checks that exactly `stock` units were sold, nothing was oversold, and reports
+throughput and latency percentiles for successful and sold-out attempts.
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.core.response import BaseHTTPException
+from app.db.models import user, category, product, order, analytics, job  # noqa
+from app.db.models.category import Category
+from app.db.models.product import Product
+from app.db.models.user import User
+from app.db.models.order import OrderItem
+from app.services.order_service import create_order
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stock_contention")
+    parser.add_argument("--buyers", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--qty", type=int, default=1)
+    parser.add_argument("--pool", type=int, default=64, help="DB connections shared by the buyers")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(settings.DATABASE_URL, pool_size=args.pool, max_overflow=0, pool_timeout=120)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    tag = uuid.uuid4().hex[:8]
+
+    with Session() as db:
+        cat = Category(name_uz=f"bench_{tag}", name_ru=f"bench_{tag}", name_en=f"bench_{tag}")
+        db.add(cat); db.flush()
+        prod = Product(name_uz=f"bench_{tag}", name_ru=f"bench_{tag}", name_en=f"bench_{tag}",
+                       price=1000, category_id=cat.id, stock=args.stock)
+        db.add(prod); db.flush()
+        buyers = [User(customer_name=f"bench {i}", phone_number=f"+1{tag}{i:05d}"[:20]) for i in range(args.buyers)]
+        db.add_all(buyers); db.commit()
+        product_id, buyer_ids = prod.id, [b.id for b in buyers]
+
+    start = threading.Barrier(args.buyers)
+    outcomes = {"ok": [], "out_of_stock": [], "error": []}
+    lock = threading.Lock()
+
+    def buy(user_id):
+        start.wait()
+        t0 = time.perf_counter()
+        try:
+            with Session() as db:
+                create_order(db, user_id, "Benchmark street 1", "+998901234567", None,
+                             [{"product_id": product_id, "quantity": args.qty}], "uz")
+            outcome = "ok"
+        except BaseHTTPException as exc:
+            outcome = "out_of_stock" if exc.code == "OUT_OF_STOCK" else "error"
+        except Exception:
+            outcome = "error"
+        with lock:
+            outcomes[outcome].append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.buyers) as pool:
+        list(pool.map(buy, buyer_ids))
+    elapsed = time.perf_counter() - t0
+
+    with Session() as db:
+        left = db.get(Product, product_id).stock
+        sold = db.execute(select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id)).scalar()
+
+    print(f"buyers={args.buyers} stock={args.stock} qty={args.qty} pool={args.pool}")
+    print(f"elapsed {elapsed:.2f}s, {args.buyers / elapsed:.0f} attempts/s")
+    for name, times in outcomes.items():
+        if times:
+            print(f"  {name:13} {len(times):5}  p50 {percentile(times, .5) * 1000:7.1f} ms  "
+                  f"p99 {percentile(times, .99) * 1000:7.1f} ms  mean {statistics.mean(times) * 1000:7.1f} ms")
+    print(f"sold {sold}, left {left}")
+    expected = min(args.stock // args.qty, args.buyers) * args.qty
+    assert sold == args.stock - left, "stock and order_items disagree"
+    assert left >= 0 and sold <= args.stock, "oversold"
+    assert sold == expected, f"expected {expected} units sold"
+    assert not outcomes["error"], "unexpected errors (deadlocks?)"
+    print("OK: no oversell, no errors")
+
+
+if __name__ == "__main__":
+    main()
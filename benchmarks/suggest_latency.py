@@ -0,0 +1,106 @@
+"""
+Autocomplete benchmark: lookup latency of the in-memory suggest index behind GET /products/suggest.
+
+    python -m benchmarks.suggest_latency [--products 20000] [--lookups 20000] [--limit 8] [--repeat 3] [--budget-us 50]
+
+Needs no database: the index is loaded from a synthetic catalog with names in Uzbek, Russian and
+English and skewed popularity. Queries are what a user types keystroke by keystroke (1-10
+characters of a product name, in Latin or Cyrillic). Reports the load time, the per-lookup
+percentiles (best of --repeat passes, to keep a noisy neighbour from failing the run) and the
+cost of an incremental product write, and exits with status 1 when the p99 lookup is over the budget.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from benchmarks.catalog_formats import WORDS_EN, WORDS_RU, WORDS_UZ
+from app.core.config import settings
+from app.services.product_suggest import SuggestIndex, Suggestion
+
+# Spread the vocabulary out so prefixes do not all land on the same ten words
+SUFFIXES_UZ = ["", "cha", "lar", "li", "chi"]
+SUFFIXES_RU = ["", "ик", "ки", "ный", "ка"]
+
+
+def fake_catalog(n: int, seed: int = 1) -> tuple[list[Suggestion], dict[int, int]]:
+    rnd = random.Random(seed)
+    products, popularity = [], {}
+    for i in range(n):
+        words = rnd.sample(range(len(WORDS_UZ)), 3)
+        model = f"{rnd.choice('ABCKMXZ')}{rnd.randrange(1, 999)}"
+        uz = " ".join(WORDS_UZ[w] + rnd.choice(SUFFIXES_UZ) for w in words).capitalize()
+        ru = " ".join(WORDS_RU[w] + rnd.choice(SUFFIXES_RU) for w in words).capitalize()
+        en = " ".join(WORDS_EN[w] for w in words).capitalize()
+        products.append(Suggestion(i + 1, f"{uz} {model}", f"{ru} {model}", f"{en} {model}", rnd.randrange(10_000, 2_000_000) / 100, None))
+        # A few best sellers, a long tail of items that rarely sell
+        if rnd.random() < 0.3:
+            popularity[i + 1] = int(rnd.paretovariate(1.2) * 3)
+    return products, popularity
+
+
+def fake_queries(products: list[Suggestion], n: int, seed: int = 2) -> list[str]:
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        p = rnd.choice(products)
+        name = rnd.choice([p.name_uz, p.name_ru, p.name_en])
+        start = rnd.choice([0] + [i + 1 for i, c in enumerate(name) if c == " "])
+        queries.append(name[start:start + rnd.randint(1, 10)])
+    return queries
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suggest_latency")
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-us", type=float, default=50.0, help="fail when the p99 lookup is slower")
+    args = parser.parse_args(argv)
+
+    products, popularity = fake_catalog(args.products)
+    index = SuggestIndex(settings.SUGGEST_MAX_LIMIT, settings.SUGGEST_MAX_PREFIX)
+    started = time.perf_counter()
+    index.load(products, popularity)
+    print(f"{args.products} products loaded in {time.perf_counter() - started:.2f} s")
+
+    queries = fake_queries(products, args.lookups)
+    for q in queries[:1000]:
+        index.suggest(q, args.limit)
+    passes = []
+    for _ in range(args.repeat):
+        timings, empty = [], 0
+        for q in queries:
+            started = time.perf_counter_ns()
+            found = index.suggest(q, args.limit)
+            timings.append((time.perf_counter_ns() - started) / 1000)
+            empty += not found
+        passes.append(timings)
+    timings = min(passes, key=lambda t: percentile(t, 99))
+
+    writes = []
+    for p in products[:500]:
+        renamed = Suggestion(p.id, p.name_ru, p.name_uz, p.name_en, p.price, p.image_url)
+        started = time.perf_counter_ns()
+        index.upsert(renamed)
+        writes.append((time.perf_counter_ns() - started) / 1000)
+
+    p99 = percentile(timings, 99)
+    print(f"{args.lookups} lookups (limit {args.limit}), {empty} without results")
+    print(f"{'lookup µs':>12} p50 {percentile(timings, 50):7.1f}  p95 {percentile(timings, 95):7.1f}  "
+          f"p99 {p99:7.1f}  max {max(timings):8.1f}")
+    print(f"{'write µs':>12} p50 {statistics.median(writes):7.1f}  p99 {percentile(writes, 99):7.1f}  (rename, all languages)")
+    if p99 > args.budget_us:
+        print(f"FAIL: p99 lookup {p99:.1f} µs is over the {args.budget_us:.0f} µs budget")
+        sys.exit(1)
+    print(f"OK: p99 lookup within {args.budget_us:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()